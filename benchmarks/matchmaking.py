@@ -0,0 +1,98 @@
+"""
+Benchmark the matchmaking queue under simulated load.
+
+Enqueues synthetic players, rated from randomly generated profile stats,
+at a steady arrival rate on a simulated clock, polls the matchmaker as
+time passes, and reports enqueue and poll throughput, how long players
+waited and how far apart the paired ratings were.
+
+    python -m benchmarks.matchmaking --players 100000 --arrivals-per-second 2000
+"""
+import argparse
+import time
+from tgme.game_stats import GameStats
+from tgme.matchmaking import Matchmaker, skill_rating
+from tgme.utils.game_random import GameRandom
+
+
+class SimulatedClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def synthetic_stats(rng: GameRandom) -> dict:
+    stats = GameStats()
+    stats.games_played = rng.randint(0, 500)
+    # Each player has their own win rate, so ratings spread out with experience
+    stats.wins = round(stats.games_played * rng.betavariate(4, 4))
+    return stats.to_dict()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--players', type=int, default=100000)
+    parser.add_argument('--arrivals-per-second', type=float, default=2000.0, help="Simulated arrival rate")
+    parser.add_argument('--queues', type=int, default=2, help="Separate queues, e.g. one per game type")
+    parser.add_argument('--poll-interval', type=float, default=0.25, help="Simulated seconds between polls")
+    parser.add_argument('--bucket-width', type=float, default=50.0)
+    parser.add_argument('--widen-every', type=float, default=5.0)
+    parser.add_argument('--max-widen', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = GameRandom(args.seed)
+    ratings = [skill_rating(synthetic_stats(rng)) for _ in range(args.players)]
+    queues = [rng.randrange(args.queues) for _ in range(args.players)]
+
+    clock = SimulatedClock()
+    waits, gaps = [], []
+
+    def on_match(first, second) -> None:
+        waits.append(clock.now - first.enqueued_at)
+        waits.append(clock.now - second.enqueued_at)
+        gaps.append(abs(first.rating - second.rating))
+
+    matchmaker = Matchmaker(args.bucket_width, args.widen_every, args.max_widen, on_match, clock)
+    enqueue_seconds = poll_seconds = 0.0
+    polls = 0
+    next_poll = args.poll_interval
+    step = 1.0 / args.arrivals_per_second
+    for player in range(args.players):
+        clock.now = player * step
+        if clock.now >= next_poll:
+            start = time.perf_counter()
+            matchmaker.poll()
+            poll_seconds += time.perf_counter() - start
+            polls += 1
+            next_poll += args.poll_interval
+        start = time.perf_counter()
+        matchmaker.enqueue(player, ratings[player], queues[player])
+        enqueue_seconds += time.perf_counter() - start
+
+    # Let the stragglers' windows widen all the way
+    end = clock.now + args.widen_every * (args.max_widen + 1)
+    while clock.now < end:
+        clock.now = min(end, next_poll)
+        start = time.perf_counter()
+        matchmaker.poll()
+        poll_seconds += time.perf_counter() - start
+        polls += 1
+        next_poll += args.poll_interval
+
+    paired = len(waits)
+    print(f"{args.players} players in {args.queues} queue(s), {args.arrivals_per_second:.0f} arrivals/s simulated")
+    print(f"Enqueue: {args.players / enqueue_seconds:,.0f}/s, {enqueue_seconds / args.players * 1e6:.1f} us each")
+    print(f"Poll: {polls} polls in {poll_seconds * 1000:.1f} ms, {poll_seconds / polls * 1e6:.1f} us each")
+    print(f"Matched {matchmaker.matches} pairs, {len(matchmaker)} players left waiting")
+    if paired:
+        waits.sort()
+        print(f"Wait: mean {sum(waits) / paired:.2f}s, median {waits[paired // 2]:.2f}s, "
+              f"95th percentile {waits[int(paired * 0.95)]:.2f}s, max {waits[-1]:.2f}s")
+        print(f"Rating gap: mean {sum(gaps) / len(gaps):.1f}, max {max(gaps):.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark the Puzzle Fighter CPU player.
+
+Plays headless two player games, a look-ahead bot against a bot that only
+places its current pair, and reports cascades simulated per second, the
+transposition table hit rate and how long each move took against the
+per-move time budget.
+
+    python -m benchmarks.puzzle_fighter_bot --games 5 --budget 0.012
+"""
+import argparse
+import time
+from games.puzzle_fighter_bot import PuzzleFighterBot
+from games.puzzle_fighter_game import PuzzleFighterGame
+from games.puzzle_fighter_matching_strategy import PuzzleFighterMatchingStrategy
+from tgme.player import Player
+from tgme.player_profile import PlayerProfile
+
+
+def play_game(bots, seed: int, max_moves: int) -> dict:
+    game = PuzzleFighterGame(
+        game_id='Puzzle Fighter',
+        players=[Player(PlayerProfile('CPU 1')), Player(PlayerProfile('CPU 2'))],
+        controls=[{}, {}],
+        matching_strategy=PuzzleFighterMatchingStrategy(),
+        seed=seed
+    )
+    game.init()
+
+    move_times, moves = [], 0
+    while not any(game.game_over) and moves < max_moves:
+        for player, bot in enumerate(bots):
+            if game.game_over[player]:
+                continue
+            start = time.perf_counter()
+            placement = bot.choose_move(game, player)
+            if player == 0:
+                move_times.append(time.perf_counter() - start)
+            if placement is not None:
+                for action in placement.actions:
+                    game.dispatch_action(player, action)
+        game.check_loss_condition()
+        # One update between moves delivers the attacks
+        game.step()
+        moves += 1
+    return {'moves': moves, 'scores': list(game.scores), 'lost': list(game.game_over), 'move_times': move_times}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--games', type=int, default=3)
+    parser.add_argument('--moves', type=int, default=300, help="Stop each game after this many pairs per player")
+    parser.add_argument('--budget', type=float, default=0.012, help="Seconds per move")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    bot = PuzzleFighterBot(depth=2, time_budget=args.budget)
+    opponent = PuzzleFighterBot(depth=1, time_budget=args.budget)
+    move_times, moves, wins = [], 0, 0
+    start = time.perf_counter()
+    for i in range(args.games):
+        result = play_game((bot, opponent), args.seed + i, args.moves)
+        moves += result['moves']
+        wins += result['lost'][1] and not result['lost'][0]
+        move_times.extend(result['move_times'])
+        print(f"game {i + 1}: {result['moves']} pairs, scores {result['scores']}, lost {result['lost']}")
+    elapsed = time.perf_counter() - start
+
+    move_times.sort()
+    simulations = bot.simulations + opponent.simulations
+    hit_rate = bot.table_hits / bot.table_lookups if bot.table_lookups else 0.0
+    print(f"depth 2 wins: {wins}/{args.games}")
+    print(f"cascades simulated: {simulations}  ({simulations / elapsed:,.0f}/s)  "
+          f"table hit rate: {hit_rate:.1%}")
+    print(f"move time: mean {sum(move_times) / len(move_times) * 1000:.2f}ms  "
+          f"p99 {move_times[int(len(move_times) * 0.99)] * 1000:.2f}ms  "
+          f"max {move_times[-1] * 1000:.2f}ms  (budget {args.budget * 1000:.1f}ms)")
+
+
+if __name__ == '__main__':
+    main()
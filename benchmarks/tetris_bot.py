@@ -0,0 +1,69 @@
+"""
+Benchmark the Tetris CPU player.
+
+Plays headless games with TetrisBot and reports placements evaluated per
+second and how long each move's search took against the per-move time
+budget.
+
+    python -m benchmarks.tetris_bot --games 5 --budget 0.005
+"""
+import argparse
+import time
+from games.tetris_bot import TetrisBot
+from games.tetris_game import TetrisGame
+from games.tetris_matching_strategy import TetrisMatchingStrategy
+from tgme.player import Player
+from tgme.player_profile import PlayerProfile
+
+
+def play_game(bot: TetrisBot, seed: int, max_moves: int) -> dict:
+    game = TetrisGame(
+        game_id='Tetris',
+        players=[Player(PlayerProfile('CPU'))],
+        controls=[{}],
+        matching_strategy=TetrisMatchingStrategy(),
+        seed=seed
+    )
+    game.init()
+
+    move_times = []
+    while not game.game_over[0] and len(move_times) < max_moves:
+        start = time.perf_counter()
+        placement = bot.choose_move(game, 0)
+        move_times.append(time.perf_counter() - start)
+        if placement is None:
+            break
+        for action in placement.actions:
+            game.dispatch_action(0, action)
+    return {'moves': len(move_times), 'score': game.scores[0], 'move_times': move_times}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--games', type=int, default=3)
+    parser.add_argument('--moves', type=int, default=500, help="Stop each game after this many pieces")
+    parser.add_argument('--budget', type=float, default=0.005, help="Seconds per move")
+    parser.add_argument('--no-next', action='store_true', help="Do not look ahead to the next piece")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    bot = TetrisBot(use_next_piece=not args.no_next, time_budget=args.budget)
+    move_times, moves, scores = [], 0, []
+    start = time.perf_counter()
+    for i in range(args.games):
+        result = play_game(bot, args.seed + i, args.moves)
+        moves += result['moves']
+        scores.append(result['score'])
+        move_times.extend(result['move_times'])
+    elapsed = time.perf_counter() - start
+
+    move_times.sort()
+    print(f"games: {args.games}  pieces: {moves}  scores: {scores}")
+    print(f"placements evaluated: {bot.evaluations}  ({bot.evaluations / elapsed:,.0f}/s)")
+    print(f"move time: mean {sum(move_times) / len(move_times) * 1000:.2f}ms  "
+          f"p99 {move_times[int(len(move_times) * 0.99)] * 1000:.2f}ms  "
+          f"max {move_times[-1] * 1000:.2f}ms  (budget {args.budget * 1000:.1f}ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+Tune CPU player evaluation weights with the cross-entropy method.
+
+Every generation samples weight vectors from a normal distribution, plays
+the same seeded headless games with each one across a process pool, and
+refits the distribution to the best scoring vectors. Progress is saved to
+a JSON checkpoint after every generation, and running again with the same
+checkpoint resumes from it.
+
+    python -m benchmarks.tune_bot tetris --generations 20 --population 24 --games 4
+    python -m benchmarks.tune_bot puzzle_fighter --checkpoint data/tuning/pf.json
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, fields
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from games.puzzle_fighter_bot import PuzzleFighterBot, PuzzleFighterBotWeights
+from games.puzzle_fighter_game import PuzzleFighterGame
+from games.puzzle_fighter_matching_strategy import PuzzleFighterMatchingStrategy
+from games.tetris_bot import TetrisBot, TetrisBotWeights
+from games.tetris_game import TetrisGame
+from games.tetris_matching_strategy import TetrisMatchingStrategy
+from tgme.player import Player
+from tgme.player_profile import PlayerProfile
+from tgme.utils.game_random import GameRandom
+from tgme.utils.logger import TMGELogger
+
+CHECKPOINT_VERSION = 1
+
+
+def play_tetris(weights: Dict[str, float], seed: int, max_moves: int, lookahead: bool) -> float:
+    """Score of one single player Tetris game"""
+    game = TetrisGame(
+        game_id='Tetris',
+        players=[Player(PlayerProfile('CPU'))],
+        controls=[{}],
+        matching_strategy=TetrisMatchingStrategy(),
+        seed=seed
+    )
+    game.init()
+    # No time limit, so the result only depends on the weights and the seed
+    bot = TetrisBot(TetrisBotWeights(**weights), use_next_piece=lookahead, time_budget=math.inf)
+    for _ in range(max_moves):
+        if game.game_over[0] or bot.play_move(game, 0) is None:
+            break
+    return float(game.scores[0])
+
+
+def play_puzzle_fighter(weights: Dict[str, float], seed: int, max_moves: int, lookahead: bool) -> float:
+    """Attack rows sent in one single player Puzzle Fighter game"""
+    game = PuzzleFighterGame(
+        game_id='Puzzle Fighter',
+        players=[Player(PlayerProfile('CPU'))],
+        controls=[{}],
+        matching_strategy=PuzzleFighterMatchingStrategy(),
+        seed=seed
+    )
+    game.init()
+    bot = PuzzleFighterBot(PuzzleFighterBotWeights(**weights), depth=2 if lookahead else 1, time_budget=math.inf)
+    sent = 0
+    for _ in range(max_moves):
+        placement = None if game.game_over[0] else bot.play_move(game, 0)
+        if placement is None:
+            break
+        # A single player game sends its rows nowhere, the simulator counts them the same way
+        sent += placement.outcome.attack_rows
+        game.check_loss_condition()
+    return float(sent)
+
+
+# Name: (weights class, function playing one game)
+TUNABLE_BOTS: Dict[str, Tuple[type, Callable[[Dict[str, float], int, int, bool], float]]] = {
+    'tetris': (TetrisBotWeights, play_tetris),
+    'puzzle_fighter': (PuzzleFighterBotWeights, play_puzzle_fighter),
+}
+
+
+def _init_worker() -> None:
+    # Thousands of games are played, keep their per-game log lines out of the report
+    TMGELogger().set_level(logging.WARNING)
+
+
+def _play(task: Tuple[str, Dict[str, float], int, int, bool]) -> float:
+    name, weights, seed, max_moves, lookahead = task
+    return TUNABLE_BOTS[name][1](weights, seed, max_moves, lookahead)
+
+
+class CrossEntropyTuner:
+    '''
+    Cross-entropy method over a bot's weights dataclass.
+
+    Candidates of one generation play the same seeds, so differences in
+    fitness come from the weights rather than the pieces dealt.
+    '''
+    def __init__(self, name: str, population: int = 24, elite_fraction: float = 0.25, games: int = 4,
+                 max_moves: int = 300, lookahead: bool = False, seed: int = 1, extra_noise: float = 0.1) -> None:
+        """
+        __init__
+
+        Args:
+            name (str): A key of TUNABLE_BOTS
+            population (int): Weight vectors sampled per generation
+            elite_fraction (float): Fraction of the best vectors the distribution is refit to
+            games (int): Seeded games each vector plays per generation
+            max_moves (int): Pieces per game
+            lookahead (bool): Whether the bot searches the next piece, slower but closer to play
+            seed (int): Seed for sampling and for the games' seeds
+            extra_noise (float): Added to the standard deviation after each refit, scaled down
+                every generation, so the search does not collapse too early
+
+        Returns:
+            None
+        """
+        if name not in TUNABLE_BOTS:
+            raise ValueError(f"Unknown bot: {name}")
+        if population < 2 or not 0 < elite_fraction <= 1:
+            raise ValueError("Population must be at least 2 and the elite fraction in (0, 1]")
+
+        self.name = name
+        self.population = population
+        self.elite_count = max(1, int(population * elite_fraction))
+        self.games = games
+        self.max_moves = max_moves
+        self.lookahead = lookahead
+        self.extra_noise = extra_noise
+
+        defaults = asdict(TUNABLE_BOTS[name][0]())
+        self.keys: List[str] = [field.name for field in fields(TUNABLE_BOTS[name][0])]
+        self.mean: List[float] = [defaults[key] for key in self.keys]
+        self.std: List[float] = [max(abs(value), 0.1) * 0.5 for value in self.mean]
+        self.rng = GameRandom(seed)
+        self.seed = seed
+        self.generation = 0
+        self.best_weights: Dict[str, float] = dict(defaults)
+        self.best_fitness: Optional[float] = None
+        self.history: List[Dict[str, Any]] = []
+
+    def save(self, path: str) -> None:
+        """Write the tuner's state to a JSON checkpoint"""
+        data = {
+            'version': CHECKPOINT_VERSION,
+            'name': self.name,
+            'generation': self.generation,
+            'keys': self.keys,
+            'mean': self.mean,
+            'std': self.std,
+            'rng': list(self.rng.getstate()),
+            'best_weights': self.best_weights,
+            'best_fitness': self.best_fitness,
+            'history': self.history
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_file = f"{path}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_file, path)
+
+    def load(self, path: str) -> None:
+        """Resume from a checkpoint written by save"""
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version: {data.get('version')}")
+        if data['name'] != self.name or data['keys'] != self.keys:
+            raise ValueError(f"Checkpoint is for different weights: {path}")
+
+        self.generation = data['generation']
+        self.mean = data['mean']
+        self.std = data['std']
+        self.rng.setstate(tuple(data['rng']))
+        self.best_weights = data['best_weights']
+        self.best_fitness = data['best_fitness']
+        self.history = data['history']
+
+    def sample(self) -> List[Dict[str, float]]:
+        """Draw a generation of weight vectors, the first one is the current mean"""
+        candidates = [dict(zip(self.keys, self.mean))]
+        while len(candidates) < self.population:
+            candidates.append({
+                key: self.rng.gauss(mean, std) for key, mean, std in zip(self.keys, self.mean, self.std)
+            })
+        return candidates
+
+    def step(self, executor: ProcessPoolExecutor) -> Dict[str, Any]:
+        """
+        step runs one generation
+
+        Args:
+            executor (ProcessPoolExecutor): Plays the games
+
+        Returns:
+            report (Dict[str, Any]): The generation's fitness, games played and games per second
+        """
+        candidates = self.sample()
+        seeds = [self.seed * 1000003 + self.generation * self.games + i for i in range(self.games)]
+        tasks = [
+            (self.name, weights, seed, self.max_moves, self.lookahead)
+            for weights in candidates for seed in seeds
+        ]
+
+        start = time.perf_counter()
+        results = list(executor.map(_play, tasks))
+        elapsed = time.perf_counter() - start
+
+        fitness = [sum(results[i * self.games:(i + 1) * self.games]) / self.games for i in range(len(candidates))]
+        ranked = sorted(range(len(candidates)), key=lambda i: fitness[i], reverse=True)
+        elites = [candidates[i] for i in ranked[:self.elite_count]]
+
+        # Refit the distribution to the elites
+        noise = self.extra_noise / (1 + self.generation)
+        for k, key in enumerate(self.keys):
+            values = [elite[key] for elite in elites]
+            mean = sum(values) / len(values)
+            variance = sum((value - mean) ** 2 for value in values) / len(values)
+            self.mean[k] = mean
+            self.std[k] = math.sqrt(variance) + noise * max(abs(mean), 0.1)
+
+        top = ranked[0]
+        if self.best_fitness is None or fitness[top] > self.best_fitness:
+            self.best_fitness = fitness[top]
+            self.best_weights = candidates[top]
+
+        self.generation += 1
+        report = {
+            'generation': self.generation,
+            'best': fitness[top],
+            'mean': sum(fitness) / len(fitness),
+            'games': len(tasks),
+            'games_per_second': len(tasks) / elapsed if elapsed > 0 else float('inf')
+        }
+        self.history.append(report)
+        return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('bot', choices=sorted(TUNABLE_BOTS))
+    parser.add_argument('--generations', type=int, default=20, help="Generations to run, including resumed ones")
+    parser.add_argument('--population', type=int, default=24)
+    parser.add_argument('--elite', type=float, default=0.25, help="Fraction of each generation to refit to")
+    parser.add_argument('--games', type=int, default=4, help="Games per weight vector per generation")
+    parser.add_argument('--moves', type=int, default=300, help="Pieces per game")
+    parser.add_argument('--lookahead', action='store_true', help="Search the next piece while tuning")
+    parser.add_argument('--workers', type=int, default=None, help="Processes, one per CPU if not set")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--checkpoint', default=None, help="JSON file to save to and resume from")
+    args = parser.parse_args(argv)
+
+    checkpoint = args.checkpoint or os.path.join('data', 'tuning', f"{args.bot}.json")
+    tuner = CrossEntropyTuner(args.bot, args.population, args.elite, args.games, args.moves, args.lookahead, args.seed)
+    if os.path.exists(checkpoint):
+        tuner.load(checkpoint)
+        print(f"Resuming {args.bot} from generation {tuner.generation} ({checkpoint})")
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as executor:
+        while tuner.generation < args.generations:
+            report = tuner.step(executor)
+            tuner.save(checkpoint)
+            print(f"generation {report['generation']}: best {report['best']:.1f}  mean {report['mean']:.1f}  "
+                  f"({report['games']} games, {report['games_per_second']:.1f} games/s)")
+            print(f"  best so far {tuner.best_fitness:.1f}: "
+                  + ", ".join(f"{key}={value:.4g}" for key, value in tuner.best_weights.items()))
+
+
+if __name__ == '__main__':
+    main()
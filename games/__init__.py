@@ -0,0 +1,23 @@
+# Game metadata only, the game modules are imported when a game is launched
+from tgme.plugins import GamePlugin, register_plugin
+
+register_plugin(GamePlugin(
+    game_id='Tetris',
+    min_players=1,
+    max_players=2,
+    rows=20,
+    columns=10,
+    entry_point='games.tetris_game:TetrisGame',
+    matching_strategy='games.tetris_matching_strategy:TetrisMatchingStrategy',
+    bot='games.tetris_bot:TetrisBot'
+))
+register_plugin(GamePlugin(
+    game_id='Puzzle Fighter',
+    min_players=1,
+    max_players=2,
+    rows=12,
+    columns=6,
+    entry_point='games.puzzle_fighter_game:PuzzleFighterGame',
+    matching_strategy='games.puzzle_fighter_matching_strategy:PuzzleFighterMatchingStrategy',
+    bot='games.puzzle_fighter_bot:PuzzleFighterBot'
+))
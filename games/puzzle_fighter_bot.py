@@ -0,0 +1,442 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from games.puzzle_fighter_piece import PuzzleFighterPiece
+from tgme.cpu_player import AnytimeSearch
+from tgme.interfaces import ICPUPlayer
+
+# Cells are small ints: 0 is empty, otherwise (color index + 1) << 2 | kind
+GEM, POWER, BLOCK = 1, 2, 3
+KINDS = {'gem': GEM, 'power': POWER}
+CONNECTOR_OFFSETS = {'right': (1, 0), 'down': (0, 1), 'left': (-1, 0), 'up': (0, -1)}
+CLOCKWISE = {'right': 'down', 'down': 'left', 'left': 'up', 'up': 'right'}
+WALL_KICKS = (-1, 1)    # Same order as PuzzleFighterGame._rotate_piece
+
+_COLOR_INDEX: Dict[str, int] = {}
+
+
+def cell_code(tile_type: str, color: str) -> int:
+    """Compact code for a tile, colors are numbered as they are first seen"""
+    index = _COLOR_INDEX.setdefault(color, len(_COLOR_INDEX))
+    return (index + 1) << 2 | KINDS.get(tile_type, BLOCK)
+
+
+def encode_grid(grid) -> Tuple[int, ...]:
+    """Flatten a Grid row by row into cell codes"""
+    return tuple(
+        0 if tile is None else cell_code(tile.tile_type, tile.tile_color)
+        for row in grid.tiles for tile in row
+    )
+
+
+@dataclass
+class PuzzleFighterBotWeights:
+    '''Weights of the placement evaluation.'''
+    attack: float = 10.0        # Per garbage row sent
+    score: float = 0.01         # Per point scored
+    adjacency: float = 0.5      # Per pair of touching gems of one color, i.e. groups being built
+    height: float = -0.1        # Per occupied cell above the floor, summed over columns squared
+    danger: float = -20.0       # When the spawn columns are nearly full
+
+
+@dataclass
+class Outcome:
+    '''The result of dropping a piece: the new board and what it earned.'''
+    cells: Tuple[int, ...]
+    combo: int
+    score: int
+    attack_rows: int
+    cleared: int
+    game_over: bool
+
+
+@dataclass
+class Placement:
+    '''A reachable resting place for the current piece and how to get there.'''
+    rotations: int
+    shift: int      # Columns to move, negative is left
+    falls: int      # Rows to fall before the piece lands
+    outcome: Outcome
+    value: float = 0.0
+
+    @property
+    def actions(self) -> List[str]:
+        direction = 'left' if self.shift < 0 else 'right'
+        # The last 'down' fails and freezes the piece, as in the game
+        return ['rotate'] * self.rotations + [direction] * abs(self.shift) + ['down'] * (self.falls + 1)
+
+
+def _pack(placement: Placement) -> tuple:
+    # A tuple of plain values, which the garbage collector stops tracking, so full
+    # collections do not have to walk the whole transposition table
+    outcome = placement.outcome
+    return (placement.rotations, placement.shift, placement.falls, outcome.cells, outcome.combo,
+            outcome.score, outcome.attack_rows, outcome.cleared, outcome.game_over)
+
+
+def _unpack(entry: tuple) -> Placement:
+    return Placement(entry[0], entry[1], entry[2], Outcome(*entry[3:]))
+
+
+class PuzzleFighterSimulator:
+    '''
+    Replays PuzzleFighterGame's freeze, gravity, power gem, match and chain
+    reaction rules on flat tuples of cell codes.
+    '''
+    def __init__(self, rows: int = 12, columns: int = 6) -> None:
+        self.rows = rows
+        self.columns = columns
+
+    def _gravity(self, cells: List[int]) -> None:
+        rows, columns = self.rows, self.columns
+        for x in range(columns):
+            stack = [cells[y * columns + x] for y in range(rows - 1, -1, -1) if cells[y * columns + x]]
+            stack.extend([0] * (rows - len(stack)))
+            for i, y in enumerate(range(rows - 1, -1, -1)):
+                cells[y * columns + x] = stack[i]
+
+    def _flood(self, cells: List[int], start: int, visited: Set[int]) -> Set[int]:
+        """Cells of the same color connected to start, like _find_adjacent_matches"""
+        columns = self.columns
+        color = cells[start] >> 2
+        group, stack = set(), [start]
+        while stack:
+            index = stack.pop()
+            if index in visited:
+                continue
+            code = cells[index]
+            if not code or code >> 2 != color:
+                continue
+            visited.add(index)
+            group.add(index)
+            x = index % columns
+            if index + columns < len(cells):
+                stack.append(index + columns)
+            if x + 1 < columns:
+                stack.append(index + 1)
+            if index >= columns:
+                stack.append(index - columns)
+            if x > 0:
+                stack.append(index - 1)
+        return group
+
+    def _matches(self, cells: List[int]) -> Set[int]:
+        """Cells the matching strategy would clear: groups of 3+ found from a gem"""
+        visited: Set[int] = set()
+        crashes: Set[int] = set()
+        for index, code in enumerate(cells):
+            if index not in visited and code and code & 3 == GEM:
+                group = self._flood(cells, index, visited)
+                if len(group) >= 3:
+                    crashes |= group
+        return crashes
+
+    def _chain(self, cells: List[int], crashes: Set[int], state: dict) -> None:
+        """Same as PuzzleFighterGame._check_chain_reaction"""
+        cleared = 0
+        while crashes:
+            for index in crashes:
+                if cells[index]:
+                    cells[index] = 0
+                    cleared += 1
+            self._gravity(cells)
+            crashes = self._matches(cells)
+            if crashes:
+                state['combo'] += 1
+                state['score'] += 100 * len(crashes) * state['combo']
+        state['cleared'] += cleared
+        if cleared >= 4:
+            state['attack_rows'] += min(cleared // 5 + state['combo'] // 3, 3)
+
+    def drop(self, cells: Tuple[int, ...], gems: List[Tuple[int, int, int]], combo: int) -> Outcome:
+        """
+        drop
+
+        Args:
+            cells (Tuple[int, ...]): The board before the piece freezes
+            gems (List[Tuple[int, int, int]]): (x, y, code) of the piece's gems where it lands,
+                main gem first
+            combo (int): The player's combo counter
+
+        Returns:
+            outcome (Outcome): The board and rewards after every cascade has finished
+        """
+        rows, columns = self.rows, self.columns
+        board = list(cells)
+        for x, y, code in gems:
+            if y >= 0:
+                board[y * columns + x] = code
+        self._gravity(board)
+        state = {'combo': combo, 'score': 0, 'attack_rows': 0, 'cleared': 0}
+
+        # Power gems clear every gem of their color
+        for index in range(rows * columns):
+            code = board[index]
+            if not code or code & 3 != POWER:
+                continue
+            color = code >> 2
+            crashes = {i for i, other in enumerate(board) if other and other >> 2 == color}
+            for i in crashes:
+                board[i] = 0
+            if crashes:
+                state['combo'] += 1
+                self._chain(board, crashes, state)
+
+        # Then groups touching where the piece's gems were placed
+        for x, y, _ in gems:
+            if y >= 0:
+                index = y * columns + x
+                code = board[index]
+                if code and code & 3 == GEM:
+                    group = self._flood(board, index, set())
+                    if len(group) >= 3:
+                        self._chain(board, group, state)
+
+        # The game is lost when anything is left in the top row, which covers the spawn cells
+        game_over = any(board[:columns])
+        return Outcome(tuple(board), state['combo'], state['score'], state['attack_rows'], state['cleared'], game_over)
+
+
+class PuzzleFighterBot(ICPUPlayer):
+    '''
+    CPU player for PuzzleFighterGame.
+
+    Every column and rotation of the current pair is simulated through the
+    full cascade, then refined with the best follow-up of the next pair
+    (depth 2), best candidates first, until the time budget runs out.
+    Expansions are memoised in a transposition table keyed by board, pair
+    and position, so boards reached again, including the whole depth 2
+    layer when that pair becomes the current one, are not simulated twice.
+    search runs the same search one step at a time, for CPUController.
+    '''
+    def __init__(self, weights: Optional[PuzzleFighterBotWeights] = None, depth: int = 2,
+                 time_budget: float = 0.012, table_size: int = 200000) -> None:
+        """
+        __init__
+
+        Args:
+            weights (Optional[PuzzleFighterBotWeights]): Evaluation weights, the defaults if None
+            depth (int): 1 for the current pair only, 2 to include the next pair
+            time_budget (float): Seconds one move may take
+            table_size (int): Expansions kept in the transposition table before it is cleared
+
+        Returns:
+            None
+        """
+        self.weights = weights or PuzzleFighterBotWeights()
+        self.depth = depth
+        self.time_budget = time_budget
+        self.table_size = table_size
+        self.simulator = PuzzleFighterSimulator()
+        # Expansions as tuples of _pack tuples, see _pack
+        self._table: Dict[tuple, Tuple[tuple, ...]] = {}
+        self._values: Dict[Tuple[int, ...], float] = {}
+        # Longest step of the last search, table hits make some steps far cheaper than others
+        self._longest_step = 0.0
+        # Counters for benchmarking
+        self.simulations = 0
+        self.table_hits = 0
+        self.table_lookups = 0
+
+    def _resize(self, rows: int, columns: int) -> None:
+        if (rows, columns) != (self.simulator.rows, self.simulator.columns):
+            self.simulator = PuzzleFighterSimulator(rows, columns)
+            self._table.clear()
+            self._values.clear()
+
+    def expand(self, cells: Tuple[int, ...], main: int, sub: int, x: int, y: int,
+               connector: str, combo: int) -> List[Placement]:
+        """
+        expand
+
+        Args:
+            cells (Tuple[int, ...]): The board
+            main (int): Cell code of the main gem
+            sub (int): Cell code of the connector gem
+            x (int): Column of the main gem
+            y (int): Row of the main gem
+            connector (str): Where the connector gem is, e.g. right
+            combo (int): The player's combo counter
+
+        Returns:
+            placements (List[Placement]): Every distinct reachable placement, simulated
+        """
+        key = (cells, main, sub, x, y, connector, combo)
+        self.table_lookups += 1
+        cached = self._table.get(key)
+        if cached is not None:
+            self.table_hits += 1
+            return [_unpack(entry) for entry in cached]
+
+        rows, columns = self.simulator.rows, self.simulator.columns
+
+        def fits(px: int, py: int, conn: str) -> bool:
+            dx, dy = CONNECTOR_OFFSETS[conn]
+            for gx, gy in ((px, py), (px + dx, py + dy)):
+                if not (0 <= gx < columns and gy < rows):
+                    return False
+                if gy >= 0 and cells[gy * columns + gx]:
+                    return False
+            return True
+
+        placements, seen = [], set()
+        for rotations in range(4):
+            if rotations:
+                turned = CLOCKWISE[connector]
+                for kick in (0,) + WALL_KICKS:
+                    if fits(x + kick, y, turned):
+                        connector, x = turned, x + kick
+                        break
+                else:
+                    # The rotation fails here, so further rotations would too
+                    break
+
+            for direction in (-1, 1):
+                shift = 0
+                while True:
+                    px = x + shift
+                    py = y
+                    while fits(px, py + 1, connector):
+                        py += 1
+                    dx, dy = CONNECTOR_OFFSETS[connector]
+                    gems = [(px, py, main), (px + dx, py + dy, sub)]
+                    landing = (px, py, connector)
+                    if landing not in seen:
+                        seen.add(landing)
+                        self.simulations += 1
+                        outcome = self.simulator.drop(cells, gems, combo)
+                        placements.append(Placement(rotations, shift, py - y, outcome))
+                    if not fits(px + direction, y, connector):
+                        break
+                    shift += direction
+
+        if len(self._table) >= self.table_size:
+            self._table.clear()
+            self._values.clear()
+        self._table[key] = tuple(_pack(placement) for placement in placements)
+        return placements
+
+    def evaluate(self, cells: Tuple[int, ...]) -> float:
+        """Heuristic value of a board, memoised by board"""
+        value = self._values.get(cells)
+        if value is not None:
+            return value
+
+        rows, columns = self.simulator.rows, self.simulator.columns
+        weights = self.weights
+        adjacency, height_penalty = 0, 0
+        for x in range(columns):
+            height = 0
+            for y in range(rows):
+                code = cells[y * columns + x]
+                if not code:
+                    continue
+                if not height:
+                    height = rows - y
+                if code & 3 != BLOCK:
+                    if x + 1 < columns and cells[y * columns + x + 1] >> 2 == code >> 2:
+                        adjacency += 1
+                    if y + 1 < rows and cells[(y + 1) * columns + x] >> 2 == code >> 2:
+                        adjacency += 1
+            height_penalty += height * height
+        danger = any(cells[2 * columns + x] for x in (3, 4))
+        value = (weights.adjacency * adjacency + weights.height * height_penalty
+                 + (weights.danger if danger else 0.0))
+        self._values[cells] = value
+        return value
+
+    def _reward(self, outcome: Outcome) -> float:
+        if outcome.game_over:
+            return -1e9
+        return self.weights.attack * outcome.attack_rows + self.weights.score * outcome.score
+
+    def search_placements(self, cells: Tuple[int, ...], piece: PuzzleFighterPiece, combo: int,
+                          next_piece: Optional[PuzzleFighterPiece] = None) -> Iterator[Optional[Placement]]:
+        """
+        search_placements
+
+        Args:
+            cells (Tuple[int, ...]): The board, see encode_grid
+            piece (PuzzleFighterPiece): The pair to place, at its current position
+            combo (int): The player's combo counter
+            next_piece (Optional[PuzzleFighterPiece]): The pair that spawns after it, if known
+
+        Returns:
+            placements (Iterator[Optional[Placement]]): The best placement so far after each
+                placement evaluated or refined, None while there is none
+        """
+        candidates = self.expand(
+            cells, cell_code(piece.main_tile.tile_type, piece.main_color), cell_code('gem', piece.sub_color),
+            piece.x, piece.y, piece.connector_position, combo
+        )
+        best = None
+        for candidate in candidates:
+            candidate.value = self._reward(candidate.outcome) + self.evaluate(candidate.outcome.cells)
+            if best is None or candidate.value > best.value:
+                best = candidate
+            yield best
+
+        if self.depth < 2 or next_piece is None:
+            return
+
+        main = cell_code(next_piece.main_tile.tile_type, next_piece.main_color)
+        sub = cell_code('gem', next_piece.sub_color)
+        best_value = None
+        for candidate in sorted(candidates, key=lambda candidate: candidate.value, reverse=True):
+            outcome = candidate.outcome
+            if not outcome.game_over:
+                follow_ups = self.expand(outcome.cells, main, sub, next_piece.x, next_piece.y,
+                                         next_piece.connector_position, outcome.combo)
+                yield best
+                value = self._reward(outcome) + max(
+                    (self._reward(follow_up.outcome) + self.evaluate(follow_up.outcome.cells) for follow_up in follow_ups),
+                    default=self.evaluate(outcome.cells)
+                )
+                if best_value is None or value > best_value:
+                    best, best_value = candidate, value
+            yield best
+
+    def choose_placement(self, cells: Tuple[int, ...], piece: PuzzleFighterPiece, combo: int,
+                         next_piece: Optional[PuzzleFighterPiece] = None) -> Optional[Placement]:
+        """
+        choose_placement
+
+        Args:
+            cells (Tuple[int, ...]): The board, see encode_grid
+            piece (PuzzleFighterPiece): The pair to place, at its current position
+            combo (int): The player's combo counter
+            next_piece (Optional[PuzzleFighterPiece]): The pair that spawns after it, if known
+
+        Returns:
+            placement (Optional[Placement]): The best placement found within the time budget
+        """
+        deadline = time.perf_counter() + self.time_budget
+        return self._run(self.search_placements(cells, piece, combo, next_piece), deadline)
+
+    def search(self, game, player: int) -> Iterator[Optional[Placement]]:
+        """Anytime search for a player's current pair in a PuzzleFighterGame, see search_placements"""
+        piece = game.current_pieces[player]
+        if piece is None or game.game_over[player]:
+            return iter(())
+        grid = game.grids[player]
+        self._resize(grid.rows, grid.columns)
+        next_piece = game.next_pieces[player] if self.depth >= 2 else None
+        return self.search_placements(encode_grid(grid), piece, game.combo_counters[player], next_piece)
+
+    def choose_move(self, game, player: int) -> Optional[Placement]:
+        """Choose a placement for a player's current pair in a PuzzleFighterGame"""
+        return self._run(self.search(game, player), time.perf_counter() + self.time_budget)
+
+    def _run(self, steps: Iterator[Optional[Placement]], deadline: float) -> Optional[Placement]:
+        search = AnytimeSearch(steps, self._longest_step)
+        best = search.run(deadline)
+        self._longest_step = search.longest_step
+        return best
+
+    def play_move(self, game, player: int) -> Optional[Placement]:
+        """Choose a placement and perform it through the game's normal input path"""
+        placement = self.choose_move(game, player)
+        if placement is not None:
+            for action in placement.actions:
+                game.dispatch_action(player, action)
+        return placement
@@ -1,53 +1,88 @@
-import random
-from typing import List, Set, Tuple
-import time
+import copy
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
 from tgme.game import Game
 from tgme.player import Player
 from tgme.tile import Tile
 from tgme.grid import Grid
 from tgme.interfaces import IMatchingStrategy
+from tgme.trace import ATTACK_RECEIVED, ATTACK_SENT, CASCADE_STEP, PIECE_LOCK, PIECE_SPAWN
 from games.puzzle_fighter_piece import PuzzleFighterPiece
 
-import random
-from typing import List, Set, Tuple
-import time
-from tgme.game import Game
-from tgme.player import Player
-from tgme.tile import Tile
-from tgme.grid import Grid
-from tgme.interfaces import IMatchingStrategy
-from games.puzzle_fighter_piece import PuzzleFighterPiece
-import os
 
 class PuzzleFighterGame(Game):
     min_players = 1
     max_players = 2
     
-    def __init__(self, game_id: str, players: List[Player], controls, matching_strategy: IMatchingStrategy) -> None:
-        super().__init__(game_id, 12, 6, players, controls=controls, matching_strategy=matching_strategy)
+    def __init__(self, game_id: str, players: List[Player], controls, matching_strategy: IMatchingStrategy, seed: Optional[int] = None) -> None:
+        super().__init__(game_id, 12, 6, players, controls=controls, matching_strategy=matching_strategy, seed=seed)
         
         # Create grids for each player
         self.grids = [Grid(12, 6) for _ in range(len(players))]
         self.current_pieces = [None] * len(players)
+        self.next_pieces = [None] * len(players)     # Preview of each player's next piece
         self.scores = [0] * len(players)
         self.fall_times = [0] * len(players)
         self.fall_speed = 0.5
-        self.last_falls = [time.time()] * len(players)
+        self.last_falls = [0] * len(players)   # Tick of each player's last fall
         self.game_over = [False] * len(players)
         self.combo_counters = [0] * len(players)
         self.music_path = os.path.join(os.path.dirname(__file__), '..', 'music', "Sonic_1_Music_ Marble_Zone.mp3")
         
         # Add attack queue
-        self.pending_attacks = [[], []]  # List of rows to add for each player
+        self.pending_attacks = [[] for _ in range(len(players))]  # List of rows to add for each player
         
         self.logger.debug("PuzzleFighter initialized with attack system")
 
     def initialize_game(self) -> None:
         """Start a new game"""
-        self.current_pieces = [PuzzleFighterPiece() for _ in range(len(self.players))]
+        self.current_pieces = [PuzzleFighterPiece(self.rng) for _ in range(len(self.players))]
+        self.next_pieces = [PuzzleFighterPiece(self.rng) for _ in range(len(self.players))]
         self.scores = [0] * len(self.players)
         self.game_over = [False] * len(self.players)
         self.combo_counters = [0] * len(self.players)
+        self.pending_attacks = [[] for _ in range(len(self.players))]
+        self.last_falls = [self.tick] * len(self.players)
+        for player in range(len(self.players)):
+            self.trace_event(PIECE_SPAWN, player)
+
+    def snapshot_state(self) -> Dict[str, Any]:
+        """Copy the state outside the grids, placed tiles are never changed so they are shared"""
+        return {
+            'current_pieces': [copy.copy(piece) for piece in self.current_pieces],
+            'next_pieces': [copy.copy(piece) for piece in self.next_pieces],
+            'scores': list(self.scores),
+            'game_over': list(self.game_over),
+            'combo_counters': list(self.combo_counters),
+            'pending_attacks': [list(attacks) for attacks in self.pending_attacks],
+            'last_falls': list(self.last_falls),
+            'fall_speed': self.fall_speed
+        }
+
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        """Put back state from snapshot_state, copying it so the snapshot can be reused"""
+        self.current_pieces = [copy.copy(piece) for piece in state['current_pieces']]
+        self.next_pieces = [copy.copy(piece) for piece in state['next_pieces']]
+        self.scores = list(state['scores'])
+        self.game_over = list(state['game_over'])
+        self.combo_counters = list(state['combo_counters'])
+        self.pending_attacks = [list(attacks) for attacks in state['pending_attacks']]
+        self.last_falls = list(state['last_falls'])
+        self.fall_speed = state['fall_speed']
+
+    def encode_state(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(
+            state,
+            current_pieces=[piece and piece.to_dict() for piece in state['current_pieces']],
+            next_pieces=[piece and piece.to_dict() for piece in state['next_pieces']]
+        )
+
+    def decode_state(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(
+            data,
+            current_pieces=[piece and PuzzleFighterPiece.from_dict(piece) for piece in data['current_pieces']],
+            next_pieces=[piece and PuzzleFighterPiece.from_dict(piece) for piece in data['next_pieces']]
+        )
 
     def _check_chain_reaction(self, player: int, crash_positions: Set[Tuple[int, int]]) -> None:
         """Check for chain reactions and generate attacks"""
@@ -58,33 +93,44 @@ class PuzzleFighterGame(Game):
             crash_positions = set()
 
             # First, remove all gems in current crash positions
+            removed = 0
             for x, y in current_crashes:
-                tile = self.grids[player].get_tile(y, x)
-                if tile:
-                    self.grids[player].tiles[y][x] = None
-                    total_gems_cleared += 1
+                if self.grids[player].remove_tile(y, x):
+                    removed += 1
+            total_gems_cleared += removed
+            self.trace_event(CASCADE_STEP, player, removed)
 
             # Then check for any gems that should fall
             self._apply_gravity(player)
 
-            # Look for new matches after gems have fallen
+            # Look for new matches after gems have fallen. The strategy returns
+            # tiles, so map them back to their (x, y) positions
             matches = self.matching_strategy.match(self.grids[player])
-            for match in matches:
-                crash_positions.update([(tile.x, tile.y) for tile in match])
+            if matches:
+                grid = self.grids[player]
+                positions = {}
+                for y in range(grid.rows):
+                    for x in range(grid.columns):
+                        tile = grid.get_tile(y, x)
+                        if tile:
+                            positions[id(tile)] = (x, y)
+                for match in matches:
+                    crash_positions.update(positions[id(tile)] for tile in match)
 
             if crash_positions:
                 self.combo_counters[player] += 1
                 self.scores[player] += (100 * len(crash_positions) * self.combo_counters[player])
 
-        # Generate attack based on chain size and combo
-        if total_gems_cleared >= 4:
+        # Generate attack based on chain size and combo, a single player has no one to attack
+        if total_gems_cleared >= 4 and len(self.players) > 1:
             # Reduce attack strength to be more balanced
             attack_rows = (total_gems_cleared // 5) + (self.combo_counters[player] // 3)
             attack_rows = min(attack_rows, 3)  # Cap maximum attack rows
             
             opponent = 1 if player == 0 else 0
             self.pending_attacks[opponent].extend(['gray'] * attack_rows)
-            self.logger.info(f"Player {player + 1} sends {attack_rows} rows to opponent")
+            self.trace_event(ATTACK_SENT, player, attack_rows)
+            self.logger.info("Player %s sends %s rows to opponent", player + 1, attack_rows)
 
     def _apply_gravity(self, player: int) -> None:
         """Make gems fall to fill empty spaces"""
@@ -94,8 +140,7 @@ class PuzzleFighterGame(Game):
             for row in range(self.grids[player].rows - 1, -1, -1):
                 if self.grids[player].get_tile(row, col):
                     if empty_row != row:
-                        self.grids[player].tiles[empty_row][col] = self.grids[player].tiles[row][col]
-                        self.grids[player].tiles[row][col] = None
+                        self.grids[player].move_tile(row, col, empty_row, col)
                     empty_row -= 1
 
     def _process_power_gems(self, player: int) -> None:
@@ -114,31 +159,28 @@ class PuzzleFighterGame(Game):
                     for cx in range(self.grids[player].columns):
                         check_tile = self.grids[player].get_tile(cy, cx)
                         if check_tile and check_tile.tile_color == color:
-                            self.grids[player].tiles[cy][cx] = None
+                            self.grids[player].remove_tile(cy, cx)
                             crash_positions.add((cx, cy))
                 
                 if crash_positions:
                     self.combo_counters[player] += 1
                     self._check_chain_reaction(player, crash_positions)
 
-    def handle_key_press(self, event: object) -> None:
-        """Handle input for both players"""
-        key = getattr(event, 'keysym', None)
-        if not key:
+    def apply_action(self, player: int, action: str) -> None:
+        """Handle input for both players, keys are resolved to actions by Game.handle_key_press"""
+        if self.game_over[player] or not self.current_pieces[player]:
             return
 
-        for player in range(len(self.players)):
-            if not self.game_over[player] and self.current_pieces[player]:
-                if key == self.controls[player]['left']:
-                    self._move_piece(player, -1, 0)
-                elif key == self.controls[player]['right']:
-                    self._move_piece(player, 1, 0)
-                elif key == self.controls[player]['down']:
-                    self._move_piece(player, 0, 1)
-                elif key == self.controls[player]['rotate']:
-                    self._rotate_piece(player, True)
-                elif key == self.controls[player]['counter_rotate']:
-                    self._rotate_piece(player, False)
+        if action == 'left':
+            self._move_piece(player, -1, 0)
+        elif action == 'right':
+            self._move_piece(player, 1, 0)
+        elif action == 'down':
+            self._move_piece(player, 0, 1)
+        elif action == 'rotate':
+            self._rotate_piece(player, True)
+        elif action == 'counter_rotate':
+            self._rotate_piece(player, False)
 
     def _move_piece(self, player: int, dx: int, dy: int) -> bool:
         piece = self.current_pieces[player]
@@ -196,6 +238,8 @@ class PuzzleFighterGame(Game):
         if not piece:
             return
 
+        self.trace_event(PIECE_LOCK, player)
+
         # Place the gems
         for x, y, tile in piece.get_positions:
             if y >= 0:
@@ -218,11 +262,13 @@ class PuzzleFighterGame(Game):
 
         # Create new piece if game isn't over
         if not self.game_over[player]:
-            self.current_pieces[player] = PuzzleFighterPiece()
+            self.current_pieces[player] = self.next_pieces[player]
+            self.next_pieces[player] = PuzzleFighterPiece(self.rng)
+            self.trace_event(PIECE_SPAWN, player)
             # Check if new piece can be placed
             if not self._is_valid_position(player):
                 self.game_over[player] = True
-                self.logger.info(f"Player {player + 1} lost - board filled up!")
+                self.logger.info("Player %s lost - board filled up!", player + 1)
 
     def _process_attacks(self, player: int) -> None:
         """Process pending attacks for a player"""
@@ -238,22 +284,17 @@ class PuzzleFighterGame(Game):
         # Get the next attack row
         attack_color = self.pending_attacks[player].pop(0)
 
-        # Shift existing blocks up by one row
-        for row in range(0, self.grids[player].rows - 1):
-            for col in range(self.grids[player].columns):
-                self.grids[player].tiles[row][col] = self.grids[player].tiles[row + 1][col]
-
-        # Add attack row at bottom
+        # Build the attack row, adding one gap randomly
+        attack_row = []
         for col in range(self.grids[player].columns):
-            # Add one gap randomly in the attack row
-            if col == random.randint(0, self.grids[player].columns - 1):
-                self.grids[player].tiles[self.grids[player].rows - 1][col] = None
+            if col == self.rng.randint(0, self.grids[player].columns - 1):
+                attack_row.append(None)
             else:
-                self.grids[player].place_tile(
-                    Tile('block', 'locked', color=attack_color),
-                    self.grids[player].rows - 1,
-                    col
-                )
+                attack_row.append(Tile('block', 'locked', color=attack_color))
+
+        # Shift existing blocks up by one row and add the attack row at the bottom
+        self.grids[player].push_row(attack_row)
+        self.trace_event(ATTACK_RECEIVED, player, 1)
 
     def update(self) -> None:
         """Update game state with attacks"""
@@ -263,18 +304,19 @@ class PuzzleFighterGame(Game):
                 self._process_attacks(player)
         
         # Regular update
-        current_time = time.time()
+        self.tick += 1
+        fall_ticks = max(1, round(self.fall_speed * self.TICKS_PER_SECOND))
         for player in range(len(self.players)):
             if not self.game_over[player]:
-                if current_time - self.last_falls[player] > self.fall_speed:
+                if self.tick - self.last_falls[player] >= fall_ticks:
                     self._move_piece(player, 0, 1)
-                    self.last_falls[player] = current_time
+                    self.last_falls[player] = self.tick
 
     def check_win_condition(self) -> bool:
         """Check if someone has won"""
         if all(self.game_over):
             winner = 0 if self.scores[0] >= self.scores[1] else 1
-            self.logger.info(f"Player {winner + 1} wins with score {self.scores[winner]}")
+            self.logger.info("Player %s wins with score %s", winner + 1, self.scores[winner])
             return True
         return False
 
@@ -286,7 +328,7 @@ class PuzzleFighterGame(Game):
                 for x in range(self.grids[player].columns):
                     if self.grids[player].get_tile(0, x):
                         self.game_over[player] = True
-                        self.logger.info(f"Player {player + 1} lost - reached top!")
+                        self.logger.info("Player %s lost - reached top!", player + 1)
                         break
 
         return any(self.game_over)
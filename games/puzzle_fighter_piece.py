@@ -1,4 +1,4 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import random
 from tgme.tile import Tile, TileShape
 
@@ -6,13 +6,16 @@ class PuzzleFighterPiece:
     COLORS = ['red', 'blue', 'green', 'yellow']
     TYPES = ['gem', 'crash', 'power']
     
-    def __init__(self) -> None:
+    def __init__(self, rng: Optional[random.Random] = None) -> None:
+        # Games pass their own seeded generator so piece order can be replayed
+        rng = rng or random
+
         # Create main gem
-        self.main_color = random.choice(self.COLORS)
-        self.is_power = random.random() < 0.1  # 10% chance for power gem
+        self.main_color = rng.choice(self.COLORS)
+        self.is_power = rng.random() < 0.1  # 10% chance for power gem
         
         # Create connector gem (always regular gem)
-        self.sub_color = random.choice(self.COLORS)
+        self.sub_color = rng.choice(self.COLORS)
         
         # Position in grid
         self.x = 3  # Center of board
@@ -59,3 +62,32 @@ class PuzzleFighterPiece:
         """Move the piece"""
         self.x += dx
         self.y += dy
+
+    def to_dict(self) -> dict:
+        """Plain data for replay keyframes"""
+        return {
+            'main_color': self.main_color,
+            'is_power': self.is_power,
+            'sub_color': self.sub_color,
+            'x': self.x,
+            'y': self.y,
+            'connector_position': self.connector_position
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'PuzzleFighterPiece':
+        """Rebuild a piece from to_dict without drawing random numbers"""
+        piece = cls.__new__(cls)
+        piece.main_color = data['main_color']
+        piece.is_power = data['is_power']
+        piece.sub_color = data['sub_color']
+        piece.x = data['x']
+        piece.y = data['y']
+        piece.connector_position = data['connector_position']
+        piece.main_tile = Tile(
+            'power' if piece.is_power else 'gem',
+            'active',
+            color=piece.main_color
+        )
+        piece.sub_tile = Tile('gem', 'active', color=piece.sub_color)
+        return piece
@@ -0,0 +1,291 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from games.tetris_piece import TetrisPiece
+from tgme.cpu_player import AnytimeSearch
+from tgme.interfaces import ICPUPlayer
+
+# Row masks of a piece orientation: (row offset, column bitmask relative to its leftmost cell)
+Masks = Tuple[Tuple[int, int], ...]
+
+WALL_KICKS = (-1, 1, -2, 2)   # Same order as TetrisGame._rotate_piece
+
+
+@dataclass
+class TetrisBotWeights:
+    '''
+    Weights of the board evaluation, the defaults are the well known
+    hand-tuned values for these four features.
+    '''
+    aggregate_height: float = -0.510066
+    lines: float = 0.760666
+    holes: float = -0.35663
+    bumpiness: float = -0.184483
+
+
+@dataclass
+class Placement:
+    '''
+    Where a piece ends up, and the actions that take it there from its
+    current position.
+    '''
+    rotations: int
+    shift: int              # Columns to move, negative is left
+    board: Tuple[int, ...]  # Board after locking the piece and clearing lines
+    lines: int              # Lines cleared by this placement
+    score: float = 0.0
+
+    @property
+    def actions(self) -> List[str]:
+        direction = 'left' if self.shift < 0 else 'right'
+        return ['rotate'] * self.rotations + [direction] * abs(self.shift) + ['drop']
+
+
+_MASK_CACHE: Dict[tuple, Tuple[int, int, Masks]] = {}
+
+
+def _masks(coords: Sequence[Tuple[int, int]]) -> Tuple[int, int, Masks]:
+    """Convert piece coords to (leftmost x offset, width, row masks)"""
+    key = tuple(coords)
+    cached = _MASK_CACHE.get(key)
+    if cached is None:
+        min_x = min(x for x, _ in coords)
+        rows: Dict[int, int] = {}
+        for x, y in coords:
+            rows[y] = rows.get(y, 0) | (1 << (x - min_x))
+        width = max(x for x, _ in coords) - min_x + 1
+        cached = _MASK_CACHE[key] = (min_x, width, tuple(sorted(rows.items())))
+    return cached
+
+
+def _rotate(coords: Sequence[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    # Same rotation as TetrisPiece.rotate
+    return [(y, -x) for (x, y) in coords]
+
+
+def _popcount(value: int) -> int:
+    return bin(value).count('1')
+
+
+class TetrisBot(ICPUPlayer):
+    '''
+    CPU player for TetrisGame.
+
+    Boards are tuples of row bitmasks (Grid.occupancy()), so collision
+    tests, locking and line clears are integer operations. Every placement
+    reachable by rotating, shifting and hard-dropping the current piece is
+    enumerated the way TetrisGame would move it (including wall kicks) and
+    scored by aggregate height, lines, holes and bumpiness. When the next
+    piece is known each candidate is refined by its best follow-up, best
+    candidates first, until the time budget runs out. search runs the same
+    search one step at a time, for CPUController; the first step scores
+    every placement, so the budget only limits the lookahead.
+    '''
+    def __init__(self, weights: Optional[TetrisBotWeights] = None, use_next_piece: bool = True,
+                 time_budget: float = 0.005) -> None:
+        """
+        __init__
+
+        Args:
+            weights (Optional[TetrisBotWeights]): Evaluation weights, the defaults if None
+            use_next_piece (bool): Whether to look ahead to the game's next piece
+            time_budget (float): Seconds one move may take, the search returns its best
+                move so far when it runs out
+
+        Returns:
+            None
+        """
+        self.weights = weights or TetrisBotWeights()
+        self.use_next_piece = use_next_piece
+        self.time_budget = time_budget
+        self.evaluations = 0    # Placements evaluated, for benchmarking
+
+    def placements(self, board: Sequence[int], columns: int, coords: Sequence[Tuple[int, int]],
+                   x: int, y: int) -> List[Placement]:
+        """
+        placements
+
+        Args:
+            board (Sequence[int]): Row bitmasks, top row first
+            columns (int): The width of the board
+            coords (Sequence[Tuple[int, int]]): The piece's cells relative to its origin
+            x (int): The piece's origin column
+            y (int): The piece's origin row
+
+        Returns:
+            placements (List[Placement]): Every distinct reachable placement
+        """
+        rows = len(board)
+
+        def fits(masks: Masks, left: int, width: int, top: int) -> bool:
+            if left < 0 or left + width > columns:
+                return False
+            for dy, mask in masks:
+                row = top + dy
+                if row >= rows or (row >= 0 and board[row] & (mask << left)):
+                    return False
+            return True
+
+        found: Dict[tuple, Placement] = {}
+        for rotations in range(4):
+            if rotations:
+                rotated = _rotate(coords)
+                min_x, width, masks = _masks(rotated)
+                for kick in (0,) + WALL_KICKS:
+                    if fits(masks, x + kick + min_x, width, y):
+                        coords, x = rotated, x + kick
+                        break
+                else:
+                    # The rotation fails here, so further rotations would too
+                    break
+            min_x, width, masks = _masks(coords)
+
+            for direction in (-1, 1):
+                shift = 0
+                while True:
+                    left = x + shift + min_x
+                    top = y
+                    while fits(masks, left, width, top + 1):
+                        top += 1
+                    key = (left, top, masks)
+                    if key not in found:
+                        found[key] = self._lock(board, columns, masks, left, top, rotations, shift)
+                    if not fits(masks, left + direction, width, y):
+                        break
+                    shift += direction
+        return list(found.values())
+
+    def _lock(self, board: Sequence[int], columns: int, masks: Masks, left: int, top: int,
+              rotations: int, shift: int) -> Placement:
+        locked = list(board)
+        for dy, mask in masks:
+            if top + dy >= 0:
+                locked[top + dy] |= mask << left
+        full = (1 << columns) - 1
+        kept = [row for row in locked if row != full]
+        lines = len(locked) - len(kept)
+        return Placement(rotations, shift, tuple([0] * lines + kept), lines)
+
+    def evaluate(self, board: Sequence[int], columns: int, lines: int) -> float:
+        """
+        evaluate
+
+        Args:
+            board (Sequence[int]): Row bitmasks, top row first
+            columns (int): The width of the board
+            lines (int): Lines cleared on the way to this board
+
+        Returns:
+            score (float): Higher is better
+        """
+        self.evaluations += 1
+        rows = len(board)
+        heights = [0] * columns
+        covered = 0     # Columns with a block somewhere above the current row
+        holes = 0
+        top = 0
+        while top < rows and not board[top]:
+            top += 1
+        for y in range(top, rows):
+            row = board[y]
+            holes += _popcount(covered & ~row)
+            new = row & ~covered
+            while new:
+                low = new & -new
+                heights[low.bit_length() - 1] = rows - y
+                new ^= low
+            covered |= row
+
+        bumpiness = sum(abs(heights[i] - heights[i + 1]) for i in range(columns - 1))
+        weights = self.weights
+        return (weights.aggregate_height * sum(heights) + weights.lines * lines
+                + weights.holes * holes + weights.bumpiness * bumpiness)
+
+    def search_placements(self, board: Sequence[int], columns: int, piece: TetrisPiece,
+                          next_piece: Optional[TetrisPiece] = None) -> Iterator[Optional[Placement]]:
+        """
+        search_placements
+
+        Args:
+            board (Sequence[int]): Row bitmasks, top row first
+            columns (int): The width of the board
+            piece (TetrisPiece): The piece to place, at its current position
+            next_piece (Optional[TetrisPiece]): The piece that spawns after it, if known
+
+        Returns:
+            placements (Iterator[Optional[Placement]]): The best placement after every placement
+                has been evaluated, then after each one refined by its follow-ups, None if the
+                piece cannot move
+        """
+        candidates = self.placements(board, columns, piece.coords, piece.x, piece.y)
+        best = None
+        # Scoring every placement is one step, so even the smallest budget picks from all of
+        # them and a larger one only buys lookahead
+        for candidate in candidates:
+            candidate.score = self.evaluate(candidate.board, columns, candidate.lines)
+            if best is None or candidate.score > best.score:
+                best = candidate
+        yield best
+
+        if next_piece is None or not self.use_next_piece:
+            return
+
+        candidates.sort(key=lambda candidate: candidate.score, reverse=True)
+        best_score = None
+        for candidate in candidates:
+            # The next piece must be able to spawn, or this placement loses
+            if self._spawn_fits(candidate.board, columns, next_piece):
+                follow_ups = self.placements(candidate.board, columns, next_piece.coords, next_piece.x, next_piece.y)
+                yield best
+                score = max(
+                    (self.evaluate(follow_up.board, columns, candidate.lines + follow_up.lines) for follow_up in follow_ups),
+                    default=candidate.score
+                )
+                if best_score is None or score > best_score:
+                    best, best_score = candidate, score
+            yield best
+
+    def choose_placement(self, board: Sequence[int], columns: int, piece: TetrisPiece,
+                         next_piece: Optional[TetrisPiece] = None) -> Optional[Placement]:
+        """
+        choose_placement
+
+        Args:
+            board (Sequence[int]): Row bitmasks, top row first
+            columns (int): The width of the board
+            piece (TetrisPiece): The piece to place, at its current position
+            next_piece (Optional[TetrisPiece]): The piece that spawns after it, if known
+
+        Returns:
+            placement (Optional[Placement]): The best placement found within the time budget,
+                or None if the piece cannot move at all
+        """
+        deadline = time.perf_counter() + self.time_budget
+        return AnytimeSearch(self.search_placements(board, columns, piece, next_piece)).run(deadline)
+
+    def _spawn_fits(self, board: Sequence[int], columns: int, piece: TetrisPiece) -> bool:
+        for x, y in piece.get_positions:
+            if not 0 <= x < columns or y >= len(board) or (y >= 0 and board[y] >> x & 1):
+                return False
+        return True
+
+    def search(self, game, player: int) -> Iterator[Optional[Placement]]:
+        """Anytime search for a player's current piece in a TetrisGame, see search_placements"""
+        piece = game.current_pieces[player]
+        if piece is None or game.game_over[player]:
+            return iter(())
+        grid = game.grids[player]
+        next_piece = game.next_pieces[player] if self.use_next_piece else None
+        return self.search_placements(grid.occupancy(), grid.columns, piece, next_piece)
+
+    def choose_move(self, game, player: int) -> Optional[Placement]:
+        """Choose a placement for a player's current piece in a TetrisGame"""
+        return AnytimeSearch(self.search(game, player)).run(time.perf_counter() + self.time_budget)
+
+    def play_move(self, game, player: int) -> Optional[Placement]:
+        """Choose a placement and perform it through the game's normal input path"""
+        placement = self.choose_move(game, player)
+        if placement is not None:
+            for action in placement.actions:
+                game.dispatch_action(player, action)
+        return placement
@@ -1,9 +1,10 @@
-from typing import List, Optional
-import time
+import copy
+from typing import Any, Dict, List, Optional
 from tgme.game import Game
 from tgme.interfaces import IMatchingStrategy
 from tgme.player import Player
 from tgme.tile import Tile
+from tgme.trace import LINE_CLEAR, PIECE_LOCK, PIECE_SPAWN
 from games.tetris_piece import TetrisPiece
 from tgme.grid import Grid
 import os
@@ -12,17 +13,18 @@ class TetrisGame(Game):
     min_players = 1  # Class-level attribute
     max_players = 2  # Class-level attribute
     
-    def __init__(self, game_id: str, players: List[Player], controls, matching_strategy: IMatchingStrategy) -> None:
+    def __init__(self, game_id: str, players: List[Player], controls, matching_strategy: IMatchingStrategy, seed: Optional[int] = None) -> None:
         # Call parent class constructor with inherited player limits
-        super().__init__(game_id, 20, 10, players, controls=controls, matching_strategy=matching_strategy)
+        super().__init__(game_id, 20, 10, players, controls=controls, matching_strategy=matching_strategy, seed=seed)
         
         # Create grids based on player count
         self.grids = [Grid(20, 10) for _ in range(len(players))]
         self.current_pieces = [None] * len(players)
+        self.next_pieces = [None] * len(players)     # Preview of each player's next piece
         self.scores = [0] * len(players)
         self.fall_times = [0] * len(players)
         self.fall_speed = 0.5
-        self.last_falls = [time.time()] * len(players)
+        self.last_falls = [0] * len(players)   # Tick of each player's last fall
         self.game_over = [False] * len(players)
         self.music_path = os.path.join(os.path.dirname(__file__), '..', 'music', 'background_music.mp3')
         
@@ -34,43 +36,66 @@ class TetrisGame(Game):
         #     {'left': 'Left', 'right': 'Right', 'down': 'Down', 'rotate': 'Up', 'drop': 'Return'}   # Player 2
         # ]
         
-        self.logger.debug(f"TetrisGame initialized with {len(players)}-player setup")
+        self.logger.debug("TetrisGame initialized with %s-player setup", len(players))
 
     def initialize_game(self) -> None:
-        self.current_pieces = [TetrisPiece(), TetrisPiece()]
-        self.scores = [0, 0]
-        self.game_over = [False, False]
-
-    def handle_key_press(self, event: object) -> None:
-        key = getattr(event, 'keysym', None)
-        if not key or all(self.game_over):
+        player_count = len(self.players)
+        self.current_pieces = [TetrisPiece(self.rng) for _ in range(player_count)]
+        self.next_pieces = [TetrisPiece(self.rng) for _ in range(player_count)]
+        self.scores = [0] * player_count
+        self.game_over = [False] * player_count
+        self.last_falls = [self.tick] * player_count
+        for player in range(player_count):
+            self.trace_event(PIECE_SPAWN, player)
+
+    def snapshot_state(self) -> Dict[str, Any]:
+        # Pieces are the only mutable objects, placed tiles are never changed
+        return {
+            'current_pieces': [copy.copy(piece) for piece in self.current_pieces],
+            'next_pieces': [copy.copy(piece) for piece in self.next_pieces],
+            'scores': list(self.scores),
+            'game_over': list(self.game_over),
+            'last_falls': list(self.last_falls),
+            'fall_speed': self.fall_speed
+        }
+
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        self.current_pieces = [copy.copy(piece) for piece in state['current_pieces']]
+        self.next_pieces = [copy.copy(piece) for piece in state['next_pieces']]
+        self.scores = list(state['scores'])
+        self.game_over = list(state['game_over'])
+        self.last_falls = list(state['last_falls'])
+        self.fall_speed = state['fall_speed']
+
+    def encode_state(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(
+            state,
+            current_pieces=[piece and piece.to_dict() for piece in state['current_pieces']],
+            next_pieces=[piece and piece.to_dict() for piece in state['next_pieces']]
+        )
+
+    def decode_state(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return dict(
+            data,
+            current_pieces=[piece and TetrisPiece.from_dict(piece) for piece in data['current_pieces']],
+            next_pieces=[piece and TetrisPiece.from_dict(piece) for piece in data['next_pieces']]
+        )
+
+    def apply_action(self, player: int, action: str) -> None:
+        # Keys are resolved to actions by Game.handle_key_press
+        if self.game_over[player]:
             return
 
-        # Handle player 1 controls (WASD + space)
-        if not self.game_over[0]:
-            if key == self.controls[0]['left']:
-                self._move_piece(0, -1, 0)
-            elif key == self.controls[0]['right']:
-                self._move_piece(0, 1, 0)
-            elif key == self.controls[0]['down']:
-                self._move_piece(0, 0, 1)
-            elif key == self.controls[0]['rotate']:
-                self._rotate_piece(0)
-            elif key == self.controls[0]['drop']:
-                self._hard_drop(0)
-
-        # Handle player 2 controls (Arrow keys + return)
-        if not self.game_over[1]:
-            if key == self.controls[1]['left']:
-                self._move_piece(1, -1, 0)
-            elif key == self.controls[1]['right']:
-                self._move_piece(1, 1, 0)
-            elif key == self.controls[1]['down']:
-                self._move_piece(1, 0, 1)
-            elif key == self.controls[1]['rotate']:
-                self._rotate_piece(1)
-            elif key == self.controls[1]['drop']:
-                self._hard_drop(1)
+        if action == 'left':
+            self._move_piece(player, -1, 0)
+        elif action == 'right':
+            self._move_piece(player, 1, 0)
+        elif action == 'down':
+            self._move_piece(player, 0, 1)
+        elif action == 'rotate':
+            self._rotate_piece(player)
+        elif action == 'drop':
+            self._hard_drop(player)
 
     #TODO: implement piece movement logic with Grid.place_tile() and Grid.get_tile()
     def _move_piece(self, player: int, dx: int, dy: int) -> bool:
@@ -82,8 +107,11 @@ class TetrisGame(Game):
             self.current_pieces[player].move(-dx, -dy)
             if dy > 0:  # If moving down, piece is stuck
                 self._freeze_piece(player)
+                self.trace_event(PIECE_LOCK, player)
                 self._clear_lines(player)
-                self.current_pieces[player] = TetrisPiece()
+                self.current_pieces[player] = self.next_pieces[player]
+                self.next_pieces[player] = TetrisPiece(self.rng)
+                self.trace_event(PIECE_SPAWN, player)
                 if not self._is_valid_move(player):
                     self.game_over[player] = True
             return False
@@ -142,28 +170,23 @@ class TetrisGame(Game):
 
         # For each full line, clear it and shift the lines above down
         for y in full_lines:
-            # Move all lines above the current one down
-            for y2 in range(y - 1, -1, -1):
-                for x in range(self.grids[player].columns):
-                    self.grids[player].tiles[y2 + 1][x] = self.grids[player].tiles[y2][x]
-            
-            # Clear the top line
-            for x in range(self.grids[player].columns):
-                self.grids[player].tiles[0][x] = None
-            
+            # Move all lines above the current one down and clear the top line
+            self.grids[player].collapse_row(y)
             lines_cleared += 1
 
         # Update score based on the number of lines cleared
         if lines_cleared:
+            self.trace_event(LINE_CLEAR, player, lines_cleared)
             self.scores[player] += [100, 300, 500, 800][lines_cleared - 1]
             self.players[player].update_score(self.scores[player])
 
     def update(self) -> None:
-        current_time = time.time()
-        for player in range(2):
-            if not self.game_over[player] and current_time - self.last_falls[player] > self.fall_speed:
+        self.tick += 1
+        fall_ticks = max(1, round(self.fall_speed * self.TICKS_PER_SECOND))
+        for player in range(len(self.players)):
+            if not self.game_over[player] and self.tick - self.last_falls[player] >= fall_ticks:
                 self._move_piece(player, 0, 1)
-                self.last_falls[player] = current_time
+                self.last_falls[player] = self.tick
 
     def check_loss_condition(self) -> bool:
         """
@@ -179,7 +202,7 @@ class TetrisGame(Game):
         """
         if all(self.game_over):
             # If both players are out, the one with the higher score wins
-            winner = 0 if self.scores[0] >= self.scores[1] else 1
-            self.logger.info(f"Player {winner + 1} wins with score {self.scores[winner]}")
+            winner = max(range(len(self.scores)), key=lambda i: self.scores[i])
+            self.logger.info("Player %s wins with score %s", winner + 1, self.scores[winner])
             return True
         return False
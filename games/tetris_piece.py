@@ -1,4 +1,4 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import random
 
 class TetrisPiece:
@@ -23,8 +23,9 @@ class TetrisPiece:
         'Z': 'red'
     }
 
-    def __init__(self) -> None:
-        self.shape = random.choice(list(self.SHAPES.keys()))
+    def __init__(self, rng: Optional[random.Random] = None) -> None:
+        # Games pass their own seeded generator so piece order can be replayed
+        self.shape = (rng or random).choice(list(self.SHAPES.keys()))
         self.coords = self.SHAPES[self.shape][:]
         self.color = self.COLORS[self.shape]
         self.x = 4  # Starting x position (center of board)
@@ -42,3 +43,18 @@ class TetrisPiece:
     def get_positions(self) -> List[Tuple[int, int]]:
         # Return actual board positions of piece
         return [(self.x + x, self.y + y) for (x, y) in self.coords]
+
+    def to_dict(self) -> dict:
+        # Plain data for replay keyframes
+        return {'shape': self.shape, 'coords': [list(c) for c in self.coords], 'x': self.x, 'y': self.y}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'TetrisPiece':
+        # Bypass __init__ so no random numbers are drawn
+        piece = cls.__new__(cls)
+        piece.shape = data['shape']
+        piece.coords = [tuple(c) for c in data['coords']]
+        piece.color = cls.COLORS[piece.shape]
+        piece.x = data['x']
+        piece.y = data['y']
+        return piece
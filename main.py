@@ -2,14 +2,10 @@ import tkinter as tk
 from tgme.tmge import TMGE
 from tgme.player_profile import PlayerProfile
 from tgme.player import Player
-from games.tetris_game import TetrisGame
-from games.tetris_matching_strategy import TetrisMatchingStrategy
-from games.puzzle_fighter_matching_strategy import PuzzleFighterMatchingStrategy
-from games.puzzle_fighter_game import PuzzleFighterGame
-from tgme.views.game_ui import GameUI
+from tgme.plugins import available_plugins
+from tgme.trace import EventTrace
 from tgme.views.login_window import LoginWindow
 from tgme.views.home_window import HomeWindow
-import pygame
 
 
 
@@ -39,19 +35,10 @@ class TMGEApplication:
     '''
     
     def show_main_window(self) -> None:
-        # Create players for two-player games
-        player1 = Player(self.current_profile)
-        player2 = Player(PlayerProfile("Player2"))  # Temporary second player
-        
-        tetris_matching_strategy = TetrisMatchingStrategy()
-        puzzle_fighter_matching_strategy = PuzzleFighterMatchingStrategy()
-        
-        # Register games with two players
-        tetris_game = TetrisGame(game_id='Tetris', players=[player1, player2], controls=self.game_controls_dict['Tetris'], matching_strategy=tetris_matching_strategy)
-        puzzle_fighter = PuzzleFighterGame(game_id='Puzzle Fighter', players=[player1, player2], controls=self.game_controls_dict['Puzzle Fighter'], matching_strategy=puzzle_fighter_matching_strategy)
-        
-        self.tmge.register_game(tetris_game)
-        self.tmge.register_game(puzzle_fighter)
+        # Register game descriptors, each game is only built when it is launched
+        if not self.tmge.get_available_games:
+            for plugin in available_plugins():
+                self.tmge.register_game(plugin)
 
         # Show home window
         home = HomeWindow(self.tmge, self.current_profile, controls=self.game_controls_dict)
@@ -77,6 +64,7 @@ class TMGEApplication:
         return set_game_controls_dict
 
 def main() -> None:
+    EventTrace().install_dump_hooks()
     app = TMGEApplication()
     login = LoginWindow(app.tmge, app.on_login_success)
     login.window.mainloop()
@@ -0,0 +1,19 @@
+from types import SimpleNamespace
+
+from tgme.cpu_player import make_cpu_controller
+from tgme.plugins import get_plugin
+from tgme.player import Player
+from tgme.player_profile import PlayerProfile
+
+
+def test_keys_do_not_move_cpu_players():
+    controls = [{'drop': 'space'}, {'drop': 'Return'}]
+    players = [Player(PlayerProfile('human')),
+               Player(PlayerProfile('cpu'), controller=make_cpu_controller('Tetris', 'easy'))]
+    game = get_plugin('Tetris').create_game(players, controls, seed=5)
+    game.init()
+    dispatched = []
+    game.dispatch_action = lambda player, action: dispatched.append((player, action))
+    game.handle_key_press(SimpleNamespace(keysym='Return'))
+    game.handle_key_press(SimpleNamespace(keysym='space'))
+    assert dispatched == [(0, 'drop')]
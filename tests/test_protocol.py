@@ -0,0 +1,28 @@
+from tgme.net.protocol import STATE, FRAME, StateEncoder, decode_state
+from tgme.plugins import get_plugin
+from tgme.player import Player
+from tgme.player_profile import PlayerProfile
+
+
+def _round_trip(game):
+    message = StateEncoder(game).encode(keyframe=True)
+    message_type = FRAME.unpack_from(message)[1]
+    assert message_type == STATE
+    return decode_state(message[FRAME.size:])
+
+
+def test_puzzle_fighter_state_round_trip():
+    for count in (1, 2):
+        players = [Player(PlayerProfile(f"p{i}")) for i in range(count)]
+        game = get_plugin('Puzzle Fighter').create_game(players, [{}] * count, seed=3)
+        game.init()
+        assert len(game.pending_attacks) == count
+        for player in range(count):
+            game.pending_attacks[player].extend(['gray'] * (player + 2))
+            game.scores[player] = 100 * (player + 1)
+        update = _round_trip(game)
+        assert update.keyframe
+        assert update.attacks == [player + 2 for player in range(count)]
+        assert update.scores == game.scores
+        assert update.game_over == [False] * count
+        assert len(update.pieces) == count
@@ -0,0 +1,36 @@
+from tgme.plugins import get_plugin
+from tgme.player import Player
+from tgme.player_profile import PlayerProfile
+from tgme.replay_file import ReplayReader, ReplayWriter
+
+
+def _play(path, game_id, ticks, keyframe_interval):
+    game = get_plugin(game_id).create_game(
+        [Player(PlayerProfile('a')), Player(PlayerProfile('b'))], [{}, {}], seed=11
+    )
+    game.init()
+    writer = ReplayWriter(str(path), game, keyframe_interval=keyframe_interval)
+    actions = ['left', 'rotate', 'right', 'drop', 'down']
+    while game.tick < ticks:
+        game.step()
+        # A drop at every keyframe tick changes the board right after the keyframe is written
+        if game.tick % keyframe_interval == 0:
+            game.dispatch_action(game.tick // keyframe_interval % 2, 'drop')
+        elif game.tick % 5 == 0:
+            game.dispatch_action(game.tick // 5 % 2, actions[game.tick // 5 % len(actions)])
+    writer.close()
+    return game
+
+
+def test_verify_with_actions_at_keyframe_ticks(tmp_path):
+    for game_id in ('Tetris', 'Puzzle Fighter'):
+        path = tmp_path / f"{game_id}.replay"
+        recorded = _play(path, game_id, 400, keyframe_interval=50)
+        with ReplayReader(str(path)) as reader:
+            game = get_plugin(game_id).create_game(
+                [Player(PlayerProfile('a')), Player(PlayerProfile('b'))], [{}, {}]
+            )
+            assert reader.verify(game) is None
+            reader.seek(game, 0)
+            reader.advance(game)
+        assert [grid.hash for grid in game.grids] == [grid.hash for grid in recorded.grids]
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+
+from tgme.net.protocol import REDIRECT, encode_join, read_message
+from tgme.net.server import Lobby, MatchHost
+
+
+class BlockingStore:
+    def __init__(self) -> None:
+        self.release = threading.Event()
+
+    def load_profile(self, username):
+        self.release.wait(5)
+        return None
+
+
+def test_rating_lookup_does_not_block_the_lobby():
+    async def run() -> None:
+        store = BlockingStore()
+        host = MatchHost('127.0.0.1', 0)
+        await host.start()
+        lobby = Lobby('127.0.0.1', 0, host, profile_store=store)
+        await lobby.start()
+
+        # The first player waits for their rating, the second needs none and is redirected meanwhile
+        _, waiting = await asyncio.open_connection('127.0.0.1', lobby.port)
+        waiting.write(encode_join('Tetris', 'waiting', 2))
+        await asyncio.sleep(0.1)
+        reader, writer = await asyncio.open_connection('127.0.0.1', lobby.port)
+        writer.write(encode_join('Tetris', 'solo', 1))
+        message_type, _ = await asyncio.wait_for(read_message(reader), 2)
+        assert message_type == REDIRECT
+
+        store.release.set()
+        waiting.close()
+        writer.close()
+        lobby.close()
+        host.server.close()
+
+    asyncio.run(run())
@@ -0,0 +1,51 @@
+import json
+
+from tgme.player_profile import PlayerProfile
+from tgme.storage import json_profile_store
+from tgme.storage.json_profile_store import JsonProfileStore
+from tgme.storage.persistence_worker import ProfilePersistenceWorker
+from tgme.storage.sqlite_profile_store import SQLiteProfileStore
+from tgme.storage.stats_journal import StatsJournal
+
+
+def test_json_store_write_failure_reaches_the_worker(tmp_path, monkeypatch):
+    path = tmp_path / 'profiles.json'
+    store = JsonProfileStore(str(path))
+    store.save_profile(PlayerProfile('a'))
+    worker = ProfilePersistenceWorker(store, interval=0.01)
+
+    def fail(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(json_profile_store.os, 'fsync', fail)
+    worker.mark_dirty(PlayerProfile('b'))
+    assert not worker.flush(timeout=0.2)
+    # The backup was put back
+    assert [profile['username'] for profile in json.loads(path.read_text())] == ['a']
+
+    monkeypatch.undo()
+    assert worker.flush(timeout=5)
+    worker.close()
+    assert sorted(profile['username'] for profile in json.loads(path.read_text())) == ['a', 'b']
+
+
+def test_journal_numbers_past_stored_profiles_after_losing_its_file(tmp_path):
+    store = SQLiteProfileStore(str(tmp_path / 'profiles.db'))
+    profile = PlayerProfile('a')
+    profile.journal_seq = 7
+    store.save_profile(profile)
+    assert store.max_journal_seq() == 7
+    assert JsonProfileStore(str(tmp_path / 'profiles.json')).max_journal_seq() == 0
+
+    # A journal with a bad header is set aside, a missing one is started over
+    for contents in (b'junk', None):
+        path = tmp_path / 'stats.journal'
+        if path.exists():
+            path.unlink()
+        if contents is not None:
+            path.write_bytes(contents)
+        journal = StatsJournal(str(path))
+        assert journal.replay(store.max_journal_seq()) == []
+        assert journal.append('a', 'Tetris', 100, True, 1.0) == 8
+        journal.close()
+    store.close()
@@ -0,0 +1,27 @@
+import signal
+import sys
+import threading
+
+import pytest
+
+from tgme.trace import EventTrace
+
+
+def test_tk_callback_exception_dumps_trace(tmp_path, monkeypatch):
+    tkinter = pytest.importorskip('tkinter')
+    dumps = []
+    trace = EventTrace()
+    monkeypatch.setattr(trace, 'dump', lambda path=None: dumps.append(path) or str(tmp_path / 'trace.bin'))
+    monkeypatch.setattr(trace, '_hooks_installed', False)
+    monkeypatch.setattr(sys, 'excepthook', sys.excepthook)
+    monkeypatch.setattr(threading, 'excepthook', threading.excepthook)
+    if hasattr(signal, 'SIGUSR2'):
+        previous_handler = signal.getsignal(signal.SIGUSR2)
+        monkeypatch.setattr(signal, 'signal', lambda signum, handler: previous_handler)
+    monkeypatch.setattr(tkinter.Tk, 'report_callback_exception', lambda window, *args: None)
+    trace.install_dump_hooks()
+    try:
+        raise RuntimeError("callback failed")
+    except RuntimeError:
+        tkinter.Tk.report_callback_exception(None, *sys.exc_info())
+    assert dumps == [None]
@@ -0,0 +1,154 @@
+import queue
+import threading
+from typing import Any, Dict, Hashable, Optional, Set
+from tgme.utils.logger import TMGELogger
+
+
+class AudioService:
+    '''
+    Plays looping music for every open game window from one process-wide mixer.
+
+    Every pygame call runs on the service's own thread, so the UI only
+    queues commands and never waits for the mixer to start or a track to
+    decode. The mixer is initialised once and tracks are decoded once into
+    pygame Sounds, which are cached by path. Each track plays on its own
+    channel while at least one window (its owner) wants it, so closing one
+    game window stops its music without touching the others.
+    '''
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if AudioService._initialized:
+            return
+
+        AudioService._initialized = True
+        self.logger = TMGELogger().get_logger('audio')
+        self._commands: 'queue.Queue[tuple]' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Everything below is only touched on the service's thread
+        self._pygame: Any = None
+        self._available = True
+        self._sounds: Dict[str, Any] = {}
+        self._owners: Dict[str, Set[Hashable]] = {}
+        self._channels: Dict[str, Any] = {}
+        self.loads = 0
+        self.cache_hits = 0
+
+    def _send(self, *command: Any) -> None:
+        with self._lock:
+            if self._thread is None:
+                # Started on first use, so headless runs never load pygame
+                self._thread = threading.Thread(target=self._run, name="AudioService", daemon=True)
+                self._thread.start()
+        self._commands.put(command)
+
+    def preload(self, path: str) -> None:
+        """Decode a track in the background so playing it later starts at once"""
+        self._send('load', path)
+
+    def play(self, owner: Hashable, path: str, volume: float = 0.5) -> None:
+        """
+        play
+
+        Args:
+            owner (Hashable): Who wants the music, e.g. a game window, pass it to stop
+            path (str): The track to loop, it is decoded first if it is not cached
+            volume (float): 0.0 to 1.0
+
+        Returns:
+            None
+        """
+        self._send('play', owner, path, volume)
+
+    def stop(self, owner: Hashable) -> None:
+        """Release an owner's track, it stops once no other owner plays it"""
+        self._send('stop', owner)
+
+    def shutdown(self) -> None:
+        """Stop all music and close the mixer, waiting for queued commands first"""
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return
+        self._commands.put(('shutdown',))
+        thread.join()
+
+    def _run(self) -> None:
+        while True:
+            command = self._commands.get()
+            try:
+                if command[0] == 'shutdown':
+                    self._shutdown()
+                    return
+                if not self._init_mixer():
+                    continue
+                if command[0] == 'load':
+                    self._load(command[1])
+                elif command[0] == 'play':
+                    self._play(*command[1:])
+                elif command[0] == 'stop':
+                    self._stop(command[1])
+            except Exception as e:
+                self.logger.error("Audio command %s failed: %s", command[0], e)
+
+    def _init_mixer(self) -> bool:
+        if self._pygame is not None or not self._available:
+            return self._available
+        try:
+            import pygame
+            pygame.mixer.init()
+        except Exception as e:
+            # No audio device or no pygame, games still run silently
+            self.logger.error("Audio unavailable: %s", e)
+            self._available = False
+            return False
+        self._pygame = pygame
+        return True
+
+    def _load(self, path: str) -> Any:
+        sound = self._sounds.get(path)
+        if sound is not None:
+            self.cache_hits += 1
+            return sound
+        sound = self._sounds[path] = self._pygame.mixer.Sound(path)
+        self.loads += 1
+        return sound
+
+    def _play(self, owner: Hashable, path: str, volume: float) -> None:
+        self._stop(owner)
+        owners = self._owners.setdefault(path, set())
+        owners.add(owner)
+        if path not in self._channels:
+            channel = self._load(path).play(loops=-1)
+            if channel is not None:
+                channel.set_volume(volume)
+                self._channels[path] = channel
+
+    def _stop(self, owner: Hashable) -> None:
+        for path, owners in list(self._owners.items()):
+            if owner not in owners:
+                continue
+            owners.discard(owner)
+            if not owners:
+                del self._owners[path]
+                channel = self._channels.pop(path, None)
+                if channel is not None:
+                    channel.stop()
+
+    def _shutdown(self) -> None:
+        if self._pygame is not None:
+            self._pygame.mixer.stop()
+            self._pygame.mixer.quit()
+        self._owners.clear()
+        self._channels.clear()
+        self._sounds.clear()
+        self._pygame = None
+        with self._lock:
+            self._thread = None
@@ -0,0 +1,154 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, Optional
+from tgme.game import Game
+from tgme.interfaces import ICPUPlayer
+from tgme.plugins import get_plugin
+
+
+class AnytimeSearch:
+    '''
+    Runs a search generator in time slices.
+
+    The generator yields the best move found so far after every step, so
+    run can stop it between any two steps and resume it later. A bot that
+    searches move after move can pass the longest step of its last search
+    as expected_step, so a search whose first steps happen to be cheap
+    still leaves room for an expensive one.
+    '''
+    def __init__(self, steps: Iterator[Optional[Any]], expected_step: float = 0.0) -> None:
+        self._steps = steps
+        self.best: Optional[Any] = None
+        self.finished = False
+        self.steps = 0
+        self.longest_step = 0.0
+        self._expected_step = expected_step
+
+    def run(self, deadline: float) -> Optional[Any]:
+        """
+        run
+
+        Args:
+            deadline (float): time.perf_counter() value to stop by, the search stops early when
+                its next step would likely pass it but always makes one step
+
+        Returns:
+            best (Optional[Any]): The best move found so far
+        """
+        now = time.perf_counter()
+        while not self.finished:
+            try:
+                self.best = next(self._steps)
+            except StopIteration:
+                self.finished = True
+                break
+            self.steps += 1
+            previous, now = now, time.perf_counter()
+            self.longest_step = max(self.longest_step, now - previous)
+            if now + 1.5 * max(self.longest_step, self._expected_step) > deadline:
+                break
+        return self.best
+
+
+# Seconds of search per tick. Every difficulty thinks for the same number of
+# ticks, so a stronger CPU player searches deeper without playing slower. A
+# bot's first search step always considers every move, so easy still plays
+# sanely; it just looks no further ahead than the current piece
+DIFFICULTIES: Dict[str, float] = {
+    'easy': 0.00002,
+    'normal': 0.001,
+    'hard': 0.004,
+}
+
+
+class CPUController:
+    '''
+    Drives a player from a bot, one tick at a time.
+
+    Set as a Player's controller, Game.step calls on_tick after every
+    update. The bot's search runs for at most tick_budget seconds per tick,
+    so it never stalls the game loop, and the best move found is played
+    when the search finishes or think_ticks have passed. Moves are sent
+    through Game.dispatch_action like key presses, so they are recorded and
+    replayed like a human player's. Difficulty is only the compute budget.
+
+    Games must have per-player current_pieces, grids and game_over, like
+    TetrisGame and PuzzleFighterGame.
+    '''
+    def __init__(self, bot: ICPUPlayer, tick_budget: float = DIFFICULTIES['normal'], think_ticks: int = 4,
+                 actions_per_tick: int = 1) -> None:
+        """
+        __init__
+
+        Args:
+            bot (ICPUPlayer): Searches for moves
+            tick_budget (float): Seconds of search per tick, which sets the difficulty
+            think_ticks (int): Ticks of searching before the best move so far is played
+            actions_per_tick (int): The most actions to dispatch per tick once a move is chosen
+
+        Returns:
+            None
+        """
+        if think_ticks <= 0 or actions_per_tick <= 0:
+            raise ValueError("A CPU player must think and act for at least one tick")
+
+        self.bot = bot
+        self.tick_budget = tick_budget
+        self.think_ticks = think_ticks
+        self.actions_per_tick = actions_per_tick
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the current search and plan, e.g. after restoring a snapshot"""
+        self._piece: Optional[Any] = None
+        self._board_hash: Optional[int] = None
+        self._search: Optional[AnytimeSearch] = None
+        self._think_start = 0
+        self._plan: Optional[Deque[str]] = None
+
+    def on_tick(self, game: Game, player: int) -> None:
+        """
+        on_tick
+
+        Args:
+            game (Game): The game being played
+            player (int): The index of the player this controller drives
+
+        Returns:
+            None
+        """
+        if game.is_paused or game.is_game_over or game.game_over[player]:
+            return
+        piece = game.current_pieces[player]
+        if piece is None:
+            return
+
+        board_hash = game.grids[player].hash
+        if piece is not self._piece or (self._plan is None and board_hash != self._board_hash):
+            # A new piece, or the board changed under the search (e.g. attack rows)
+            self._piece = piece
+            self._board_hash = board_hash
+            self._search = AnytimeSearch(self.bot.search(game, player))
+            self._think_start = game.tick
+            self._plan = None
+
+        if self._plan is None:
+            best = self._search.run(time.perf_counter() + self.tick_budget)
+            if self._search.finished or game.tick - self._think_start + 1 >= self.think_ticks:
+                self._plan = deque(best.actions if best is not None else [])
+
+        for _ in range(self.actions_per_tick):
+            if not self._plan:
+                break
+            game.dispatch_action(player, self._plan.popleft())
+            if game.current_pieces[player] is not piece:
+                # The piece locked, anything left would move the next one
+                self._plan.clear()
+
+
+def make_cpu_controller(game_id: str, difficulty: str = 'normal') -> CPUController:
+    """Build a controller with the bot for a game type, difficulty is a key of DIFFICULTIES"""
+    if difficulty not in DIFFICULTIES:
+        raise ValueError(f"Unknown difficulty: {difficulty}")
+    # The bot's module is only imported now, through the game's plugin
+    return CPUController(get_plugin(game_id).create_bot(), DIFFICULTIES[difficulty])
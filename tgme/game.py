@@ -1,15 +1,38 @@
+import random
+import time
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
-from tkinter import messagebox
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from tgme.interfaces import IGameLoop, IInputHandler
-from tgme.grid import Grid
+from tgme.grid import Grid, GridSnapshot
 from tgme.tile import Tile
 from tgme.interfaces import IMatchingStrategy
 from tgme.player import Player
+from tgme.trace import EventTrace, TICK_START, TICK_END
 from tgme.utils.logger import TMGELogger
+from tgme.utils.game_random import GameRandom
+
+@dataclass(frozen=True)
+class GameSnapshot:
+    '''
+    Everything needed to put a game back to one tick: the grids, the random
+    number generator, the players' scores and the game's own state from
+    Game.snapshot_state.
+    '''
+    tick: int
+    rng_state: tuple
+    grids: Tuple[GridSnapshot, ...]
+    player_scores: Tuple[int, ...]
+    is_paused: bool
+    is_game_over: bool
+    state: Dict[str, Any]
+
 
 class Game(IGameLoop, IInputHandler, ABC):
-    def __init__(self, game_id: str, rows: int, columns: int, players: List[Player], controls: Dict, matching_strategy: IMatchingStrategy) -> None:
+    # Simulation steps per second, game timing is counted in ticks so replays are deterministic
+    TICKS_PER_SECOND = 60
+
+    def __init__(self, game_id: str, rows: int, columns: int, players: List[Player], controls: Dict, matching_strategy: IMatchingStrategy, seed: Optional[int] = None) -> None:
         """
         __init__
 
@@ -18,12 +41,13 @@ class Game(IGameLoop, IInputHandler, ABC):
             rows (int): Number of rows in the grid
             columns (int): Number of columns in the grid
             players (List[Player]): The players participating in the game
+            seed (Optional[int]): Seed for the game's random number generator, random if None
 
         Returns:
             None
         """
-        self.logger = TMGELogger()
-        self.logger.info(f"Initializing game: {game_id}")
+        self.logger = TMGELogger().get_logger('game')
+        self.logger.info("Initializing game: %s", game_id)
         self.music_path = ""        
 
         # These should be set by child classes before calling super().__init__
@@ -43,9 +67,21 @@ class Game(IGameLoop, IInputHandler, ABC):
         self.is_paused = False
         self.is_game_over = False
         self.current_player_count = len(players)
+        self.started_at = time.time()
+        self.results_recorded = False
+
+        # All randomness comes from self.rng and all timing from self.tick,
+        # so a seed plus the dispatched actions reproduce a session exactly
+        self.seed: int = seed if seed is not None else random.randrange(2 ** 63)
+        self.rng = GameRandom(self.seed)
+        self.tick = 0
+        self.input_listeners: List[Callable[[int, int, str], None]] = []
+        self.tick_listeners: List[Callable[[int], None]] = []
+        self.trace = EventTrace()
+        self.trace_slot = self.trace.register_game(game_id)
         
-        self.logger.debug(f"Created {rows}x{columns} grid for {game_id}")
-        self.logger.debug(f"Registered {len(players)} players")
+        self.logger.debug("Created %sx%s grid for %s", rows, columns, game_id)
+        self.logger.debug("Registered %s players", len(players))
 
     @abstractmethod
     def initialize_game(self) -> None:
@@ -80,6 +116,8 @@ class Game(IGameLoop, IInputHandler, ABC):
 
     def handle_game_over(self) -> None:
         """Handle game over state with restart/exit options"""
+        # Imported here so headless games never load tkinter
+        from tkinter import messagebox
         if messagebox.askyesno("Game Over", "Would you like to restart?"):
             self.restart_game()
         else:
@@ -89,19 +127,21 @@ class Game(IGameLoop, IInputHandler, ABC):
         """Reset game state and start new game"""
         self.is_game_over = False
         self.is_paused = False
+        self.started_at = time.time()
+        self.results_recorded = False
         self.initialize_game()
-        self.logger.info(f"Restarting game: {self.game_id}")
+        self.logger.info("Restarting game: %s", self.game_id)
 
     def exit_to_menu(self) -> None:
         """Clean up and exit to main menu"""
         self.is_game_over = True
-        self.logger.info(f"Exiting game: {self.game_id}")
+        self.logger.info("Exiting game: %s", self.game_id)
 
     def pause_game(self) -> None:
         """Toggle game pause state"""
         self.is_paused = not self.is_paused
         state = "paused" if self.is_paused else "resumed"
-        self.logger.info(f"Game {state}: {self.game_id}")
+        self.logger.info("Game %s: %s", state, self.game_id)
 
     def init(self) -> None:
         """
@@ -113,9 +153,186 @@ class Game(IGameLoop, IInputHandler, ABC):
         Returns:
             None
         """
-        self.logger.info(f"Starting game: {self.game_id}")
+        self.logger.info("Starting game: %s", self.game_id)
+        self.started_at = time.time()
+        self.results_recorded = False
+        self.rng.seed(self.seed)
+        self.tick = 0
         self.initialize_game()
 
+    def reset(self, players: Optional[List[Player]] = None, seed: Optional[int] = None) -> None:
+        """
+        reset returns a used game to how it was built, keeping its grids, so pooled games
+        are reused rather than rebuilt, call init to start it again
+
+        Args:
+            players (Optional[List[Player]]): New players, as many as the game was built with,
+                None to keep the current ones
+            seed (Optional[int]): Seed for the next session, random if None
+
+        Returns:
+            None
+        """
+        if players is not None:
+            if len(players) != len(self.players):
+                raise ValueError(f"Game was built for {len(self.players)} players, got {len(players)}")
+            self.players = players
+        for player in self.players:
+            player.score = 0
+        for grid in self._all_grids():
+            grid.clear()
+        self.is_paused = False
+        self.is_game_over = False
+        self.results_recorded = False
+        self.seed = seed if seed is not None else random.randrange(2 ** 63)
+        self.rng.seed(self.seed)
+        self.tick = 0
+        # Recorders of the last session detach themselves, but a new session starts with none
+        self.input_listeners.clear()
+        self.tick_listeners.clear()
+
+    def is_finished(self) -> bool:
+        """Check if every player is out"""
+        return all(getattr(self, 'game_over', [self.is_game_over]))
+
+    def get_duration(self) -> float:
+        """Seconds since the game was started"""
+        return time.time() - self.started_at
+
+    def get_results(self) -> List[Tuple[Player, int, bool]]:
+        """
+        get_results
+
+        Args:
+            None
+
+        Returns:
+            results (List[Tuple[Player, int, bool]]): (player, score, won) for every player,
+                the highest score wins and player 1 wins ties
+        """
+        scores = getattr(self, 'scores', [player.score for player in self.players])
+        winner = max(range(len(self.players)), key=lambda i: scores[i])
+        return [(player, scores[i], i == winner) for i, player in enumerate(self.players)]
+
+    def _all_grids(self) -> List[Grid]:
+        return [self.grid] + list(getattr(self, 'grids', []))
+
+    def snapshot(self) -> GameSnapshot:
+        """
+        snapshot
+
+        Args:
+            None
+
+        Returns:
+            snapshot (GameSnapshot): The current game state, cheap enough to take every tick
+        """
+        return GameSnapshot(
+            self.tick,
+            self.rng.getstate(),
+            tuple(grid.snapshot() for grid in self._all_grids()),
+            tuple(player.score for player in self.players),
+            self.is_paused,
+            self.is_game_over,
+            self.snapshot_state()
+        )
+
+    def restore(self, snapshot: GameSnapshot) -> None:
+        """
+        restore
+
+        Args:
+            snapshot (GameSnapshot): A snapshot taken from this game, it can be restored again later
+
+        Returns:
+            None
+        """
+        self.tick = snapshot.tick
+        self.rng.setstate(snapshot.rng_state)
+        for grid, grid_snapshot in zip(self._all_grids(), snapshot.grids):
+            grid.restore(grid_snapshot)
+        for player, score in zip(self.players, snapshot.player_scores):
+            player.score = score
+        self.is_paused = snapshot.is_paused
+        self.is_game_over = snapshot.is_game_over
+        self.restore_state(snapshot.state)
+
+    def encode_state(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        encode_state is overridden by games whose snapshot_state holds objects
+
+        Args:
+            state (Dict[str, Any]): State returned by snapshot_state
+
+        Returns:
+            data (Dict[str, Any]): The same state as JSON-serialisable data
+        """
+        return state
+
+    def decode_state(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Inverse of encode_state"""
+        return data
+
+    def snapshot_state(self) -> Dict[str, Any]:
+        """
+        snapshot_state is overridden by games with state beyond the grids
+
+        Args:
+            None
+
+        Returns:
+            state (Dict[str, Any]): Copies of the game's own state, later changes to the game
+                must not affect them
+        """
+        return {}
+
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        """
+        restore_state
+
+        Args:
+            state (Dict[str, Any]): State returned by snapshot_state, copy anything mutable
+                so the snapshot can be restored again
+
+        Returns:
+            None
+        """
+        pass
+
+    def step(self) -> None:
+        """
+        step runs one tick, drivers such as GameUI call this rather than update
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.trace_event(TICK_START)
+        self.update()
+        for listener in self.tick_listeners:
+            listener(self.tick)
+        # CPU players send their input between ticks, like key presses
+        for index, player in enumerate(self.players):
+            if player.controller is not None:
+                player.controller.on_tick(self, index)
+        self.trace_event(TICK_END)
+
+    def trace_event(self, event: int, player: int = -1, value: int = 0) -> None:
+        """
+        trace_event records an engine event in the process's event trace, see tgme/trace.py
+
+        Args:
+            event (int): An event from tgme.trace, e.g. LINE_CLEAR
+            player (int): Index of the player the event belongs to, -1 for the whole game
+            value (int): The event's value, e.g. the number of lines cleared
+
+        Returns:
+            None
+        """
+        self.trace.record(event, self.trace_slot, player, self.tick, value)
+
     def update(self) -> None:
         """
         update
@@ -129,11 +346,13 @@ class Game(IGameLoop, IInputHandler, ABC):
         if self.is_paused or self.is_game_over:
             return
 
+        self.tick += 1
         if self.check_loss_condition():
             self.is_game_over = True
             self.handle_game_over()
         elif self.check_win_condition():
             self.is_game_over = True
+            from tkinter import messagebox
             messagebox.showinfo("Congratulations", "You won!")
             self.handle_game_over()
 
@@ -161,8 +380,46 @@ class Game(IGameLoop, IInputHandler, ABC):
             None
         """
         key = getattr(event, 'keysym', None)
-        if key:
-            self.logger.debug(f"Key pressed: {key}")
+        if not key:
+            return
+
+        self.logger.debug("Key pressed: %s", key)
+        for player in range(min(len(self.players), len(self.controls))):
+            # A CPU player's moves come from its controller, the keyboard only plays for humans
+            if self.players[player].controller is not None:
+                continue
+            for action, bound_key in self.controls[player].items():
+                if bound_key == key:
+                    self.dispatch_action(player, action)
+                    break
+
+    def dispatch_action(self, player: int, action: str) -> None:
+        """
+        dispatch_action is the single entry point for player input
+
+        Args:
+            player (int): Index of the player the action belongs to
+            action (str): The control name, e.g. left, rotate or drop
+
+        Returns:
+            None
+        """
+        for listener in self.input_listeners:
+            listener(self.tick, player, action)
+        self.apply_action(player, action)
+
+    def apply_action(self, player: int, action: str) -> None:
+        """
+        apply_action
+
+        Args:
+            player (int): Index of the player the action belongs to
+            action (str): The control name, e.g. left, rotate or drop
+
+        Returns:
+            None
+        """
+        pass
 
     def handle_key_release(self, event: object) -> None:
         """
@@ -176,4 +433,4 @@ class Game(IGameLoop, IInputHandler, ABC):
         """
         key = getattr(event, 'keysym', None)
         if key:
-            self.logger.debug(f"Key released: {key}")
\ No newline at end of file
+            self.logger.debug("Key released: %s", key)
\ No newline at end of file
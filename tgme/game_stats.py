@@ -12,6 +12,7 @@ class GameStats:
         self.high_score: int = 0
         self.games_played: int = 0
         self.wins: int = 0
+        self.time_played: float = 0.0
 
     def update_score(self, score: int) -> None:
         """
@@ -48,4 +49,51 @@ class GameStats:
         Returns:
             None
         """
-        self.wins += 1 
\ No newline at end of file
+        self.wins += 1
+
+    def add_time_played(self, seconds: float) -> None:
+        """
+        add_time_played
+
+        Args:
+            seconds (float): Length of a finished game in seconds
+
+        Returns:
+            None
+        """
+        self.time_played += seconds
+
+    def to_dict(self) -> dict:
+        """
+        to_dict
+
+        Args:
+            None
+
+        Returns:
+            stats (dict): The stats as a plain dict suitable for storage
+        """
+        return {
+            'high_score': self.high_score,
+            'games_played': self.games_played,
+            'wins': self.wins,
+            'time_played': self.time_played
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'GameStats':
+        """
+        from_dict
+
+        Args:
+            data (dict): Stats as produced by to_dict, missing entries default to 0
+
+        Returns:
+            stats (GameStats): The reconstructed stats
+        """
+        stats = cls()
+        stats.high_score = data.get('high_score', 0)
+        stats.games_played = data.get('games_played', 0)
+        stats.wins = data.get('wins', 0)
+        stats.time_played = data.get('time_played', 0.0)
+        return stats
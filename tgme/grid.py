@@ -1,5 +1,58 @@
-from typing import List, Optional
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from tgme.tile import Tile
+from tgme.utils.game_random import MASK_64, GameRandom
+
+# Fixed so hashes agree between processes, e.g. for desync detection
+ZOBRIST_SEED = 0x7A0B215E
+
+_TILE_KEYS: Dict[tuple, int] = {}
+_ROW_KEYS: List[int] = []
+
+
+def _tile_key(tile: Optional[Tile], y: int) -> int:
+    """Zobrist key of a tile in column y, by its type and color"""
+    if tile is None:
+        return 0
+    key = (tile.tile_type, tile.tile_color, y)
+    value = _TILE_KEYS.get(key)
+    if value is None:
+        # Seeded from the tile's name rather than hash(), which changes between runs
+        name = f"{tile.tile_type}/{tile.tile_color}/{y}".encode('utf-8')
+        value = _TILE_KEYS[key] = GameRandom(ZOBRIST_SEED ^ zlib.crc32(name)).getrandbits(64)
+    return value
+
+
+def _hash_row(row: List[Optional[Tile]]) -> int:
+    row_hash = 0
+    for y, tile in enumerate(row):
+        row_hash ^= _tile_key(tile, y)
+    return row_hash
+
+
+def _row_term(x: int, row_hash: int) -> int:
+    """Mix a row's hash with its index, so moving rows changes the board hash"""
+    while len(_ROW_KEYS) <= x:
+        _ROW_KEYS.append(GameRandom(ZOBRIST_SEED + len(_ROW_KEYS)).getrandbits(64))
+    z = (row_hash ^ _ROW_KEYS[x]) & MASK_64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return z ^ (z >> 31)
+
+
+class GridSnapshot(NamedTuple):
+    '''
+    The contents of a grid at one point in time.
+
+    Rows are shared with the grid they came from rather than copied, the
+    grid copies a shared row before its first write to it.
+    '''
+    rows: Tuple[List[Optional[Tile]], ...]
+    version: int
+    # Hashes are recomputed on restore if None
+    row_hashes: Optional[Tuple[int, ...]] = None
+    board_hash: Optional[int] = None
+
 
 class Grid:
     '''
@@ -7,8 +60,19 @@ class Grid:
 
     Each Grid has a list of tiles. Each Grid is to be implemented by the developer.
 
-    Each Tile has a type and a state. 
+    Each Tile has a type and a state.
+
+    Change tiles only through the Grid methods, writing to `tiles` directly
+    would also change snapshots that share the row and leave `hash` stale.
+
+    `hash` is a 64-bit Zobrist hash of the tiles' types and colors by
+    position. Each row keeps the XOR of its cells' keys, updated on every
+    write, and the board hash mixes each row hash with its row index, so a
+    cell change costs O(1) and collapsing or pushing a row O(rows).
     '''
+    # Cross-check the incremental hash against a full recompute on every read
+    check_hash: bool = False
+
     def __init__(self, rows: int, columns: int) -> None:
         """
         __init__
@@ -28,6 +92,105 @@ class Grid:
         self.tiles: List[List[Optional[Tile]]] = [
             [None for _ in range(columns)] for _ in range(rows)
         ]
+        # Whether each row list belongs to this grid alone, rows shared with a
+        # snapshot are copied before they are written (copy-on-write)
+        self._owned: List[bool] = [True] * rows
+        self._row_hashes: List[int] = [0] * rows
+        self._hash: int = self._combine_rows()
+        # Bumped on every mutation so views can skip redrawing unchanged grids
+        self.version: int = 0
+
+    def _combine_rows(self) -> int:
+        board_hash = 0
+        for x, row_hash in enumerate(self._row_hashes):
+            board_hash ^= _row_term(x, row_hash)
+        return board_hash
+
+    def _set_cell(self, x: int, y: int, tile: Optional[Tile]) -> None:
+        """Write one cell, updating the row and board hashes"""
+        row = self._writable_row(x)
+        row_hash = self._row_hashes[x]
+        new_hash = row_hash ^ _tile_key(row[y], y) ^ _tile_key(tile, y)
+        row[y] = tile
+        if new_hash != row_hash:
+            self._hash ^= _row_term(x, row_hash) ^ _row_term(x, new_hash)
+            self._row_hashes[x] = new_hash
+
+    @property
+    def hash(self) -> int:
+        """The Zobrist hash of the grid in O(1), equal grids have equal hashes"""
+        if self.check_hash:
+            expected = self.compute_hash()
+            if expected != self._hash:
+                raise RuntimeError(f"Grid hash is out of sync: {self._hash:016x} != {expected:016x}")
+        return self._hash
+
+    def compute_hash(self) -> int:
+        """
+        compute_hash recomputes the hash from every cell in O(rows * columns)
+
+        Args:
+            None
+
+        Returns:
+            hash (int): What `hash` should currently be
+        """
+        board_hash = 0
+        for x, row in enumerate(self.tiles):
+            board_hash ^= _row_term(x, _hash_row(row))
+        return board_hash
+
+    def _writable_row(self, x: int) -> List[Optional[Tile]]:
+        """Return row x for writing, copying it first if a snapshot shares it"""
+        if not self._owned[x]:
+            self.tiles[x] = list(self.tiles[x])
+            self._owned[x] = True
+        return self.tiles[x]
+
+    def snapshot(self) -> GridSnapshot:
+        """
+        snapshot takes O(rows) time, no tiles are copied
+
+        Args:
+            None
+
+        Returns:
+            snapshot (GridSnapshot): The current contents, unaffected by later changes
+        """
+        self._owned = [False] * self.rows
+        return GridSnapshot(tuple(self.tiles), self.version, tuple(self._row_hashes), self._hash)
+
+    def restore(self, snapshot: GridSnapshot) -> None:
+        """
+        restore takes O(rows) time, the snapshot can be restored again later
+
+        Args:
+            snapshot (GridSnapshot): A snapshot taken from a grid of the same size
+
+        Returns:
+            None
+        """
+        if len(snapshot.rows) != self.rows:
+            raise ValueError("Snapshot does not match the grid size")
+
+        self.tiles = list(snapshot.rows)
+        self._owned = [False] * self.rows
+        if snapshot.row_hashes is not None and snapshot.board_hash is not None:
+            self._row_hashes = list(snapshot.row_hashes)
+            self._hash = snapshot.board_hash
+        else:
+            self._row_hashes = [_hash_row(row) for row in self.tiles]
+            self._hash = self._combine_rows()
+        # Contents changed, so move the version on rather than back
+        self.version += 1
+
+    def clear(self) -> None:
+        """Empty every cell in O(rows), snapshots taken before are unaffected"""
+        self.tiles = [[None] * self.columns for _ in range(self.rows)]
+        self._owned = [True] * self.rows
+        self._row_hashes = [0] * self.rows
+        self._hash = self._combine_rows()
+        self.version += 1
 
     def is_valid_position(self, x: int, y: int) -> bool:
         """Check if a position is within grid bounds"""
@@ -51,9 +214,77 @@ class Grid:
         if not self.is_valid_position(x, y):
             return False
             
-        self.tiles[x][y] = tile
+        self._set_cell(x, y, tile)
+        self.version += 1
         return True
 
+    def remove_tile(self, x: int, y: int) -> Optional[Tile]:
+        """
+        remove_tile
+
+        Args:
+            x (int): Row index
+            y (int): Column index
+
+        Returns:
+            tile (Optional[Tile]): The removed tile, or None if the cell was empty
+        """
+        if not self.is_valid_position(x, y):
+            return None
+
+        tile = self.tiles[x][y]
+        if tile is not None:
+            self._set_cell(x, y, None)
+            self.version += 1
+        return tile
+
+    def move_tile(self, from_x: int, from_y: int, to_x: int, to_y: int) -> None:
+        """Move the tile at (from_x, from_y) to (to_x, to_y), leaving the source empty"""
+        tile = self.tiles[from_x][from_y]
+        self._set_cell(from_x, from_y, None)
+        self._set_cell(to_x, to_y, tile)
+        self.version += 1
+
+    def collapse_row(self, x: int) -> None:
+        """Remove row x, shift every row above it down by one and empty the top row"""
+        del self.tiles[x]
+        del self._owned[x]
+        del self._row_hashes[x]
+        self.tiles.insert(0, [None] * self.columns)
+        self._owned.insert(0, True)
+        self._row_hashes.insert(0, 0)
+        self._hash = self._combine_rows()
+        self.version += 1
+
+    def push_row(self, row: List[Optional[Tile]]) -> None:
+        """Shift every row up by one, dropping the top row, and append row at the bottom"""
+        if len(row) != self.columns:
+            raise ValueError("Row length must match the number of columns")
+
+        del self.tiles[0]
+        del self._owned[0]
+        del self._row_hashes[0]
+        self.tiles.append(list(row))
+        self._owned.append(True)
+        self._row_hashes.append(_hash_row(row))
+        self._hash = self._combine_rows()
+        self.version += 1
+
+    def occupancy(self) -> List[int]:
+        """
+        occupancy
+
+        Args:
+            None
+
+        Returns:
+            rows (List[int]): One bitmask per row, bit y set when column y is occupied
+        """
+        return [
+            sum(1 << y for y, tile in enumerate(row) if tile is not None)
+            for row in self.tiles
+        ]
+
     def get_tile(self, x: int, y: int) -> Optional[Tile]:
         """
         get_tile
@@ -1,7 +1,13 @@
 import abc
 from abc import ABC
-from typing import List
+from typing import Any, Iterator, List, Optional, Tuple, TYPE_CHECKING
 from tgme.tile import Tile
+from tgme.player_profile import PlayerProfile
+
+if TYPE_CHECKING:
+    # Only for annotations, tgme.game imports this module
+    from tgme.game import Game
+    from tgme.grid import Grid
 
 class IGameManager(ABC):
     def manage_games(self) -> None:
@@ -116,3 +122,141 @@ class IMatchingStrategy(ABC):
             List[List[Tile]]: A list of matched tiles that meet the matching criteria.
         """
         pass
+
+
+class ICPUPlayer(ABC):
+    @abc.abstractmethod
+    def search(self, game: 'Game', player: int) -> Iterator[Optional[Any]]:
+        """
+        search is an anytime search, callers may stop it after any step
+
+        Args:
+            game (Game): The game to move in, read when the search starts
+            player (int): The index of the player to move
+
+        Returns:
+            moves (Iterator[Optional[Any]]): The best move found so far after each step, moves
+                have an `actions` list to dispatch
+        """
+        pass
+
+
+class IProfileStore(ABC):
+    @abc.abstractmethod
+    def load_profiles(self) -> List[PlayerProfile]:
+        """
+        load_profiles
+
+        Args:
+            None
+
+        Returns:
+            profiles (List[PlayerProfile]): Every stored player profile
+        """
+        pass
+
+    def load_profile(self, username: str) -> Optional[PlayerProfile]:
+        """
+        load_profile scans every profile, stores that can look one up directly should override it
+
+        Args:
+            username (str): The username to load
+
+        Returns:
+            profile (Optional[PlayerProfile]): The stored profile, or None if there is none
+        """
+        for profile in self.load_profiles():
+            if profile.username == username:
+                return profile
+        return None
+
+    def has_profile(self, username: str) -> bool:
+        """Check if a profile with this username is stored"""
+        return self.load_profile(username) is not None
+
+    def search_usernames(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        search_usernames scans every profile, stores with a username index should override it
+
+        Args:
+            prefix (str): The start of a username
+            limit (int): The maximum number of usernames to return
+
+        Returns:
+            usernames (List[str]): Stored usernames starting with prefix, in sorted order
+        """
+        usernames = sorted(p.username for p in self.load_profiles() if p.username.startswith(prefix))
+        return usernames[:limit]
+
+    @abc.abstractmethod
+    def save_profile(self, profile: PlayerProfile) -> None:
+        """
+        save_profile
+
+        Args:
+            profile (PlayerProfile): A new or changed profile to persist
+
+        Returns:
+            None
+        """
+        pass
+
+    @abc.abstractmethod
+    def save_profiles(self, profiles: List[PlayerProfile]) -> None:
+        """
+        save_profiles
+
+        Args:
+            profiles (List[PlayerProfile]): Profiles to persist in a single batch
+
+        Returns:
+            None
+        """
+        pass
+
+    @abc.abstractmethod
+    def delete_profile(self, username: str) -> None:
+        """
+        delete_profile
+
+        Args:
+            username (str): The username of the profile to remove
+
+        Returns:
+            None
+        """
+        pass
+
+    def load_leaderboard(self, game_id: str, stat: str) -> List[Tuple[str, int]]:
+        """
+        load_leaderboard scans every profile, stores with an index on stats should override it
+
+        Args:
+            game_id (str): The identifier of the game
+            stat (str): The stat to read (e.g. high_score, wins)
+
+        Returns:
+            entries (List[Tuple[str, int]]): (username, value) for every profile that has the stat
+        """
+        entries = []
+        for profile in self.load_profiles():
+            game_stats = profile.stats.get(game_id)
+            if isinstance(game_stats, dict) and stat in game_stats:
+                entries.append((profile.username, game_stats[stat]))
+        return entries
+
+    def max_journal_seq(self) -> int:
+        """
+        max_journal_seq scans every profile, stores that can aggregate should override it
+
+        Args:
+            None
+
+        Returns:
+            seq (int): The highest stats journal sequence number any profile includes, 0 if none
+        """
+        return max((profile.journal_seq for profile in self.load_profiles()), default=0)
+
+    def close(self) -> None:
+        """Release any resources held by the store"""
+        pass
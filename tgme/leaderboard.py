@@ -0,0 +1,141 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+class Leaderboard:
+    '''
+    This class is responsible for ranking players on one stat of one game.
+
+    Entries are kept in a list sorted by (-value, username), so reading the
+    top N is a slice and finding a player's rank is a binary search. An
+    update only moves the one entry that changed.
+    '''
+    def __init__(self, game_id: str, metric: str, entries: Iterable[Tuple[str, int]] = ()) -> None:
+        """
+        __init__
+
+        Args:
+            game_id (str): The identifier of the game
+            metric (str): The stat players are ranked by (e.g. high_score, wins)
+            entries (Iterable[Tuple[str, int]]): Initial (username, value) pairs
+
+        Returns:
+            None
+        """
+        self.game_id = game_id
+        self.metric = metric
+        self._values: Dict[str, int] = dict(entries)
+        self._ranking: List[Tuple[int, str]] = sorted(
+            (-value, username) for username, value in self._values.items()
+        )
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def update(self, username: str, value: int) -> None:
+        """
+        update
+
+        Args:
+            username (str): The player whose value changed
+            value (int): The player's new value
+
+        Returns:
+            None
+        """
+        old = self._values.get(username)
+        if old == value:
+            return
+        if old is not None:
+            del self._ranking[bisect_left(self._ranking, (-old, username))]
+        self._values[username] = value
+        insort(self._ranking, (-value, username))
+
+    def remove(self, username: str) -> None:
+        old = self._values.pop(username, None)
+        if old is not None:
+            del self._ranking[bisect_left(self._ranking, (-old, username))]
+
+    def top(self, limit: int = 100) -> List[Tuple[str, int]]:
+        """
+        top
+
+        Args:
+            limit (int): The number of entries to return
+
+        Returns:
+            entries (List[Tuple[str, int]]): (username, value) pairs, best first
+        """
+        return [(username, -value) for value, username in self._ranking[:limit]]
+
+    def rank(self, username: str) -> Optional[int]:
+        """
+        rank
+
+        Args:
+            username (str): The player to look up
+
+        Returns:
+            rank (Optional[int]): 1-based rank, players with equal values share a rank,
+                or None if the player has no entry
+        """
+        value = self._values.get(username)
+        if value is None:
+            return None
+        return bisect_left(self._ranking, (-value, '')) + 1
+
+
+class Leaderboards:
+    '''
+    This class is responsible for the leaderboards of every game and metric.
+
+    A leaderboard is loaded from the profile store the first time it is
+    queried and is then kept up to date as results are recorded.
+    '''
+    METRICS = ('high_score', 'wins')
+
+    def __init__(self, loader) -> None:
+        """
+        __init__
+
+        Args:
+            loader (Callable[[str, str], Iterable[Tuple[str, int]]]): Returns the stored
+                (username, value) pairs for a game and metric
+
+        Returns:
+            None
+        """
+        self._loader = loader
+        self._boards: Dict[Tuple[str, str], Leaderboard] = {}
+
+    def get(self, game_id: str, metric: str) -> Leaderboard:
+        """Return the leaderboard for a game and metric, loading it on first use"""
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown leaderboard metric: {metric}")
+
+        board = self._boards.get((game_id, metric))
+        if board is None:
+            board = Leaderboard(game_id, metric, self._loader(game_id, metric))
+            self._boards[(game_id, metric)] = board
+        return board
+
+    def update(self, username: str, game_id: str, stats: dict) -> None:
+        """
+        update
+
+        Args:
+            username (str): The player whose stats changed
+            game_id (str): The identifier of the game
+            stats (dict): The player's current stats for that game
+
+        Returns:
+            None
+        """
+        for metric in self.METRICS:
+            board = self._boards.get((game_id, metric))
+            # Boards that are not loaded yet pick the change up when they are
+            if board is not None and metric in stats:
+                board.update(username, stats[metric])
+
+    def remove(self, username: str) -> None:
+        for board in self._boards.values():
+            board.remove(username)
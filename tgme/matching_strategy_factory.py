@@ -1,6 +1,5 @@
 from tgme.interfaces import IMatchingStrategy
-from games.tetris_matching_strategy import TetrisMatchingStrategy
-from games.puzzle_fighter_matching_strategy import PuzzleFighterMatchingStrategy
+from tgme.plugins import get_plugin
 
 
 class MatchingStrategyFactory:
@@ -9,11 +8,6 @@ class MatchingStrategyFactory:
         """
         Factory method to return the correct matching strategy based on the game type.
         :param game_id: the game identifier to determine the strategy.
-        :return: an appropriate instance of IMatchingStrategy.
+        :return: an appropriate instance of IMatchingStrategy, imported from the game's plugin on first use.
         """
-        if game_id == "Tetris":
-            return TetrisMatchingStrategy()
-        elif game_id == "Puzzle Fighter":
-            return PuzzleFighterMatchingStrategy()
-        else:
-            raise ValueError(f"Unknown game type: {game_id}")
+        return get_plugin(game_id).create_matching_strategy()
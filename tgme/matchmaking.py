@@ -0,0 +1,209 @@
+import heapq
+import itertools
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+DEFAULT_RATING = 1000.0
+
+
+def skill_rating(stats: Any) -> float:
+    """
+    skill_rating
+
+    Args:
+        stats (Any): A profile's stats for one game, as stored in PlayerProfile.stats
+
+    Returns:
+        rating (float): 0 to 2000, from the win rate with a prior of one win in two games,
+            so new players start at DEFAULT_RATING and few games move it little
+    """
+    if not isinstance(stats, dict):
+        stats = getattr(stats, '__dict__', {})
+    games = stats.get('games_played', 0)
+    wins = stats.get('wins', 0)
+    return 2 * DEFAULT_RATING * (wins + 1) / (games + 2)
+
+
+@dataclass(eq=False)
+class QueueEntry:
+    '''A waiting player.'''
+    player_id: Hashable
+    rating: float
+    queue: Hashable
+    bucket: int
+    enqueued_at: float
+    data: Any = None
+    # Buckets either side of its own this player accepts an opponent from
+    window: int = 0
+    seq: int = field(default=0, repr=False)
+
+
+class Matchmaker:
+    '''
+    Pairs waiting players of similar skill.
+
+    Players wait in buckets of bucket_width rating points, one ordered dict
+    per bucket in arrival order, and each queue keeps a sorted list of its
+    non-empty buckets. A new player is paired with the longest waiting
+    player in the nearest non-empty bucket either window reaches, which is a
+    binary search, so enqueue is O(log n). Every widen_every seconds a
+    waiting player's window grows by one bucket, up to max_widen. Widening
+    is driven by a heap of due times, so poll only visits players whose
+    window just grew rather than scanning the queue.
+    '''
+    def __init__(self, bucket_width: float = 50.0, widen_every: float = 5.0, max_widen: int = 10,
+                 on_match: Optional[Callable[[QueueEntry, QueueEntry], None]] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        __init__
+
+        Args:
+            bucket_width (float): Rating points per bucket
+            widen_every (float): Seconds of waiting per bucket the window grows by
+            max_widen (int): The most buckets either side a window grows to
+            on_match (Optional[Callable[[QueueEntry, QueueEntry], None]]): Called with every pair,
+                the longer waiting player first, e.g. to hand it to the game host
+            clock (Callable[[], float]): Current time in seconds
+
+        Returns:
+            None
+        """
+        if bucket_width <= 0 or widen_every <= 0 or max_widen < 0:
+            raise ValueError("Bucket width and widen interval must be positive, max_widen not negative")
+
+        self.bucket_width = bucket_width
+        self.widen_every = widen_every
+        self.max_widen = max_widen
+        self.on_match = on_match
+        self.clock = clock
+        self._entries: Dict[Hashable, QueueEntry] = {}
+        # Queue: bucket: player id: entry
+        self._buckets: Dict[Hashable, Dict[int, 'OrderedDict[Hashable, QueueEntry]']] = {}
+        # Queue: sorted indices of its non-empty buckets
+        self._occupied: Dict[Hashable, List[int]] = {}
+        # (due time, seq, entry), entries that have left the queue are skipped when popped
+        self._widen_events: List[Tuple[float, int, QueueEntry]] = []
+        self._seq = itertools.count()
+        self.matches = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, player_id: Hashable) -> bool:
+        return player_id in self._entries
+
+    def _add(self, entry: QueueEntry) -> None:
+        buckets = self._buckets.setdefault(entry.queue, {})
+        bucket = buckets.get(entry.bucket)
+        if bucket is None:
+            bucket = buckets[entry.bucket] = OrderedDict()
+            insort(self._occupied.setdefault(entry.queue, []), entry.bucket)
+        bucket[entry.player_id] = entry
+        self._entries[entry.player_id] = entry
+
+    def _remove(self, entry: QueueEntry) -> None:
+        del self._entries[entry.player_id]
+        buckets = self._buckets[entry.queue]
+        bucket = buckets[entry.bucket]
+        del bucket[entry.player_id]
+        if not bucket:
+            del buckets[entry.bucket]
+            occupied = self._occupied[entry.queue]
+            del occupied[bisect_left(occupied, entry.bucket)]
+
+    def _oldest(self, queue: Hashable, bucket: int, exclude: QueueEntry) -> Optional[QueueEntry]:
+        for entry in self._buckets[queue][bucket].values():
+            if entry is not exclude:
+                return entry
+        return None
+
+    def _find_partner(self, entry: QueueEntry) -> Optional[QueueEntry]:
+        """The longest waiting player in the nearest bucket that either player's window reaches"""
+        occupied = self._occupied[entry.queue]
+        # entry's own bucket is occupied, by entry at least
+        index = bisect_left(occupied, entry.bucket)
+        candidates = []
+        for position in (index, index + 1, index - 1):
+            if not 0 <= position < len(occupied):
+                continue
+            partner = self._oldest(entry.queue, occupied[position], entry)
+            distance = abs(occupied[position] - entry.bucket)
+            if partner is not None and distance <= max(entry.window, partner.window):
+                candidates.append((distance, partner.enqueued_at, partner.seq, partner))
+        return min(candidates)[3] if candidates else None
+
+    def _pair(self, entry: QueueEntry, partner: QueueEntry) -> Tuple[QueueEntry, QueueEntry]:
+        self._remove(entry)
+        self._remove(partner)
+        self.matches += 1
+        pair = (partner, entry) if (partner.enqueued_at, partner.seq) <= (entry.enqueued_at, entry.seq) else (entry, partner)
+        if self.on_match is not None:
+            self.on_match(*pair)
+        return pair
+
+    def enqueue(self, player_id: Hashable, rating: float, queue: Hashable = None, data: Any = None
+                ) -> Optional[Tuple[QueueEntry, QueueEntry]]:
+        """
+        enqueue
+
+        Args:
+            player_id (Hashable): Unique per waiting player, e.g. a username
+            rating (float): The player's skill, e.g. from skill_rating
+            queue (Hashable): Players are only paired within the same queue, e.g. a game id
+            data (Any): Kept on the entry for on_match, e.g. a connection
+
+        Returns:
+            pair (Optional[Tuple[QueueEntry, QueueEntry]]): The pair if the player was matched at
+                once, otherwise None and the player waits
+        """
+        if player_id in self._entries:
+            raise ValueError(f"Player already queued: {player_id}")
+        now = self.clock()
+        entry = QueueEntry(player_id, rating, queue, int(rating // self.bucket_width), now, data, 0, next(self._seq))
+        self._add(entry)
+        partner = self._find_partner(entry)
+        if partner is not None:
+            return self._pair(entry, partner)
+        if self.max_widen > 0:
+            heapq.heappush(self._widen_events, (now + self.widen_every, entry.seq, entry))
+        return None
+
+    def cancel(self, player_id: Hashable) -> bool:
+        """Take a player out of the queue, returns whether it was waiting"""
+        entry = self._entries.get(player_id)
+        if entry is None:
+            return False
+        self._remove(entry)
+        return True
+
+    def poll(self) -> List[Tuple[QueueEntry, QueueEntry]]:
+        """
+        poll widens the windows that are due and pairs the players that now reach a partner
+
+        Args:
+            None
+
+        Returns:
+            pairs (List[Tuple[QueueEntry, QueueEntry]]): Every pair made
+        """
+        now = self.clock()
+        pairs = []
+        events = self._widen_events
+        while events and events[0][0] <= now:
+            due, _, entry = heapq.heappop(events)
+            if self._entries.get(entry.player_id) is not entry:
+                continue
+            entry.window += 1
+            partner = self._find_partner(entry)
+            if partner is not None:
+                pairs.append(self._pair(entry, partner))
+            elif entry.window < self.max_widen:
+                heapq.heappush(events, (due + self.widen_every, entry.seq, entry))
+        return pairs
+
+    def wait_time(self, player_id: Hashable) -> Optional[float]:
+        entry = self._entries.get(player_id)
+        return None if entry is None else self.clock() - entry.enqueued_at
@@ -0,0 +1,109 @@
+import asyncio
+from typing import Set
+
+
+class Broadcaster:
+    '''
+    Fans the same encoded messages out to many subscribers.
+
+    Messages are encoded once by the caller and the same bytes are written
+    to every subscriber. A subscriber whose socket buffer grows past
+    high_water is moved to keyframe-only: deltas are skipped and it is only
+    sent keyframes, which replace its whole board. Once its buffer drains
+    below low_water it is sent deltas again, from a keyframe on, so its
+    board stays consistent. Past max_buffer it is disconnected.
+    '''
+    def __init__(self, high_water: int = 64 * 1024, low_water: int = 16 * 1024, max_buffer: int = 1 << 20) -> None:
+        """
+        __init__
+
+        Args:
+            high_water (int): Buffered bytes at which a subscriber drops to keyframe-only
+            low_water (int): Buffered bytes below which it gets deltas again
+            max_buffer (int): Buffered bytes at which it is disconnected
+
+        Returns:
+            None
+        """
+        if not 0 <= low_water <= high_water <= max_buffer:
+            raise ValueError("Buffer limits must satisfy low_water <= high_water <= max_buffer")
+        self.high_water = high_water
+        self.low_water = low_water
+        self.max_buffer = max_buffer
+        self._live: Set[asyncio.StreamWriter] = set()
+        self._keyframe_only: Set[asyncio.StreamWriter] = set()
+        self.messages = 0
+        self.bytes_written = 0
+        self.downgrades = 0
+        self.upgrades = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._live) + len(self._keyframe_only)
+
+    def subscribe(self, writer: asyncio.StreamWriter, keyframe: bytes) -> None:
+        """Add a subscriber, starting it from a keyframe of the current state"""
+        self._live.add(writer)
+        self._write(writer, keyframe)
+
+    def unsubscribe(self, writer: asyncio.StreamWriter) -> None:
+        self._live.discard(writer)
+        self._keyframe_only.discard(writer)
+
+    def is_keyframe_only(self, writer: asyncio.StreamWriter) -> bool:
+        return writer in self._keyframe_only
+
+    def _write(self, writer: asyncio.StreamWriter, message: bytes) -> None:
+        writer.write(message)
+        self.bytes_written += len(message)
+
+    def _drop(self, writer: asyncio.StreamWriter) -> None:
+        self.unsubscribe(writer)
+        self.dropped += 1
+        writer.close()
+
+    def publish(self, message: bytes, keyframe: bool = False) -> None:
+        """
+        publish
+
+        Args:
+            message (bytes): An encoded message, written as is to every subscriber
+            keyframe (bool): Whether it holds the whole state, keyframe-only subscribers only get these
+
+        Returns:
+            None
+        """
+        self.messages += 1
+        for writer in list(self._live):
+            if writer.is_closing():
+                self.unsubscribe(writer)
+            elif writer.transport.get_write_buffer_size() > self.high_water:
+                self._live.discard(writer)
+                self._keyframe_only.add(writer)
+                self.downgrades += 1
+            else:
+                self._write(writer, message)
+        if not keyframe:
+            return
+        for writer in list(self._keyframe_only):
+            buffered = writer.transport.get_write_buffer_size()
+            if writer.is_closing():
+                self.unsubscribe(writer)
+            elif buffered > self.max_buffer:
+                self._drop(writer)
+            else:
+                self._write(writer, message)
+                if buffered <= self.low_water:
+                    self._keyframe_only.discard(writer)
+                    self._live.add(writer)
+                    self.upgrades += 1
+
+    def close(self, message: bytes = b'') -> None:
+        """Send every subscriber a last message, then disconnect them all"""
+        for writer in self._live | self._keyframe_only:
+            if not writer.is_closing():
+                if message:
+                    self._write(writer, message)
+                writer.close()
+        self._live.clear()
+        self._keyframe_only.clear()
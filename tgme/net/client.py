@@ -0,0 +1,123 @@
+import asyncio
+from typing import List, Optional, Tuple
+from tgme.net.protocol import (
+    END, ERROR, FRAME, REDIRECT, START, STATE, BoardMirror, StateUpdate, decode_end, decode_redirect,
+    decode_start, decode_state, encode_attach, encode_input, encode_join, encode_watch, read_message,
+    unpack_str
+)
+from tgme.plugins import get_plugin
+
+
+class MatchClient:
+    '''
+    Connects to a match server, plays one match and mirrors its state.
+
+    connect, or watch for a spectator, runs the lobby handshake and
+    returns once the match has started, then receive returns each STATE
+    update already applied to board, until the match ends.
+    '''
+    def __init__(self, host: str = '127.0.0.1', port: int = 7777) -> None:
+        """
+        __init__
+
+        Args:
+            host (str): The match server's address
+            port (int): The lobby's port
+
+        Returns:
+            None
+        """
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.player = 0
+        self.seed = 0
+        self.game_id = ''
+        self.usernames: List[str] = []
+        self.board: Optional[BoardMirror] = None
+        self.final_scores: Optional[List[int]] = None
+        self.bytes_received = 0
+
+    async def connect(self, game_id: str, username: str, players: int = 2, relay: bool = False) -> None:
+        """
+        connect
+
+        Args:
+            game_id (str): The game type to play
+            username (str): This player's username
+            players (int): Players in the match, 1 or 2
+            relay (bool): Join a relay match, which the players simulate themselves
+
+        Returns:
+            None
+        """
+        port, token, player = await self._ask_lobby(encode_join(game_id, username, players, relay))
+        await self._attach(port, encode_attach(token, player))
+
+    async def watch(self, match_id: int = 0) -> None:
+        """Spectate a match, 0 for the newest one, then receive works as for a player"""
+        port, match_id, _ = await self._ask_lobby(encode_watch(match_id))
+        await self._attach(port, encode_watch(match_id, spectate=True))
+
+    async def _ask_lobby(self, request: bytes) -> Tuple[int, int, int]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(request)
+            message_type, payload = await read_message(reader)
+            self._check_error(message_type, payload)
+            if message_type != REDIRECT:
+                raise ConnectionError(f"Expected REDIRECT, got message type {message_type}")
+            return decode_redirect(payload)
+        finally:
+            writer.close()
+
+    async def _attach(self, port: int, request: bytes) -> None:
+        self.reader, self.writer = await asyncio.open_connection(self.host, port)
+        self.writer.write(request)
+        message_type, payload = await read_message(self.reader)
+        self._check_error(message_type, payload)
+        if message_type != START:
+            raise ConnectionError(f"Expected START, got message type {message_type}")
+        self.seed, self.player, self.game_id, self.usernames = decode_start(payload)
+        rows, columns = get_plugin(self.game_id).board_size
+        self.board = BoardMirror(rows, columns, len(self.usernames))
+
+    @staticmethod
+    def _check_error(message_type: int, payload: bytes) -> None:
+        if message_type == ERROR:
+            raise ConnectionError(f"Server error: {unpack_str(payload, 0)[0]}")
+
+    def send_action(self, action: str) -> None:
+        """Send an action, one of protocol.ACTIONS, applied on the server's next tick"""
+        self.writer.write(encode_input(action))
+
+    async def receive(self) -> Optional[StateUpdate]:
+        """
+        receive
+
+        Args:
+            None
+
+        Returns:
+            update (Optional[StateUpdate]): The next state update, already applied to board, or
+                None once the match has ended and final_scores is set
+        """
+        while True:
+            try:
+                message_type, payload = await read_message(self.reader)
+            except asyncio.IncompleteReadError:
+                return None
+            self.bytes_received += FRAME.size + len(payload)
+            self._check_error(message_type, payload)
+            if message_type == STATE:
+                update = decode_state(payload)
+                self.board.apply(update)
+                return update
+            if message_type == END:
+                self.final_scores = decode_end(payload)
+                return None
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
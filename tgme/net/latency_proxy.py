@@ -0,0 +1,148 @@
+"""
+TCP proxy that adds latency and jitter between match clients and a match server.
+
+Messages are delayed by `delay` plus a random amount up to `jitter` in
+each direction, without reordering them, as TCP would not. REDIRECTs
+from the lobby are rewritten to a proxy of the shard they point to, so a
+whole match goes through the proxy. In a relay match both players' links
+are delayed, so the delay between them is twice that.
+
+    python -m tgme.net.latency_proxy --port 7900 --target-port 7777 --delay 0.05 --jitter 0.02
+"""
+import argparse
+import asyncio
+from typing import Dict, Optional, Set
+from tgme.net.protocol import REDIRECT, decode_redirect, encode_message, encode_redirect, read_message
+from tgme.utils.game_random import GameRandom
+
+
+class LatencyProxy:
+    '''Forwards connections to a target, delaying every message.'''
+    def __init__(self, target_host: str, target_port: int, delay: float = 0.05, jitter: float = 0.0,
+                 seed: int = 1, host: str = '127.0.0.1', port: int = 0) -> None:
+        """
+        __init__
+
+        Args:
+            target_host (str): The match server's address
+            target_port (int): The port to forward to
+            delay (float): Seconds every message is delayed, in each direction
+            jitter (float): Up to this many more seconds, drawn per message
+            seed (int): Seed for the jitter
+            host (str): Address to listen on
+            port (int): Port to listen on, 0 for any free port
+
+        Returns:
+            None
+        """
+        if delay < 0 or jitter < 0:
+            raise ValueError("Delay and jitter cannot be negative")
+        self.target_host = target_host
+        self.target_port = target_port
+        self.delay = delay
+        self.jitter = jitter
+        self.rng = GameRandom(seed)
+        self.host = host
+        self.port = port
+        self.server: Optional[asyncio.AbstractServer] = None
+        # Shard port: proxy in front of it
+        self._redirects: Dict[int, 'LatencyProxy'] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        for proxy in self._redirects.values():
+            await proxy.close()
+        for task in self._tasks:
+            task.cancel()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _redirect_port(self, port: int) -> int:
+        proxy = self._redirects.get(port)
+        if proxy is None:
+            proxy = LatencyProxy(self.target_host, port, self.delay, self.jitter, self.rng.getrandbits(32), self.host)
+            await proxy.start()
+            self._redirects[port] = proxy
+        return proxy.port
+
+    async def _handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        try:
+            server_reader, server_writer = await asyncio.open_connection(self.target_host, self.target_port)
+        except ConnectionError:
+            client_writer.close()
+            return
+        loop = asyncio.get_running_loop()
+        for reader, writer, rewrite in ((client_reader, server_writer, False), (server_reader, client_writer, True)):
+            task = loop.create_task(self._pump(reader, writer, rewrite))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _pump(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, rewrite: bool) -> None:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def deliver() -> None:
+            while True:
+                deliver_at, message = await queue.get()
+                if message is None:
+                    break
+                await asyncio.sleep(max(0.0, deliver_at - loop.time()))
+                if writer.is_closing():
+                    break
+                writer.write(message)
+
+        sender = loop.create_task(deliver())
+        last_delivery = 0.0
+        try:
+            while True:
+                message_type, payload = await read_message(reader)
+                if rewrite and message_type == REDIRECT:
+                    port, token, player = decode_redirect(payload)
+                    message = encode_redirect(await self._redirect_port(port), token, player)
+                else:
+                    message = encode_message(message_type, payload)
+                # Never earlier than the previous message, a TCP stream stays in order
+                last_delivery = max(last_delivery, loop.time() + self.delay + self.rng.uniform(0, self.jitter))
+                queue.put_nowait((last_delivery, message))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            queue.put_nowait((0.0, None))
+            try:
+                await sender
+            except ConnectionError:
+                pass
+            writer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7900)
+    parser.add_argument('--target-host', default='127.0.0.1')
+    parser.add_argument('--target-port', type=int, default=7777, help="The match server's lobby port")
+    parser.add_argument('--delay', type=float, default=0.05, help="One way delay in seconds")
+    parser.add_argument('--jitter', type=float, default=0.02, help="Random extra delay up to this, in seconds")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    async def serve() -> None:
+        proxy = LatencyProxy(args.target_host, args.target_port, args.delay, args.jitter, args.seed, args.host, args.port)
+        await proxy.start()
+        print(f"Proxying {args.host}:{proxy.port} to {args.target_host}:{args.target_port} "
+              f"with {args.delay * 1000:.0f}+{args.jitter * 1000:.0f} ms")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
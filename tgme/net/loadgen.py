@@ -0,0 +1,182 @@
+"""
+Load generator for the match server: measures how many matches it hosts at full tick rate.
+
+For every match count it connects enough clients, sends random input at a
+human rate for a while and measures how fast each match's tick advances.
+Matches that end are replaced, so the count stays constant. The highest
+count at which nearly every match still runs at the full tick rate,
+divided by the server's shard processes, is the matches per core. With
+--spectators every match is also watched, and the bytes each spectator
+receives per second are reported.
+
+    python -m tgme.net.server --workers 2 &
+    python -m tgme.net.loadgen --matches 25,50,100,200 --cores 2
+"""
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from tgme.net.client import MatchClient
+from tgme.net.protocol import ACTIONS
+from tgme.utils.game_random import GameRandom
+
+TICKS_PER_SECOND = 60
+# A match keeps up when it runs at this fraction of the full tick rate
+KEEP_UP_FRACTION = 0.95
+
+
+@dataclass
+class ClientStats:
+    ticks: int = 0
+    seconds: float = 0.0
+    updates: int = 0
+    matches: int = 0
+    keyframes: int = 0
+    bytes_received: int = 0
+
+
+async def _play(host: str, port: int, game_id: str, players: int, name: str, actions_per_second: float,
+                rng: GameRandom, end_time: float, stats: ClientStats) -> None:
+    """Play matches back to back until end_time, counting the ticks each one advanced"""
+    while time.monotonic() < end_time:
+        client = MatchClient(host, port)
+        await client.connect(game_id, name, players)
+        stats.matches += 1
+        first_tick: Optional[int] = None
+        last_tick = 0
+        started = last_time = time.monotonic()
+
+        async def send_input() -> None:
+            while True:
+                await asyncio.sleep(rng.expovariate(actions_per_second))
+                client.send_action(rng.choice(ACTIONS))
+
+        sender = asyncio.get_running_loop().create_task(send_input())
+        try:
+            while True:
+                remaining = end_time - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    update = await asyncio.wait_for(client.receive(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if update is None:
+                    break
+                stats.updates += 1
+                if first_tick is None:
+                    first_tick, started = update.tick, time.monotonic()
+                last_tick, last_time = update.tick, time.monotonic()
+        finally:
+            sender.cancel()
+            client.close()
+        if first_tick is not None:
+            # States are only sent when something changed, so measure between the first and last
+            stats.ticks += last_tick - first_tick
+            stats.seconds += last_time - started
+
+
+async def _watch(host: str, port: int, start_delay: float, end_time: float, stats: ClientStats) -> None:
+    """Watch the newest match, and the next newest whenever one ends, until end_time"""
+    await asyncio.sleep(start_delay)
+    while time.monotonic() < end_time:
+        client = MatchClient(host, port)
+        await client.watch()
+        started = time.monotonic()
+        try:
+            while True:
+                remaining = end_time - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    update = await asyncio.wait_for(client.receive(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if update is None:
+                    break
+                stats.updates += 1
+                stats.keyframes += update.keyframe
+        finally:
+            client.close()
+        stats.matches += 1
+        stats.bytes_received += client.bytes_received
+        stats.seconds += time.monotonic() - started
+
+
+async def measure(host: str, port: int, game_id: str, matches: int, players: int, duration: float,
+                  actions_per_second: float, seed: int, spectators: int = 0) -> Tuple[List[float], List[ClientStats]]:
+    """
+    measure
+
+    Args:
+        host (str): The match server's address
+        port (int): The lobby's port
+        game_id (str): The game type to play
+        matches (int): Concurrent matches to keep running
+        players (int): Players per match
+        duration (float): Seconds to run
+        actions_per_second (float): Mean random actions each client sends per second
+        seed (int): Seed for the random input
+        spectators (int): Spectators per match
+
+    Returns:
+        rates (List[float]): Ticks per second each client's matches ran at
+        watchers (List[ClientStats]): What each spectator received
+    """
+    end_time = time.monotonic() + duration
+    stats = [ClientStats() for _ in range(matches * players)]
+    tasks = [
+        _play(host, port, game_id, players, f"load{i}", actions_per_second, GameRandom(seed + i), end_time, stats[i])
+        for i in range(len(stats))
+    ]
+    watchers = [ClientStats() for _ in range(matches * spectators)]
+    # Spectators start once the matches have, and watch whichever is newest
+    tasks.extend(_watch(host, port, 1.0, end_time, stats) for stats in watchers)
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        print(f"  {len(errors)} client(s) failed, first error: {errors[0]!r}")
+    return [s.ticks / s.seconds for s in stats if s.seconds > 0], watchers
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--game', default='Tetris', choices=['Tetris', 'Puzzle Fighter'])
+    parser.add_argument('--matches', default='10,25,50,100', help="Comma separated match counts to measure")
+    parser.add_argument('--players', type=int, default=2, choices=[1, 2])
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per match count")
+    parser.add_argument('--actions-per-second', type=float, default=4.0, help="Mean input rate per client")
+    parser.add_argument('--cores', type=int, default=1, help="Shard processes the server runs, for matches per core")
+    parser.add_argument('--spectators', type=int, default=0, help="Spectators per match")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    best = 0
+    for matches in (int(count) for count in args.matches.split(',')):
+        rates, watchers = asyncio.run(measure(
+            args.host, args.port, args.game, matches, args.players, args.duration, args.actions_per_second, args.seed,
+            args.spectators
+        ))
+        rates.sort()
+        if not rates:
+            print(f"{matches} matches: no state received")
+            continue
+        low = rates[len(rates) // 20]
+        keeps_up = low >= KEEP_UP_FRACTION * TICKS_PER_SECOND
+        print(f"{matches} matches: {sum(rates) / len(rates):.1f} ticks/s mean, {low:.1f} ticks/s 5th percentile "
+              f"({'keeps up' if keeps_up else 'behind'})")
+        if keeps_up:
+            best = max(best, matches)
+        seconds = sum(stats.seconds for stats in watchers)
+        if seconds > 0:
+            updates = sum(stats.updates for stats in watchers)
+            print(f"  spectators: {sum(stats.bytes_received for stats in watchers) / seconds:.0f} bytes/s each, "
+                  f"{sum(stats.keyframes for stats in watchers) / max(updates, 1):.1%} of updates keyframes")
+    print(f"{best} matches at full tick rate, {best / args.cores:.1f} matches per core")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,369 @@
+import asyncio
+import struct
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from tgme.game import Game
+
+# Every message: payload length, message type
+FRAME = struct.Struct('<HB')
+MAX_PAYLOAD = 0xFFFF
+
+# Client to server
+JOIN = 1        # game id, username, player count: find a match
+ATTACH = 2      # token, player index: take a seat in a match the lobby set up
+INPUT = 3       # action code
+PEER_INPUT = 4  # tick, action code: relay matches, an action for the sender's own simulation tick
+PEER_SYNC = 5   # tick, confirmed tick, hash: relay matches, inputs before tick are sent
+WATCH = 6       # match id, 0 for the newest match: ask the lobby where to watch a match
+SPECTATE = 7    # match id: start watching a match on its shard
+# Server to client
+REDIRECT = 10   # port, token, player index: where the match is hosted, for spectators the
+                # token is the match id and the player index is SPECTATOR
+START = 11      # seed, player index, game id, usernames
+STATE = 12      # tick, board changes, pieces, scores, attack queues
+END = 13        # final scores
+ERROR = 14      # reason
+RELAYED_INPUT = 15  # player, tick, action code: another player's PEER_INPUT
+RELAYED_SYNC = 16   # player, tick, confirmed tick, hash: another player's PEER_SYNC
+
+# Actions are sent as their index in this list
+ACTIONS = ['left', 'right', 'down', 'rotate', 'drop', 'counter_rotate']
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+KEYFRAME = 1    # STATE flag: the client should clear its board before applying the cells
+SPECTATOR = 255  # Player index of spectators
+
+_U8 = struct.Struct('<B')
+_U16 = struct.Struct('<H')
+_ATTACH = struct.Struct('<QB')
+_REDIRECT = struct.Struct('<HQB')
+_START = struct.Struct('<QBB')
+_STATE_HEADER = struct.Struct('<IB')
+_CELL = struct.Struct('<BBBB')
+_PIECE_CELL = struct.Struct('<bbB')
+_SCORE = struct.Struct('<i')
+_PEER_INPUT = struct.Struct('<IB')
+_PEER_SYNC = struct.Struct('<IIQ')
+_MATCH_ID = struct.Struct('<I')
+
+
+def pack_str(value: str) -> bytes:
+    data = value.encode('utf-8')
+    if len(data) > 255:
+        raise ValueError("Strings are limited to 255 bytes")
+    return _U8.pack(len(data)) + data
+
+
+def unpack_str(payload: bytes, offset: int) -> Tuple[str, int]:
+    length = payload[offset]
+    end = offset + 1 + length
+    return payload[offset + 1:end].decode('utf-8'), end
+
+
+def encode_message(message_type: int, payload: bytes = b'') -> bytes:
+    """Frame a payload, raising ValueError if it does not fit"""
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Message payload too large: {len(payload)} bytes")
+    return FRAME.pack(len(payload), message_type) + payload
+
+
+async def read_message(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    """Read one message, raises asyncio.IncompleteReadError when the connection closes"""
+    length, message_type = FRAME.unpack(await reader.readexactly(FRAME.size))
+    return message_type, await reader.readexactly(length)
+
+
+def encode_join(game_id: str, username: str, player_count: int, relay: bool = False) -> bytes:
+    """A relay match is simulated by its players, the server only forwards their messages"""
+    payload = pack_str(game_id) + pack_str(username) + _U8.pack(player_count) + _U8.pack(relay)
+    return encode_message(JOIN, payload)
+
+
+def decode_join(payload: bytes) -> Tuple[str, str, int, bool]:
+    game_id, offset = unpack_str(payload, 0)
+    username, offset = unpack_str(payload, offset)
+    relay = len(payload) > offset + 1 and bool(payload[offset + 1])
+    return game_id, username, payload[offset], relay
+
+
+def encode_attach(token: int, player: int) -> bytes:
+    return encode_message(ATTACH, _ATTACH.pack(token, player))
+
+
+def decode_attach(payload: bytes) -> Tuple[int, int]:
+    return _ATTACH.unpack(payload)
+
+
+def encode_watch(match_id: int, spectate: bool = False) -> bytes:
+    """WATCH for the lobby, or SPECTATE for the shard hosting the match"""
+    return encode_message(SPECTATE if spectate else WATCH, _MATCH_ID.pack(match_id))
+
+
+def decode_watch(payload: bytes) -> int:
+    return _MATCH_ID.unpack(payload)[0]
+
+
+def encode_input(action: str) -> bytes:
+    return encode_message(INPUT, _U8.pack(ACTION_CODES[action]))
+
+
+def decode_input(payload: bytes) -> Optional[str]:
+    code = payload[0] if payload else len(ACTIONS)
+    return ACTIONS[code] if code < len(ACTIONS) else None
+
+
+def encode_peer_input(tick: int, action: str) -> bytes:
+    return encode_message(PEER_INPUT, _PEER_INPUT.pack(tick, ACTION_CODES[action]))
+
+
+def encode_peer_sync(tick: int, confirmed: int, state_hash: int) -> bytes:
+    return encode_message(PEER_SYNC, _PEER_SYNC.pack(tick, confirmed, state_hash))
+
+
+def relay_message(message_type: int, player: int, payload: bytes) -> bytes:
+    """Forward a player's PEER_INPUT or PEER_SYNC to the other players"""
+    relayed_type = RELAYED_INPUT if message_type == PEER_INPUT else RELAYED_SYNC
+    return encode_message(relayed_type, _U8.pack(player) + payload)
+
+
+def decode_relayed_input(payload: bytes) -> Tuple[int, int, Optional[str]]:
+    """(player, tick, action), action is None for an unknown code"""
+    tick, code = _PEER_INPUT.unpack_from(payload, 1)
+    return payload[0], tick, ACTIONS[code] if code < len(ACTIONS) else None
+
+
+def decode_relayed_sync(payload: bytes) -> Tuple[int, int, int, int]:
+    """(player, tick, confirmed tick, hash)"""
+    return (payload[0],) + _PEER_SYNC.unpack_from(payload, 1)
+
+
+def encode_redirect(port: int, token: int, player: int) -> bytes:
+    return encode_message(REDIRECT, _REDIRECT.pack(port, token, player))
+
+
+def decode_redirect(payload: bytes) -> Tuple[int, int, int]:
+    return _REDIRECT.unpack(payload)
+
+
+def encode_start(seed: int, player: int, game_id: str, usernames: List[str]) -> bytes:
+    payload = _START.pack(seed, player, len(usernames)) + pack_str(game_id)
+    return encode_message(START, payload + b''.join(pack_str(username) for username in usernames))
+
+
+def decode_start(payload: bytes) -> Tuple[int, int, str, List[str]]:
+    seed, player, count = _START.unpack_from(payload)
+    game_id, offset = unpack_str(payload, _START.size)
+    usernames = []
+    for _ in range(count):
+        username, offset = unpack_str(payload, offset)
+        usernames.append(username)
+    return seed, player, game_id, usernames
+
+
+def encode_end(scores: List[int]) -> bytes:
+    return encode_message(END, _U8.pack(len(scores)) + b''.join(_SCORE.pack(score) for score in scores))
+
+
+def decode_end(payload: bytes) -> List[int]:
+    return [_SCORE.unpack_from(payload, 1 + 4 * i)[0] for i in range(payload[0])]
+
+
+def encode_error(reason: str) -> bytes:
+    return encode_message(ERROR, pack_str(reason[:255]))
+
+
+@dataclass
+class StateUpdate:
+    '''One decoded STATE message.'''
+    tick: int
+    keyframe: bool
+    palette: Dict[int, Tuple[str, str]]                 # New codes: (tile type, color)
+    cells: List[Tuple[int, int, int, int]]              # (grid, row, column, code), code 0 is empty
+    pieces: List[List[Tuple[int, int, int]]]            # Per player (x, y, code)
+    scores: List[int]
+    game_over: List[bool]
+    attacks: List[int]                                  # Per player garbage rows queued
+
+
+def decode_state(payload: bytes) -> StateUpdate:
+    """Inverse of StateEncoder.encode"""
+    tick, flags = _STATE_HEADER.unpack_from(payload)
+    offset = _STATE_HEADER.size
+
+    palette = {}
+    count = payload[offset]
+    offset += 1
+    for _ in range(count):
+        code = payload[offset]
+        tile_type, offset = unpack_str(payload, offset + 1)
+        color, offset = unpack_str(payload, offset)
+        palette[code] = (tile_type, color)
+
+    count = _U16.unpack_from(payload, offset)[0]
+    offset += _U16.size
+    cells = [_CELL.unpack_from(payload, offset + i * _CELL.size) for i in range(count)]
+    offset += count * _CELL.size
+
+    players = payload[offset]
+    offset += 1
+    pieces = []
+    for _ in range(players):
+        count = payload[offset]
+        offset += 1
+        pieces.append([_PIECE_CELL.unpack_from(payload, offset + i * _PIECE_CELL.size) for i in range(count)])
+        offset += count * _PIECE_CELL.size
+
+    scores = [_SCORE.unpack_from(payload, offset + i * _SCORE.size)[0] for i in range(players)]
+    offset += players * _SCORE.size
+    attacks = list(payload[offset:offset + players])
+    game_over_bits = payload[offset + players]
+    return StateUpdate(
+        tick, bool(flags & KEYFRAME), palette, cells, pieces, scores,
+        [bool(game_over_bits >> i & 1) for i in range(players)], attacks
+    )
+
+
+def piece_cells(piece: Any) -> List[Tuple[int, int, str, str]]:
+    """(x, y, tile type, color) of a falling piece, for either piece format GameUI draws"""
+    if piece is None:
+        return []
+    positions = piece.get_positions
+    if positions and len(positions[0]) == 3:
+        return [(x, y, tile.tile_type, tile.tile_color) for x, y, tile in positions]
+    return [(x, y, piece.color, piece.color) for x, y in positions]
+
+
+class StateEncoder:
+    '''
+    Encodes a game's state as STATE messages holding only what changed.
+
+    Grids share unchanged rows with their last snapshot (copy-on-write), so
+    finding the changed cells only compares rows that were written since
+    the previous message. Tiles are sent as one byte codes, each code's
+    type and color are sent once, in the first message that uses it.
+    '''
+    def __init__(self, game: Game) -> None:
+        self.game = game
+        self._palette: Dict[Tuple[str, str], int] = {}
+        self._rows: Optional[List[tuple]] = None
+        self._versions: List[int] = []
+        self._last_tail = b''
+
+    def _code(self, tile_type: str, color: str, new_codes: List[Tuple[int, str, str]]) -> int:
+        key = (str(tile_type), str(color))
+        code = self._palette.get(key)
+        if code is None:
+            if len(self._palette) >= 255:
+                raise ValueError("Too many distinct tiles to encode")
+            code = self._palette[key] = len(self._palette) + 1
+            new_codes.append((code, key[0], key[1]))
+        return code
+
+    def _tail(self, new_codes: List[Tuple[int, str, str]]) -> bytes:
+        game = self.game
+        parts = [_U8.pack(len(game.players))]
+        for piece in game.current_pieces:
+            cells = piece_cells(piece)
+            parts.append(_U8.pack(len(cells)))
+            parts.extend(_PIECE_CELL.pack(x, y, self._code(tile_type, color, new_codes))
+                         for x, y, tile_type, color in cells)
+        parts.extend(_SCORE.pack(score) for score in game.scores)
+        # Games without an attack queue, like Tetris, send zeros. One count per player,
+        # decode_state reads exactly that many
+        attacks = getattr(game, 'pending_attacks', ())
+        parts.extend(_U8.pack(min(len(attacks[player]), 255) if player < len(attacks) else 0)
+                     for player in range(len(game.players)))
+        parts.append(_U8.pack(sum(1 << i for i, over in enumerate(game.game_over) if over)))
+        return b''.join(parts)
+
+    def encode(self, keyframe: bool = False) -> Optional[bytes]:
+        """
+        encode
+
+        Args:
+            keyframe (bool): Send every occupied cell so a new client can start from it, and
+                include every palette code
+
+        Returns:
+            message (Optional[bytes]): A framed STATE message, None if nothing changed since the
+                last one
+        """
+        grids = self.game.grids
+        new_codes: List[Tuple[int, str, str]] = []
+        if keyframe:
+            new_codes = [(code, tile_type, color) for (tile_type, color), code in self._palette.items()]
+        cells = []
+        rows_now = []
+        for index, grid in enumerate(grids):
+            unchanged = (not keyframe and self._rows is not None and self._versions[index] == grid.version)
+            if unchanged:
+                rows_now.append(self._rows[index])
+                continue
+            rows = grid.snapshot().rows
+            rows_now.append(rows)
+            previous = None if keyframe or self._rows is None else self._rows[index]
+            for x, row in enumerate(rows):
+                if previous is not None and previous[x] is row:
+                    continue
+                for y, tile in enumerate(row):
+                    old = None if previous is None else previous[x][y]
+                    if tile is old and previous is not None:
+                        continue
+                    if tile is None:
+                        if previous is not None:
+                            cells.append(_CELL.pack(index, x, y, 0))
+                    elif old is None or keyframe or (tile.tile_type, tile.tile_color) != (old.tile_type, old.tile_color):
+                        cells.append(_CELL.pack(index, x, y, self._code(tile.tile_type, tile.tile_color, new_codes)))
+        self._rows = rows_now
+        self._versions = [grid.version for grid in grids]
+
+        tail = self._tail(new_codes)
+        if not keyframe and not cells and not new_codes and tail == self._last_tail:
+            return None
+        self._last_tail = tail
+
+        palette = [_U8.pack(len(new_codes))]
+        for code, tile_type, color in new_codes:
+            palette.append(_U8.pack(code) + pack_str(tile_type) + pack_str(color))
+        payload = b''.join([
+            _STATE_HEADER.pack(self.game.tick, KEYFRAME if keyframe else 0),
+            *palette,
+            _U16.pack(len(cells)),
+            *cells,
+            tail
+        ])
+        return encode_message(STATE, payload)
+
+
+@dataclass
+class BoardMirror:
+    '''A client's copy of a match, kept up to date from STATE messages.'''
+    rows: int
+    columns: int
+    players: int
+    tick: int = 0
+    grids: List[List[List[Optional[Tuple[str, str]]]]] = field(default_factory=list)
+    pieces: List[List[Tuple[int, int, Tuple[str, str]]]] = field(default_factory=list)
+    scores: List[int] = field(default_factory=list)
+    game_over: List[bool] = field(default_factory=list)
+    attacks: List[int] = field(default_factory=list)
+    palette: Dict[int, Tuple[str, str]] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self.grids = [[[None] * self.columns for _ in range(self.rows)] for _ in range(self.players)]
+
+    def apply(self, update: StateUpdate) -> None:
+        """Apply a decoded STATE message"""
+        self.palette.update(update.palette)
+        if update.keyframe:
+            self.clear()
+        for grid, x, y, code in update.cells:
+            self.grids[grid][x][y] = self.palette[code] if code else None
+        self.pieces = [[(x, y, self.palette[code]) for x, y, code in cells] for cells in update.pieces]
+        self.tick = update.tick
+        self.scores = update.scores
+        self.game_over = update.game_over
+        self.attacks = update.attacks
@@ -0,0 +1,413 @@
+"""
+Rollback netcode: every player simulates the match locally and hides the network delay.
+
+Local input is applied at once. Remote input is predicted, and when the
+real input arrives for a tick already simulated, the game is restored to
+that tick's snapshot and the ticks since are simulated again. Players
+exchange board hashes of ticks whose input everyone has, so a desync is
+detected at the first tick it happens.
+
+Running the module plays two random-input clients against each other
+through a latency proxy and reports how often they rolled back:
+
+    python -m tgme.net.rollback --game Tetris --seconds 30 --delay 0.05 --jitter 0.02
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from tgme.game import Game, GameSnapshot
+from tgme.net.client import MatchClient
+from tgme.net.protocol import (
+    ACTIONS, END, RELAYED_INPUT, RELAYED_SYNC, decode_relayed_input, decode_relayed_sync, encode_peer_input,
+    encode_peer_sync, read_message
+)
+from tgme.replay import Recording, make_replay_game
+from tgme.trace import TICK_END, TICK_START
+from tgme.utils.game_random import GameRandom
+from tgme.utils.logger import TMGELogger
+
+_MASK = (1 << 64) - 1
+
+
+def state_hash(game: Game) -> int:
+    """64-bit hash of every board, from the grids' incremental Zobrist hashes"""
+    value = 0
+    for grid in game._all_grids():
+        value = ((value ^ grid.hash) * 0x100000001B3) & _MASK
+    return value
+
+
+class RollbackSession:
+    '''
+    Runs one player's copy of a match with rollback.
+
+    Actions are taps rather than held buttons, so the prediction for a
+    remote player is no action, which is right on nearly every tick. Only
+    ticks where a remote action arrives late are simulated again. The
+    session never runs more than max_rollback ticks ahead of the input it
+    has from every player, it stalls instead, so a snapshot is always kept
+    for any tick that may need to be restored. A session further ahead of
+    its peers than they are of it waits a tick now and then, so players
+    that started at different times drift back in step.
+
+    Input listeners see each action once, when it is first simulated, and
+    tick listeners see each tick once, with the state as first simulated.
+    '''
+    def __init__(self, game: Game, local_player: int, max_rollback: int = 15, input_delay: int = 0,
+                 on_desync: Optional[Callable[[int], None]] = None) -> None:
+        """
+        __init__
+
+        Args:
+            game (Game): An initialised game, built from the same seed by every player
+            local_player (int): The index of this client's player
+            max_rollback (int): The most ticks to simulate ahead of the remote players' input
+            input_delay (int): Ticks local input waits before it is applied, which trades input
+                lag for fewer rollbacks
+            on_desync (Optional[Callable[[int], None]]): Called with the first tick at which a
+                remote player's board hash differed from this one
+
+        Returns:
+            None
+        """
+        if max_rollback <= 0 or input_delay < 0:
+            raise ValueError("max_rollback must be positive and input_delay not negative")
+
+        self.game = game
+        self.local_player = local_player
+        self.max_rollback = max_rollback
+        self.input_delay = input_delay
+        self.on_desync = on_desync
+        # Tick: [player, action, notified]
+        self._inputs: Dict[int, List[list]] = {}
+        self._snapshots: Dict[int, GameSnapshot] = {}
+        self._hashes: Dict[int, int] = {}
+        # Per player, every input for ticks before this is known
+        self._received = [0] * len(game.players)
+        self._remote_hashes: List[Tuple[int, int, int]] = []
+        # Per player, how far ahead of its confirmed tick it was at its last sync
+        self._remote_leads = [0] * len(game.players)
+        self._ticks_since_wait = 0
+        self._rollback_from: Optional[int] = None
+        self.desync_tick: Optional[int] = None
+        self.rollbacks = 0
+        self.resimulated_ticks = 0
+        self.max_depth = 0
+        self.stalls = 0
+        self.waits = 0
+        self.hash_checks = 0
+        self._hashes[game.tick] = state_hash(game)
+
+    @property
+    def input_tick(self) -> int:
+        """Every local input for ticks before this has been added"""
+        return self.game.tick + self.input_delay
+
+    @property
+    def confirmed_tick(self) -> int:
+        """The latest tick whose state is final, every player's input before it is known"""
+        remote = [tick for player, tick in enumerate(self._received) if player != self.local_player]
+        return min(remote + [self.game.tick])
+
+    @property
+    def confirmed_hash(self) -> int:
+        return self._hashes[self.confirmed_tick]
+
+    def add_local_input(self, action: str) -> int:
+        """
+        add_local_input
+
+        Args:
+            action (str): The local player's action
+
+        Returns:
+            tick (int): The tick it is applied at, to send to the other players
+        """
+        tick = self.input_tick
+        self._inputs.setdefault(tick, []).append([self.local_player, action, False])
+        return tick
+
+    def add_remote_input(self, player: int, tick: int, action: str) -> None:
+        """Add another player's action, rolling back if its tick was already simulated"""
+        if tick < self._received[player]:
+            raise ValueError(f"Input for tick {tick} arrived after player {player} confirmed it")
+        if tick < self.game.tick - self.max_rollback:
+            raise RuntimeError(f"Input for tick {tick} is older than the rollback window")
+        self._inputs.setdefault(tick, []).append([player, action, False])
+        if tick < self.game.tick:
+            self._rollback_from = tick if self._rollback_from is None else min(self._rollback_from, tick)
+
+    def add_remote_sync(self, player: int, tick: int, confirmed: int, remote_hash: int) -> None:
+        """
+        add_remote_sync
+
+        Args:
+            player (int): The player the message is from
+            tick (int): Every input of that player for ticks before this has been sent
+            confirmed (int): The latest tick that player has every input for
+            remote_hash (int): That player's state_hash at confirmed
+
+        Returns:
+            None
+        """
+        self._received[player] = max(self._received[player], tick)
+        self._remote_leads[player] = tick - confirmed
+        self._remote_hashes.append((player, confirmed, remote_hash))
+
+    def _simulate_tick(self, first_time: bool) -> None:
+        tick = self.game.tick
+        self._snapshots[tick] = self.game.snapshot()
+        # Sorted by player, each player's actions in the order they were made, the same on every client
+        for entry in sorted(self._inputs.get(tick, ()), key=lambda entry: entry[0]):
+            if entry[2]:
+                self.game.apply_action(entry[0], entry[1])
+            else:
+                entry[2] = True
+                self.game.dispatch_action(entry[0], entry[1])
+        if first_time:
+            self.game.step()
+        else:
+            self.game.trace_event(TICK_START, value=1)
+            self.game.update()
+            self.game.trace_event(TICK_END)
+        # Puzzle Fighter only checks for a full board here, as on the match server
+        self.game.check_loss_condition()
+        self._hashes[self.game.tick] = state_hash(self.game)
+
+    def _resimulate(self) -> None:
+        start, target = self._rollback_from, self.game.tick
+        self._rollback_from = None
+        self.game.restore(self._snapshots[start])
+        while self.game.tick < target:
+            self._simulate_tick(first_time=False)
+        self.rollbacks += 1
+        self.resimulated_ticks += target - start
+        self.max_depth = max(self.max_depth, target - start)
+
+    def _check_hashes(self) -> None:
+        confirmed = self.confirmed_tick
+        pending = []
+        for player, tick, remote_hash in self._remote_hashes:
+            if tick > confirmed:
+                pending.append((player, tick, remote_hash))
+                continue
+            local_hash = self._hashes.get(tick)
+            if local_hash is None:
+                continue
+            self.hash_checks += 1
+            if local_hash != remote_hash and self.desync_tick is None:
+                self.desync_tick = tick
+                TMGELogger().get_logger('net').error("Desync with player %s at tick %s", player + 1, tick)
+                if self.on_desync is not None:
+                    self.on_desync(tick)
+        self._remote_hashes = pending
+
+    def _prune(self) -> None:
+        oldest = min(self.game.tick - self.max_rollback, self.confirmed_tick)
+        for tick in [tick for tick in self._snapshots if tick < oldest]:
+            del self._snapshots[tick]
+            self._inputs.pop(tick, None)
+        # Hashes are kept longer, remote hashes may confirm ticks later than their snapshots expire
+        for tick in [tick for tick in self._hashes if tick < oldest - 4 * self.max_rollback]:
+            del self._hashes[tick]
+
+    def advance(self) -> bool:
+        """
+        advance runs the next tick, after correcting any mispredicted ticks
+
+        Args:
+            None
+
+        Returns:
+            advanced (bool): False if the session stalled waiting for remote input, or waited for
+                the other players to catch up
+        """
+        if self._rollback_from is not None:
+            self._resimulate()
+        self._check_hashes()
+        lead = self.input_tick - self.confirmed_tick
+        if self.game.tick - self.confirmed_tick >= self.max_rollback:
+            self.stalls += 1
+            return False
+        remote_lead = max(lead for player, lead in enumerate(self._remote_leads) if player != self.local_player)
+        self._ticks_since_wait += 1
+        if lead - remote_lead >= 2 and self._ticks_since_wait >= 8:
+            self._ticks_since_wait = 0
+            self.waits += 1
+            return False
+        self._simulate_tick(first_time=True)
+        self._prune()
+        return True
+
+
+class RollbackClient:
+    '''
+    Plays a relay match on a match server with a RollbackSession.
+
+    Inputs and board hashes are exchanged through the server, which
+    forwards them without simulating the match.
+    '''
+    def __init__(self, host: str = '127.0.0.1', port: int = 7777, max_rollback: int = 15, input_delay: int = 0) -> None:
+        """
+        __init__
+
+        Args:
+            host (str): The match server's address
+            port (int): The lobby's port
+            max_rollback (int): Passed to RollbackSession
+            input_delay (int): Passed to RollbackSession
+
+        Returns:
+            None
+        """
+        self.client = MatchClient(host, port)
+        self.max_rollback = max_rollback
+        self.input_delay = input_delay
+        self.session: Optional[RollbackSession] = None
+        self.ended = False
+        self._last_sync: Optional[Tuple[int, int]] = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def connect(self, game_id: str, username: str, players: int = 2) -> None:
+        """Join a relay match and build the local copy of its game"""
+        await self.client.connect(game_id, username, players, relay=True)
+        game = make_replay_game(Recording(self.client.game_id, self.client.seed, self.client.usernames))
+        game.init()
+        self.session = RollbackSession(game, self.client.player, self.max_rollback, self.input_delay)
+        self._reader = asyncio.get_running_loop().create_task(self._read())
+
+    async def _read(self) -> None:
+        try:
+            while True:
+                message_type, payload = await read_message(self.client.reader)
+                if message_type == RELAYED_INPUT:
+                    player, tick, action = decode_relayed_input(payload)
+                    if action is not None:
+                        self.session.add_remote_input(player, tick, action)
+                elif message_type == RELAYED_SYNC:
+                    self.session.add_remote_sync(*decode_relayed_sync(payload))
+                elif message_type == END:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            TMGELogger().get_logger('net').error("Error reading from match server: %s", e)
+        self.ended = True
+
+    def send_action(self, action: str) -> None:
+        tick = self.session.add_local_input(action)
+        self.client.writer.write(encode_peer_input(tick, action))
+
+    def advance(self) -> bool:
+        """Run one tick of the session and tell the other players how far this one got"""
+        advanced = self.session.advance()
+        if self.client.writer.is_closing():
+            return advanced
+        sync = (self.session.input_tick, self.session.confirmed_tick)
+        if sync != self._last_sync:
+            self._last_sync = sync
+            self.client.writer.write(encode_peer_sync(sync[0], sync[1], self.session.confirmed_hash))
+        return advanced
+
+    async def run(self, seconds: float, on_tick: Optional[Callable[['RollbackClient'], None]] = None) -> None:
+        """
+        run advances the session at the game's tick rate
+
+        Args:
+            seconds (float): How long to play, stops early if the match ends
+            on_tick (Optional[Callable[[RollbackClient], None]]): Called before every tick, e.g. to
+                send input
+
+        Returns:
+            None
+        """
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.session.game.TICKS_PER_SECOND
+        end_time = loop.time() + seconds
+        next_tick = loop.time()
+        while not self.ended and loop.time() < end_time:
+            if on_tick is not None:
+                on_tick(self)
+            self.advance()
+            next_tick = max(next_tick + interval, loop.time() - interval)
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+    def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+        self.client.close()
+
+
+async def soak(game_id: str, seconds: float, delay: float, jitter: float, actions_per_second: float,
+               max_rollback: int, input_delay: int, seed: int) -> List[RollbackClient]:
+    """Play two random-input rollback clients through a latency proxy, on an in-process server"""
+    # Imported here, the server and proxy are only needed for this test
+    from tgme.net.latency_proxy import LatencyProxy
+    from tgme.net.server import Lobby, MatchHost
+
+    host = MatchHost('127.0.0.1', 0)
+    await host.start()
+    lobby = Lobby('127.0.0.1', 0, host)
+    await lobby.start()
+    proxy = LatencyProxy('127.0.0.1', lobby.port, delay, jitter, seed)
+    await proxy.start()
+
+    clients = [RollbackClient('127.0.0.1', proxy.port, max_rollback, input_delay) for _ in range(2)]
+    await asyncio.gather(*(client.connect(game_id, f"peer{i}") for i, client in enumerate(clients)))
+    rngs = [GameRandom(seed + i) for i in range(2)]
+    chance = actions_per_second / clients[0].session.game.TICKS_PER_SECOND
+
+    def random_input(index: int) -> Callable[[RollbackClient], None]:
+        def on_tick(client: RollbackClient) -> None:
+            if rngs[index].random() < chance:
+                client.send_action(rngs[index].choice(ACTIONS))
+        return on_tick
+
+    await asyncio.gather(*(client.run(seconds, random_input(i)) for i, client in enumerate(clients)))
+    # Let the last inputs and hashes arrive, then bring both to the same confirmed tick
+    for _ in range(int((delay + jitter) * 60) + max_rollback + 30):
+        await asyncio.sleep(1 / 60)
+        for client in clients:
+            client.advance()
+    for client in clients:
+        client.close()
+    # Let the server see the connections close before the loop shuts down
+    await asyncio.sleep(delay + jitter + 0.1)
+    await proxy.close()
+    host.server.close()
+    lobby.close()
+    return clients
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Play two rollback clients through a latency proxy")
+    parser.add_argument('--game', default='Tetris', choices=['Tetris', 'Puzzle Fighter'])
+    parser.add_argument('--seconds', type=float, default=30.0)
+    parser.add_argument('--delay', type=float, default=0.05, help="One way delay in seconds")
+    parser.add_argument('--jitter', type=float, default=0.02, help="Random extra delay up to this, in seconds")
+    parser.add_argument('--actions-per-second', type=float, default=4.0)
+    parser.add_argument('--max-rollback', type=int, default=15)
+    parser.add_argument('--input-delay', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    TMGELogger().set_level(logging.WARNING)
+    start = time.perf_counter()
+    clients = asyncio.run(soak(args.game, args.seconds, args.delay, args.jitter, args.actions_per_second,
+                               args.max_rollback, args.input_delay, args.seed))
+    elapsed = time.perf_counter() - start
+    for i, client in enumerate(clients):
+        session = client.session
+        print(f"peer {i}: tick {session.game.tick}, {session.rollbacks} rollbacks "
+              f"({session.resimulated_ticks / elapsed:.1f} ticks/s simulated again, deepest {session.max_depth}), "
+              f"{session.stalls} stalls, {session.waits} waits, {session.hash_checks} hash checks, "
+              f"desync {'at tick ' + str(session.desync_tick) if session.desync_tick is not None else 'none'}")
+    confirmed = min(client.session.confirmed_tick for client in clients)
+    hashes = {client.session._hashes.get(confirmed) for client in clients}
+    print(f"boards at tick {confirmed}: {'match' if len(hashes) == 1 else 'differ'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,598 @@
+"""
+Authoritative match server for headless Tetris and Puzzle Fighter games.
+
+Clients JOIN the lobby, which pairs them per game type and REDIRECTs
+each one to the shard hosting its match. With --workers 0 the lobby
+hosts matches itself. Otherwise every shard is its own process with its
+own port, so matches are spread across cores. Relay matches are
+simulated by their players (see tgme.net.rollback), the server only
+forwards their inputs and hashes. Spectators send WATCH to the lobby
+with a match id, and are redirected to the match's shard like players.
+
+    python -m tgme.net.server --port 7777 --workers 4
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from tgme.game import Game
+from tgme.net.protocol import (
+    ATTACH, INPUT, JOIN, PEER_INPUT, PEER_SYNC, SPECTATE, SPECTATOR, WATCH, StateEncoder, decode_attach,
+    decode_input, decode_join, decode_watch, encode_end, encode_error, encode_redirect, encode_start,
+    read_message, relay_message
+)
+from tgme.interfaces import IProfileStore
+from tgme.matchmaking import DEFAULT_RATING, Matchmaker, QueueEntry, skill_rating
+from tgme.net.broadcast import Broadcaster
+from tgme.plugins import get_plugin
+from tgme.replay import Recording, make_replay_game
+from tgme.trace import EventTrace
+from tgme.utils.logger import TMGELogger
+
+# Bytes queued for a client before it is dropped, a client this far behind cannot catch up
+MAX_WRITE_BUFFER = 1 << 20
+# Seconds a match waits for its players to attach
+ATTACH_TIMEOUT = 10.0
+# Ticks between keyframes, the longest a spectator in keyframe-only mode waits for an update
+KEYFRAME_INTERVAL = 120
+# Matches the lobby remembers the shard of, for WATCH
+WATCHABLE_MATCHES = 4096
+
+# (token, match id, game id, seed, usernames, relay)
+MatchConfig = Tuple[int, int, str, int, List[str], bool]
+
+
+class Match:
+    '''
+    A hosted game, the connections of its players and its spectators.
+
+    Each tick's STATE message is encoded once, written to the players and
+    published to the spectators. Every KEYFRAME_INTERVAL ticks a keyframe
+    is encoded instead, for spectators in keyframe-only mode.
+    '''
+    def __init__(self, token: int, match_id: int, game_id: str, seed: int, usernames: List[str]) -> None:
+        self.token = token
+        self.match_id = match_id
+        self.game_id = game_id
+        self.seed = seed
+        self.usernames = usernames
+        self.game: Optional[Game] = make_replay_game(Recording(game_id, seed, usernames))
+        self.encoder = StateEncoder(self.game)
+        self.writers: List[Optional[asyncio.StreamWriter]] = [None] * len(usernames)
+        self.inputs: List[Tuple[int, str]] = []
+        self.spectators = Broadcaster()
+        self._waiting_spectators: List[asyncio.StreamWriter] = []
+        self._keyframe: Optional[Tuple[int, bytes]] = None
+        self.started = False
+        self.created_at = time.monotonic()
+
+    def _current_keyframe(self) -> bytes:
+        # Encoding a keyframe between ticks is safe, deltas after it are relative to the same state
+        if self._keyframe is None or self._keyframe[0] != self.game.tick:
+            self._keyframe = (self.game.tick, self.encoder.encode(keyframe=True))
+        return self._keyframe[1]
+
+    def start(self) -> None:
+        """Start the game once every player is attached, and send each one the first keyframe"""
+        self.game.init()
+        self.started = True
+        keyframe = self._current_keyframe()
+        for player, writer in enumerate(self.writers):
+            writer.write(encode_start(self.seed, player, self.game_id, self.usernames))
+            writer.write(keyframe)
+        for writer in self._waiting_spectators:
+            self.spectate(writer)
+        self._waiting_spectators.clear()
+
+    def spectate(self, writer: asyncio.StreamWriter) -> None:
+        """Add a spectator, who is sent START and a keyframe, or waits for the match to start"""
+        if not self.started:
+            self._waiting_spectators.append(writer)
+            return
+        writer.write(encode_start(self.seed, SPECTATOR, self.game_id, self.usernames))
+        self.spectators.subscribe(writer, self._current_keyframe())
+
+    def unspectate(self, writer: asyncio.StreamWriter) -> None:
+        self.spectators.unsubscribe(writer)
+        if writer in self._waiting_spectators:
+            self._waiting_spectators.remove(writer)
+
+    def tick(self) -> None:
+        """Apply the input received since the last tick, run one game tick and send its state"""
+        self._keyframe = None
+        for player, action in self.inputs:
+            self.game.dispatch_action(player, action)
+        self.inputs.clear()
+        self.game.step()
+        # Puzzle Fighter only checks for a full board here, GameUI's game over flow does the same
+        self.game.check_loss_condition()
+
+        if self.game.tick % KEYFRAME_INTERVAL == 0:
+            message = self._current_keyframe()
+            keyframe = True
+        else:
+            message = self.encoder.encode()
+            keyframe = False
+        if message is not None:
+            self.broadcast(message)
+            self.spectators.publish(message, keyframe)
+
+    def end(self) -> None:
+        """Send everyone the final scores and disconnect them"""
+        message = encode_end(self.game.scores)
+        self.broadcast(message)
+        self.spectators.close(message)
+        for writer in self._waiting_spectators:
+            writer.close()
+
+    def broadcast(self, message: bytes) -> None:
+        for player, writer in enumerate(self.writers):
+            if writer is None or writer.is_closing():
+                continue
+            if writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                self.drop(player)
+                continue
+            writer.write(message)
+
+    def drop(self, player: int) -> None:
+        """Disconnect a player, who forfeits"""
+        writer = self.writers[player]
+        self.writers[player] = None
+        if writer is not None:
+            writer.close()
+        if self.started:
+            self.game.game_over[player] = True
+
+    def is_over(self) -> bool:
+        return self.started and (self.game.is_finished() or all(writer is None for writer in self.writers))
+
+    def receive(self, player: int, message_type: int, payload: bytes) -> None:
+        """Handle a message from a player after the match started"""
+        if message_type == INPUT:
+            action = decode_input(payload)
+            if action is not None:
+                self.inputs.append((player, action))
+
+
+class RelayMatch(Match):
+    '''
+    A match its players simulate themselves. Every player's inputs and
+    state hashes are forwarded to the others as they arrive, without
+    waiting for the tick loop. It has no state to send spectators.
+    '''
+    def __init__(self, token: int, match_id: int, game_id: str, seed: int, usernames: List[str]) -> None:
+        self.token = token
+        self.match_id = match_id
+        self.game_id = game_id
+        self.seed = seed
+        self.usernames = usernames
+        self.game = None
+        self.writers = [None] * len(usernames)
+        self.started = False
+        self.created_at = time.monotonic()
+
+    def start(self) -> None:
+        self.started = True
+        for player, writer in enumerate(self.writers):
+            writer.write(encode_start(self.seed, player, self.game_id, self.usernames))
+
+    def spectate(self, writer: asyncio.StreamWriter) -> None:
+        raise ValueError("Relay matches cannot be watched")
+
+    def tick(self) -> None:
+        pass
+
+    def end(self) -> None:
+        self.broadcast(encode_end([]))
+
+    def drop(self, player: int) -> None:
+        writer = self.writers[player]
+        self.writers[player] = None
+        if writer is not None:
+            writer.close()
+
+    def is_over(self) -> bool:
+        # Over once any player leaves, the rest cannot play without their input
+        return self.started and any(writer is None for writer in self.writers)
+
+    def receive(self, player: int, message_type: int, payload: bytes) -> None:
+        if message_type not in (PEER_INPUT, PEER_SYNC):
+            return
+        message = relay_message(message_type, player, payload)
+        for other, writer in enumerate(self.writers):
+            if other != player and writer is not None and not writer.is_closing():
+                writer.write(message)
+
+
+class MatchHost:
+    '''
+    Runs every match of one process in a single fixed rate tick loop.
+
+    Each tick's state changes are encoded once per match and the same bytes
+    are written to both players. Input is queued as it arrives and applied
+    at the start of the next tick, so the game only runs inside the loop.
+    '''
+    def __init__(self, host: str = '127.0.0.1', port: int = 7777, ticks_per_second: int = 60,
+                 load: Optional[Any] = None, shard: int = 0) -> None:
+        """
+        __init__
+
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on for ATTACH messages, 0 for any free port
+            ticks_per_second (int): Rate of the tick loop
+            load (Optional[Any]): Shared multiprocessing.Array of hosted matches per shard, so the
+                lobby can pick the least loaded one
+            shard (int): This host's index in load
+
+        Returns:
+            None
+        """
+        self.logger = TMGELogger().get_logger('net')
+        self.host = host
+        self.port = port
+        self.tick_interval = 1 / ticks_per_second
+        self.load = load
+        self.shard = shard
+        self.matches: Dict[int, Match] = {}
+        self.match_ids: Dict[int, Match] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.busy_time = 0.0
+        self.ticks = 0
+        self.late_ticks = 0
+
+    def add_match(self, config: MatchConfig) -> None:
+        token, match_id, game_id, seed, usernames, relay = config
+        match = (RelayMatch if relay else Match)(token, match_id, game_id, seed, usernames)
+        self.matches[token] = self.match_ids[match_id] = match
+
+    def _remove_match(self, match: Match) -> None:
+        del self.matches[match.token]
+        del self.match_ids[match.match_id]
+        for writer in match.writers:
+            if writer is not None:
+                writer.close()
+        if self.load is not None:
+            with self.load.get_lock():
+                self.load[self.shard] -= 1
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self.handle_attach, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        asyncio.get_running_loop().create_task(self.run())
+
+    async def _find_match(self, matches: Dict[int, Match], key: int) -> Optional[Match]:
+        # The lobby's REDIRECT can arrive before the shard has read the match config
+        deadline = time.monotonic() + 2.0
+        while key not in matches and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        return matches.get(key)
+
+    async def handle_attach(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            message_type, payload = await read_message(reader)
+            if message_type == SPECTATE:
+                await self.read_spectator(decode_watch(payload), reader, writer)
+                return
+            if message_type != ATTACH:
+                raise ValueError(f"Expected ATTACH, got message type {message_type}")
+            token, player = decode_attach(payload)
+            match = await self._find_match(self.matches, token)
+            if match is None or player >= len(match.writers) or match.writers[player] is not None:
+                raise ValueError("Unknown match or seat taken")
+            match.writers[player] = writer
+            if all(w is not None for w in match.writers):
+                match.start()
+            await self.read_inputs(match, player, reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            self.logger.error("Error handling client: %s", e)
+            writer.write(encode_error(str(e)))
+            writer.close()
+
+    async def read_spectator(self, match_id: int, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        match = await self._find_match(self.match_ids, match_id)
+        if match is None:
+            raise ValueError(f"No match {match_id} to watch")
+        match.spectate(writer)
+        try:
+            # Spectators send nothing, reading only notices when they leave
+            while await reader.read(1024):
+                pass
+        finally:
+            match.unspectate(writer)
+
+    async def read_inputs(self, match: Match, player: int, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                message_type, payload = await read_message(reader)
+                if match.started:
+                    match.receive(player, message_type, payload)
+        finally:
+            if match.writers[player] is not None:
+                match.drop(player)
+
+    async def run(self) -> None:
+        """The tick loop, runs until the task is cancelled"""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            started = time.perf_counter()
+            now = time.monotonic()
+            for match in list(self.matches.values()):
+                if not match.started:
+                    if now - match.created_at > ATTACH_TIMEOUT:
+                        self._remove_match(match)
+                    continue
+                match.tick()
+                if match.is_over():
+                    match.end()
+                    self._remove_match(match)
+            self.busy_time += time.perf_counter() - started
+            self.ticks += 1
+
+            next_tick += self.tick_interval
+            delay = next_tick - loop.time()
+            if delay < 0:
+                # Behind, drop the backlog rather than run ticks back to back
+                self.late_ticks += 1
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def utilization(self) -> float:
+        """Fraction of the tick loop's time spent running matches"""
+        return self.busy_time / max(self.ticks * self.tick_interval, 1e-9)
+
+
+class Lobby:
+    '''
+    Pairs JOIN requests per game type and relay flag through a Matchmaker,
+    by the players' skill ratings, then sends every player a REDIRECT to
+    the shard hosting its match. WATCH requests are redirected to the
+    shard of the match they name.
+    '''
+    def __init__(self, host: str, port: int, local: Optional[MatchHost] = None,
+                 shards: Optional[List[Tuple[int, Any]]] = None, load: Optional[Any] = None,
+                 profile_store: Optional[IProfileStore] = None, matchmaker: Optional[Matchmaker] = None) -> None:
+        """
+        __init__
+
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on
+            local (Optional[MatchHost]): Hosts every match in this process, when there are no shards
+            shards (Optional[List[Tuple[int, Any]]]): (port, pipe connection) of every shard process
+            load (Optional[Any]): Shared multiprocessing.Array of hosted matches per shard
+            profile_store (Optional[IProfileStore]): Where players' ratings are read from, every
+                player has the default rating without one
+            matchmaker (Optional[Matchmaker]): Pairs the players, its on_match is replaced
+
+        Returns:
+            None
+        """
+        if local is None and not shards:
+            raise ValueError("A lobby needs a local match host or shards")
+        self.logger = TMGELogger().get_logger('net')
+        self.host = host
+        self.port = port
+        self.local = local
+        self.shards = shards or []
+        self.load = load
+        self.profile_store = profile_store
+        self.matchmaker = matchmaker if matchmaker is not None else Matchmaker()
+        self.matchmaker.on_match = self._on_match
+        self._joins = itertools.count()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._widen_task: Optional[asyncio.Task] = None
+        self.matches_created = 0
+        # Match id: shard port, of the latest matches that can be watched
+        self.watchable: Dict[int, int] = OrderedDict()
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self.handle_join, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._widen_task = asyncio.get_running_loop().create_task(self._widen_searches())
+
+    def close(self) -> None:
+        """Stop accepting players and stop widening the searches of those still queued"""
+        if self._widen_task is not None:
+            self._widen_task.cancel()
+            self._widen_task = None
+        if self.server is not None:
+            self.server.close()
+
+    async def _widen_searches(self) -> None:
+        while True:
+            await asyncio.sleep(0.25)
+            self.matchmaker.poll()
+
+    def _rating(self, username: str, game_id: str) -> float:
+        if self.profile_store is None:
+            return DEFAULT_RATING
+        profile = self.profile_store.load_profile(username)
+        return DEFAULT_RATING if profile is None else skill_rating(profile.stats.get(game_id))
+
+    def _on_match(self, first: QueueEntry, second: QueueEntry) -> None:
+        game_id, relay = first.queue
+        self.start_match(game_id, relay, [first.data, second.data])
+
+    def start_match(self, game_id: str, relay: bool, seats: List[Tuple[str, asyncio.StreamWriter]]) -> None:
+        """Assign a match to a shard and redirect its players there"""
+        token = secrets.randbits(64)
+        self.matches_created += 1
+        match_id = self.matches_created
+        port = self._assign((token, match_id, game_id, secrets.randbits(63), [name for name, _ in seats], relay))
+        if not relay:
+            self.watchable[match_id] = port
+            if len(self.watchable) > WATCHABLE_MATCHES:
+                self.watchable.popitem(last=False)
+        for player, (_, writer) in enumerate(seats):
+            writer.write(encode_redirect(port, token, player))
+            writer.close()
+
+    def _assign(self, config: MatchConfig) -> int:
+        """Hand a match to the least loaded shard, returns the port its players attach to"""
+        if not self.shards:
+            self.local.add_match(config)
+            return self.local.port
+        with self.load.get_lock():
+            shard = min(range(len(self.shards)), key=lambda i: self.load[i])
+            self.load[shard] += 1
+        port, connection = self.shards[shard]
+        connection.send(config)
+        return port
+
+    async def handle_join(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            message_type, payload = await read_message(reader)
+            if message_type == WATCH:
+                await self.redirect_spectator(decode_watch(payload), writer)
+                return
+            if message_type != JOIN:
+                raise ValueError(f"Expected JOIN, got message type {message_type}")
+            game_id, username, player_count, relay = decode_join(payload)
+            plugin = get_plugin(game_id)
+            if not plugin.min_players <= player_count <= min(plugin.max_players, 2):
+                raise ValueError(f"{game_id} matches cannot have {player_count} players")
+
+            if player_count == 1:
+                self.start_match(game_id, relay, [(username, writer)])
+                return
+            join = next(self._joins)
+            # The profile store blocks on disk, the event loop keeps pairing and redirecting meanwhile
+            rating = await asyncio.to_thread(self._rating, username, game_id)
+            self.matchmaker.enqueue(join, rating, (game_id, relay), (username, writer))
+            # Waiting players send nothing, reading only notices when one leaves the queue
+            while await reader.read(1024):
+                pass
+            self.matchmaker.cancel(join)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+        except Exception as e:
+            self.logger.error("Error handling join: %s", e)
+            writer.write(encode_error(str(e)))
+            writer.close()
+
+    async def redirect_spectator(self, match_id: int, writer: asyncio.StreamWriter) -> None:
+        """Send a spectator to the shard of a match, match id 0 is the newest match"""
+        if match_id == 0 and self.watchable:
+            match_id = next(reversed(self.watchable))
+        if match_id not in self.watchable:
+            raise ValueError(f"No match {match_id} to watch")
+        writer.write(encode_redirect(self.watchable[match_id], match_id, SPECTATOR))
+        await writer.drain()
+        writer.close()
+
+
+def _run_shard(host: str, port: int, connection: Any, load: Any, shard: int) -> None:
+    """Entry point of a shard process, hosts the matches the lobby sends over connection"""
+    TMGELogger().set_level(logging.WARNING)
+    EventTrace().install_dump_hooks()
+
+    async def serve() -> None:
+        match_host = MatchHost(host, port, load=load, shard=shard)
+        await match_host.start()
+        connection.send(match_host.port)
+        loop = asyncio.get_running_loop()
+        while True:
+            # Pipe reads block, so they run on a thread and the tick loop keeps going
+            config = await loop.run_in_executor(None, connection.recv)
+            if config is None:
+                break
+            match_host.add_match(config)
+
+    try:
+        asyncio.run(serve())
+    except Exception:
+        # multiprocessing reports a shard's exception itself, so sys.excepthook never sees it
+        EventTrace().dump()
+        raise
+
+
+async def serve(host: str = '127.0.0.1', port: int = 7777, workers: int = 0, report_interval: float = 10.0,
+                profile_store: Optional[IProfileStore] = None) -> None:
+    """
+    serve runs the lobby, and the shards, until cancelled
+
+    Args:
+        host (str): Address to listen on
+        port (int): Lobby port, shards listen on the following ports
+        workers (int): Shard processes, 0 to host every match in the lobby's process
+        report_interval (float): Seconds between status log lines
+        profile_store (Optional[IProfileStore]): Where the lobby reads players' skill ratings from
+
+    Returns:
+        None
+    """
+    logger = TMGELogger().get_logger('net')
+    processes = []
+    local = None
+    shards = []
+    load = None
+    if workers <= 0:
+        local = MatchHost(host, 0 if port == 0 else port + 1)
+        await local.start()
+    else:
+        load = multiprocessing.Array('i', workers)
+        for shard in range(workers):
+            parent_connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_run_shard,
+                args=(host, 0 if port == 0 else port + 1 + shard, child_connection, load, shard),
+                daemon=True
+            )
+            process.start()
+            processes.append(process)
+            shards.append((parent_connection.recv(), parent_connection))
+
+    lobby = Lobby(host, port, local, shards, load, profile_store)
+    await lobby.start()
+    logger.info("Match server listening on %s:%s with %s shard(s)", host, lobby.port, max(workers, 1))
+    print(f"Match server listening on {host}:{lobby.port} with {max(workers, 1)} shard(s)")
+    try:
+        while True:
+            await asyncio.sleep(report_interval)
+            if local is not None:
+                hosted = str(len(local.matches))
+                extra = f", tick loop {local.utilization():.0%} busy, {local.late_ticks} late ticks"
+            else:
+                hosted = '/'.join(str(count) for count in load)
+                extra = ''
+            logger.info("%s matches created, %s waiting, %s hosted%s",
+                        lobby.matches_created, len(lobby.matchmaker), hosted, extra)
+    finally:
+        lobby.close()
+        for _, connection in shards:
+            connection.send(None)
+        for process in processes:
+            process.terminate()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Host headless Tetris and Puzzle Fighter matches over TCP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777, help="Lobby port, shards use the following ports")
+    parser.add_argument('--workers', type=int, default=0, help="Shard processes, 0 to host matches in one process")
+    parser.add_argument('--profiles', help="SQLite profile database to read skill ratings from")
+    args = parser.parse_args(argv)
+    # SIGUSR2 to the lobby or a shard writes its recent engine events to logs/
+    EventTrace().install_dump_hooks()
+    profile_store = None
+    if args.profiles:
+        from tgme.storage.sqlite_profile_store import SQLiteProfileStore
+        profile_store = SQLiteProfileStore(args.profiles)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, profile_store=profile_store))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
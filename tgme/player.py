@@ -1,19 +1,25 @@
 from tgme.player_profile import PlayerProfile
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # Only for annotations, tgme.cpu_player imports the game modules that import this one
+    from tgme.cpu_player import CPUController
 
 class Player:
-    def __init__(self, profile: PlayerProfile) -> None:
+    def __init__(self, profile: PlayerProfile, controller: Optional['CPUController'] = None) -> None:
         """
         __init__
 
         Args:
             profile (PlayerProfile): The profile associated with this player
+            controller (Optional[CPUController]): Plays for this player, None for a human
 
         Returns:
             None
         """
         self.profile: PlayerProfile = profile
         self.score: int = 0
+        self.controller = controller
 
     def update_score(self, points: int) -> None:
         """
@@ -18,6 +18,9 @@ class PlayerProfile:
         #^ ======================================
         self.stats: Dict[str, int] = {}
 
+        # Sequence number of the last stats journal record applied to this profile
+        self.journal_seq: int = 0
+
     def login(self, username: str) -> None:
         """
         login
@@ -45,6 +48,31 @@ class PlayerProfile:
         """
         self.stats[game_id] = stats
 
+    def record_result(self, game_id: str, score: int, won: bool, duration: float) -> None:
+        """
+        record_result
+
+        Args:
+            game_id (str): The identifier of the game
+            score (int): The final score
+            won (bool): Whether the player won
+            duration (float): Length of the game in seconds
+
+        Returns:
+            None
+        """
+        current = self.stats.get(game_id)
+        if isinstance(current, GameStats):
+            stats = current
+        else:
+            stats = GameStats.from_dict(current if isinstance(current, dict) else {})
+        stats.update_score(score)
+        stats.increment_games_played()
+        if won:
+            stats.add_win()
+        stats.add_time_played(duration)
+        self.stats[game_id] = stats.to_dict()
+
     def get_stats(self, game_id: str) -> int:
         """
         get_stats
@@ -0,0 +1,125 @@
+import importlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# Modules imported on first lookup, each registers the games it provides
+PLUGIN_MODULES: List[str] = ['games']
+
+
+@dataclass(frozen=True)
+class GamePlugin:
+    '''
+    A game as the engine sees it before the game is imported.
+
+    The entry points are "module:attribute" strings, so declaring a game
+    imports nothing; the module is only imported when the game is
+    launched, replayed or played by a CPU. A game that is already
+    imported can pass its classes instead. Registered with TMGE, a plugin
+    is what the home window lists, and the game is only built on launch.
+    '''
+    game_id: str
+    min_players: int
+    max_players: int
+    rows: int
+    columns: int
+    entry_point: Union[str, type]
+    matching_strategy: Union[str, type]
+    bot: Optional[Union[str, type]] = None
+
+    def load_game_class(self) -> Any:
+        return load_entry_point(self.entry_point)
+
+    def create_game(self, players: List[Any], controls: List[Dict[str, str]], seed: Optional[int] = None) -> Any:
+        """
+        create_game
+
+        Args:
+            players (List[Player]): The players, between min_players and max_players of them
+            controls (List[Dict[str, str]]): Key bindings per player
+            seed (Optional[int]): Seed for the game's random number generator, random if None
+
+        Returns:
+            game (Game): A new game, not initialised yet
+        """
+        if not self.min_players <= len(players) <= self.max_players:
+            raise ValueError(f"{self.game_id} takes {self.min_players} to {self.max_players} players")
+        return self.load_game_class()(
+            game_id=self.game_id,
+            players=players,
+            controls=controls,
+            matching_strategy=self.create_matching_strategy(),
+            seed=seed
+        )
+
+    def create_matching_strategy(self) -> Any:
+        return load_entry_point(self.matching_strategy)()
+
+    def create_bot(self) -> Any:
+        if self.bot is None:
+            raise ValueError(f"No CPU player for game type: {self.game_id}")
+        return load_entry_point(self.bot)()
+
+    @property
+    def board_size(self) -> Tuple[int, int]:
+        return self.rows, self.columns
+
+
+_plugins: Dict[str, GamePlugin] = {}
+_discovered = False
+
+
+def load_entry_point(entry_point: Union[str, type]) -> Any:
+    """Import the object an entry point such as "games.tetris_game:TetrisGame" names"""
+    if not isinstance(entry_point, str):
+        return entry_point
+    module_name, _, attribute = entry_point.partition(':')
+    if not attribute:
+        raise ValueError(f"Entry point must be module:attribute, got {entry_point}")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def register_plugin(plugin: GamePlugin) -> None:
+    """
+    register_plugin
+
+    Args:
+        plugin (GamePlugin): The game to make available, replaces a plugin with the same game id
+
+    Returns:
+        None
+    """
+    if not 1 <= plugin.min_players <= plugin.max_players:
+        raise ValueError(f"Invalid player counts for {plugin.game_id}")
+    _plugins[plugin.game_id] = plugin
+
+
+def _discover() -> None:
+    global _discovered
+    if _discovered:
+        return
+    _discovered = True
+    for module_name in PLUGIN_MODULES:
+        importlib.import_module(module_name)
+
+
+def get_plugin(game_id: str) -> GamePlugin:
+    """
+    get_plugin
+
+    Args:
+        game_id (str): The identifier of the game
+
+    Returns:
+        plugin (GamePlugin): Its plugin, raises ValueError for an unknown game
+    """
+    _discover()
+    plugin = _plugins.get(game_id)
+    if plugin is None:
+        raise ValueError(f"Unknown game type: {game_id}")
+    return plugin
+
+
+def available_plugins() -> List[GamePlugin]:
+    """Every registered game, in registration order"""
+    _discover()
+    return list(_plugins.values())
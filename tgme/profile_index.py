@@ -0,0 +1,98 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, Iterator, List, Optional
+from tgme.player_profile import PlayerProfile
+
+class ProfileIndex:
+    '''
+    This class is responsible for looking up player profiles by username.
+
+    A dict gives constant-time lookup by exact username and a sorted list of
+    usernames gives logarithmic prefix search for type-ahead suggestions.
+    '''
+    def __init__(self, profiles: Iterable[PlayerProfile] = ()) -> None:
+        """
+        __init__
+
+        Args:
+            profiles (Iterable[PlayerProfile]): Profiles to index initially
+
+        Returns:
+            None
+        """
+        self._by_username: Dict[str, PlayerProfile] = {}
+        for profile in profiles:
+            self._by_username[profile.username] = profile
+        self._usernames: List[str] = sorted(self._by_username)
+
+    def __len__(self) -> int:
+        return len(self._by_username)
+
+    def __contains__(self, username: str) -> bool:
+        return username in self._by_username
+
+    def __iter__(self) -> Iterator[PlayerProfile]:
+        return iter(self._by_username.values())
+
+    def get(self, username: str) -> Optional[PlayerProfile]:
+        """
+        get
+
+        Args:
+            username (str): The username to look up
+
+        Returns:
+            profile (Optional[PlayerProfile]): The matching profile, or None if there is none
+        """
+        return self._by_username.get(username)
+
+    def add(self, profile: PlayerProfile) -> bool:
+        """
+        add
+
+        Args:
+            profile (PlayerProfile): The profile to index
+
+        Returns:
+            result (bool): True if the profile was added, False if the username was already taken
+        """
+        if profile.username in self._by_username:
+            return False
+        self._by_username[profile.username] = profile
+        insort(self._usernames, profile.username)
+        return True
+
+    def remove(self, username: str) -> Optional[PlayerProfile]:
+        """
+        remove
+
+        Args:
+            username (str): The username to remove
+
+        Returns:
+            profile (Optional[PlayerProfile]): The removed profile, or None if there was none
+        """
+        profile = self._by_username.pop(username, None)
+        if profile is not None:
+            del self._usernames[bisect_left(self._usernames, username)]
+        return profile
+
+    def search_prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        search_prefix
+
+        Args:
+            prefix (str): The start of a username
+            limit (int): The maximum number of usernames to return
+
+        Returns:
+            usernames (List[str]): Usernames starting with prefix, in sorted order
+        """
+        matches = []
+        i = bisect_left(self._usernames, prefix)
+        while i < len(self._usernames) and len(matches) < limit:
+            username = self._usernames[i]
+            if not username.startswith(prefix):
+                break
+            matches.append(username)
+            i += 1
+        return matches
@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+from tgme.game import Game
+from tgme.player import Player
+from tgme.player_profile import PlayerProfile
+from tgme.plugins import get_plugin
+from tgme.utils.logger import TMGELogger
+
+RECORDING_VERSION = 1
+
+
+@dataclass
+class Recording:
+    '''
+    A game session as its seed plus every dispatched action.
+
+    Events are (tick, player, action) tuples in dispatch order, where tick is
+    the number of game updates that had run when the action was dispatched.
+    '''
+    game_id: str
+    seed: int
+    usernames: List[str]
+    events: List[Tuple[int, int, str]] = field(default_factory=list)
+    end_tick: int = 0
+
+    def save(self, path: str) -> None:
+        """Write the recording to a JSON file"""
+        data = {
+            'version': RECORDING_VERSION,
+            'game_id': self.game_id,
+            'seed': self.seed,
+            'usernames': self.usernames,
+            'end_tick': self.end_tick,
+            'events': [list(event) for event in self.events]
+        }
+        temp_file = f"{path}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(temp_file, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'Recording':
+        """Read a recording written by save"""
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != RECORDING_VERSION:
+            raise ValueError(f"Unsupported recording version: {data.get('version')}")
+        return cls(
+            data['game_id'],
+            data['seed'],
+            data['usernames'],
+            [(tick, player, action) for tick, player, action in data['events']],
+            data['end_tick']
+        )
+
+
+class InputRecorder:
+    '''
+    Records a game's input as it is dispatched.
+
+    The recorder listens on Game.dispatch_action, so it sees exactly the
+    actions the simulation applies, at the tick they are applied.
+    '''
+    def __init__(self, game: Game) -> None:
+        """
+        __init__
+
+        Args:
+            game (Game): The game to record, attach before calling game.init()
+
+        Returns:
+            None
+        """
+        self.game = game
+        self.recording = Recording(
+            game.game_id,
+            game.seed,
+            [player.profile.username for player in game.players]
+        )
+        game.input_listeners.append(self._on_action)
+
+    def _on_action(self, tick: int, player: int, action: str) -> None:
+        self.recording.events.append((tick, player, action))
+
+    def stop(self) -> Recording:
+        """Detach from the game and return the finished recording"""
+        if self._on_action in self.game.input_listeners:
+            self.game.input_listeners.remove(self._on_action)
+        self.recording.end_tick = self.game.tick
+        return self.recording
+
+    def save(self, path: str) -> None:
+        """Stop recording and write the recording to path"""
+        self.stop().save(path)
+
+
+class ReplayPlayer:
+    '''
+    Plays a recording back through a fresh game instance.
+
+    Nothing waits on the wall clock, so run_to fast-forwards the simulation
+    as fast as the CPU allows. No UI is needed.
+    '''
+    def __init__(self, recording: Recording, game: Game) -> None:
+        """
+        __init__
+
+        Args:
+            recording (Recording): The session to play back
+            game (Game): A new game built with seed=recording.seed
+
+        Returns:
+            None
+        """
+        if game.seed != recording.seed:
+            raise ValueError("Game seed does not match the recording")
+
+        self.logger = TMGELogger().get_logger('replay')
+        self.recording = recording
+        self.game = game
+        self._next_event = 0
+        self.game.init()
+
+    def _apply_due_events(self) -> None:
+        events = self.recording.events
+        while self._next_event < len(events) and events[self._next_event][0] <= self.game.tick:
+            _, player, action = events[self._next_event]
+            self.game.dispatch_action(player, action)
+            self._next_event += 1
+
+    def run_to(self, target_tick: int) -> int:
+        """
+        run_to
+
+        Args:
+            target_tick (int): The tick to stop at, inputs dispatched at that tick are applied
+
+        Returns:
+            ticks (int): The number of game updates that were run
+        """
+        start_tick = self.game.tick
+        self._apply_due_events()
+        while self.game.tick < target_tick:
+            self.game.step()
+            self._apply_due_events()
+        return self.game.tick - start_tick
+
+    def run(self) -> int:
+        """Play the whole recording, returning the number of game updates run"""
+        return self.run_to(self.recording.end_tick)
+
+    def benchmark(self, target_tick: Optional[int] = None) -> float:
+        """
+        benchmark
+
+        Args:
+            target_tick (Optional[int]): The tick to run to, the end of the recording if None
+
+        Returns:
+            rate (float): Game updates per second
+        """
+        start = time.perf_counter()
+        ticks = self.run_to(self.recording.end_tick if target_tick is None else target_tick)
+        elapsed = time.perf_counter() - start
+        rate = ticks / elapsed if elapsed > 0 else float('inf')
+        self.logger.info("Replayed %s ticks of %s in %.3fs (%.0f ticks/s)", ticks, self.recording.game_id, elapsed, rate)
+        return rate
+
+
+def make_replay_game(recording: Recording) -> Game:
+    """Build a fresh game matching a recording, for playback without a UI"""
+    players = [Player(PlayerProfile(username)) for username in recording.usernames]
+    # Actions are replayed directly, so no key bindings are needed
+    controls = [{} for _ in players]
+    # The game's module is only imported now, through its plugin
+    return get_plugin(recording.game_id).create_game(players, controls, recording.seed)
+
+
+def main(argv: Optional[List[str]] = None, game_factory: Callable[[Recording], Game] = make_replay_game) -> None:
+    parser = argparse.ArgumentParser(description="Replay a recorded game session headless at full speed")
+    parser.add_argument('recording', help="Path of a .replay file or a JSON recording")
+    parser.add_argument('--from-tick', type=int, default=0, help="Seek to this tick before timing (.replay files)")
+    parser.add_argument('--to-tick', type=int, default=None, help="Stop at this tick instead of the end")
+    parser.add_argument('--verify', action='store_true', help="Check playback against the keyframes' board hashes (.replay files)")
+    args = parser.parse_args(argv)
+
+    with open(args.recording, 'rb') as f:
+        is_replay_file = f.read(4) == b'TRP1'
+
+    if is_replay_file:
+        from tgme.replay_file import ReplayReader
+        with ReplayReader(args.recording) as reader:
+            recording = reader.info
+            game = game_factory(recording)
+            if args.verify:
+                diverged = reader.verify(game)
+                print("Playback matches the recording" if diverged is None else f"Playback diverged by tick {diverged}")
+            start = time.perf_counter()
+            seek_ticks = reader.seek(game, args.from_tick)
+            seek_time = time.perf_counter() - start
+            print(f"Seeked to tick {game.tick} in {seek_time * 1000:.1f}ms ({seek_ticks} ticks simulated)")
+            start = time.perf_counter()
+            ticks = reader.advance(game, args.to_tick)
+            elapsed = time.perf_counter() - start
+            rate = ticks / elapsed if elapsed > 0 else float('inf')
+    else:
+        recording = Recording.load(args.recording)
+        player = ReplayPlayer(recording, game_factory(recording))
+        rate = player.benchmark(args.to_tick)
+        game = player.game
+
+    print(f"{recording.game_id}: tick {game.tick}, {rate:.0f} ticks/s")
+    for result_player, score, won in game.get_results():
+        print(f"  {result_player.profile.username}: {score}{' (winner)' if won else ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+import json
+import struct
+import zlib
+from bisect import bisect_right
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from tgme.game import Game, GameSnapshot
+from tgme.grid import GridSnapshot
+from tgme.replay import Recording
+from tgme.tile import Tile
+from tgme.utils.logger import TMGELogger
+
+# File header: magic, length of the JSON header that follows
+HEADER = struct.Struct('<4sI')
+MAGIC = b'TRP1'
+# Block frame: compressed length, crc32 of the compressed bytes
+FRAME = struct.Struct('<II')
+# Last bytes of a closed file: offset of the footer frame, magic
+TRAILER = struct.Struct('<Q4s')
+TRAILER_MAGIC = b'TRPX'
+
+FILE_VERSION = 1
+DEFAULT_KEYFRAME_INTERVAL = 600     # Ticks between keyframes, 10 seconds at 60 ticks per second
+
+
+def _encode_grid(grid: GridSnapshot, palette: Dict[tuple, int]) -> Dict[str, Any]:
+    rows = []
+    for row in grid.rows:
+        cells = []
+        for tile in row:
+            if tile is None:
+                cells.append(0)
+            else:
+                key = (tile.tile_type, tile.tile_state, tile.tile_color)
+                if key not in palette:
+                    palette[key] = len(palette) + 1
+                cells.append(palette[key])
+        rows.append(cells)
+    # The hash lets a reader check that playback reproduces this board
+    return {'version': grid.version, 'rows': rows, 'hash': grid.board_hash}
+
+
+def _decode_grid(data: Dict[str, Any], palette: List[list]) -> GridSnapshot:
+    rows = []
+    for cells in data['rows']:
+        row = []
+        for index in cells:
+            if index == 0:
+                row.append(None)
+            else:
+                tile_type, tile_state, tile_color = palette[index - 1]
+                row.append(Tile(tile_type, tile_state, color=tile_color))
+        rows.append(row)
+    return GridSnapshot(tuple(rows), data['version'])
+
+
+def encode_snapshot(game: Game, snapshot: GameSnapshot) -> Dict[str, Any]:
+    """
+    encode_snapshot
+
+    Args:
+        game (Game): The game the snapshot was taken from
+        snapshot (GameSnapshot): The snapshot to encode
+
+    Returns:
+        data (Dict[str, Any]): JSON-serialisable keyframe, tiles are stored as indexes into a
+            palette of (type, state, color)
+    """
+    palette: Dict[tuple, int] = {}
+    grids = [_encode_grid(grid, palette) for grid in snapshot.grids]
+    return {
+        'tick': snapshot.tick,
+        'rng': list(snapshot.rng_state),
+        'palette': [list(key) for key in palette],
+        'grids': grids,
+        'player_scores': list(snapshot.player_scores),
+        'is_paused': snapshot.is_paused,
+        'is_game_over': snapshot.is_game_over,
+        'state': game.encode_state(snapshot.state)
+    }
+
+
+def decode_snapshot(game: Game, data: Dict[str, Any]) -> GameSnapshot:
+    """Inverse of encode_snapshot, game is any game of the same type"""
+    return GameSnapshot(
+        data['tick'],
+        tuple(data['rng']),
+        tuple(_decode_grid(grid, data['palette']) for grid in data['grids']),
+        tuple(data['player_scores']),
+        data['is_paused'],
+        data['is_game_over'],
+        game.decode_state(data['state'])
+    )
+
+
+def _write_frame(f, payload: bytes) -> int:
+    offset = f.tell()
+    f.write(FRAME.pack(len(payload), zlib.crc32(payload)))
+    f.write(payload)
+    return offset
+
+
+def _read_frame(f, offset: int) -> Optional[bytes]:
+    f.seek(offset)
+    frame = f.read(FRAME.size)
+    if len(frame) < FRAME.size:
+        return None
+    length, crc = FRAME.unpack(frame)
+    payload = f.read(length)
+    if len(payload) < length or zlib.crc32(payload) != crc:
+        return None
+    return payload
+
+
+class ReplayWriter:
+    '''
+    Streams a game session to a compressed, seekable replay file.
+
+    The file is a header followed by blocks, each a zlib-compressed keyframe
+    of the full game state plus the input events of the next
+    `keyframe_interval` ticks, and a footer indexing the blocks by tick.
+    Only the current block is held in memory.
+    '''
+    def __init__(self, path: str, game: Game, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+                 compression_level: int = 6) -> None:
+        """
+        __init__
+
+        Args:
+            path (str): Where to write the replay
+            game (Game): The game to record, attach after calling game.init()
+            keyframe_interval (int): Ticks between keyframes, which bounds how far a seek
+                has to simulate
+            compression_level (int): zlib compression level
+
+        Returns:
+            None
+        """
+        if keyframe_interval <= 0:
+            raise ValueError("Keyframe interval must be a positive number of ticks")
+
+        self.logger = TMGELogger().get_logger('replay')
+        self.path = path
+        self.game = game
+        self.keyframe_interval = keyframe_interval
+        self.compression_level = compression_level
+
+        self._file = open(path, 'wb')
+        header = json.dumps({
+            'version': FILE_VERSION,
+            'game_id': game.game_id,
+            'seed': game.seed,
+            'usernames': [player.profile.username for player in game.players],
+            'keyframe_interval': keyframe_interval
+        }).encode('utf-8')
+        self._file.write(HEADER.pack(MAGIC, len(header)) + header)
+
+        self._index: List[Tuple[int, int]] = []
+        self._start_block()
+        game.input_listeners.append(self._on_action)
+        game.tick_listeners.append(self._on_tick)
+
+    def _start_block(self) -> None:
+        self._block_tick = self.game.tick
+        self._keyframe = encode_snapshot(self.game, self.game.snapshot())
+        self._events: List[list] = []
+
+    def _write_block(self) -> None:
+        payload = json.dumps(
+            {'tick': self._block_tick, 'keyframe': self._keyframe, 'events': self._events},
+            separators=(',', ':')
+        ).encode('utf-8')
+        offset = _write_frame(self._file, zlib.compress(payload, self.compression_level))
+        self._index.append((self._block_tick, offset))
+        # Completed blocks reach the OS, so a crash loses at most one interval
+        self._file.flush()
+
+    def _on_action(self, tick: int, player: int, action: str) -> None:
+        self._events.append([tick, player, action])
+
+    def _on_tick(self, tick: int) -> None:
+        if tick - self._block_tick >= self.keyframe_interval:
+            self._write_block()
+            self._start_block()
+
+    def close(self) -> int:
+        """
+        close writes the last block and the index
+
+        Args:
+            None
+
+        Returns:
+            end_tick (int): The tick the recording ends at
+        """
+        if self._file is None:
+            return self.game.tick
+
+        for listeners, listener in ((self.game.input_listeners, self._on_action),
+                                    (self.game.tick_listeners, self._on_tick)):
+            if listener in listeners:
+                listeners.remove(listener)
+
+        self._write_block()
+        footer = json.dumps({'end_tick': self.game.tick, 'index': self._index}).encode('utf-8')
+        footer_offset = _write_frame(self._file, zlib.compress(footer))
+        self._file.write(TRAILER.pack(footer_offset, TRAILER_MAGIC))
+        self._file.close()
+        self._file = None
+        self.logger.debug("Wrote %s replay blocks to %s", len(self._index), self.path)
+        return self.game.tick
+
+
+class ReplayReader:
+    '''
+    Reads replay files written by ReplayWriter.
+
+    seek restores the nearest keyframe at or before the target tick and
+    simulates forward from there, so it never simulates more than one
+    keyframe interval. A file that was not closed (e.g. after a crash) is
+    indexed by scanning its blocks.
+    '''
+    def __init__(self, path: str) -> None:
+        """
+        __init__
+
+        Args:
+            path (str): The replay file to read
+
+        Returns:
+            None
+        """
+        self.logger = TMGELogger().get_logger('replay')
+        self.path = path
+        self._file = open(path, 'rb')
+
+        magic_and_length = self._file.read(HEADER.size)
+        if len(magic_and_length) < HEADER.size or HEADER.unpack(magic_and_length)[0] != MAGIC:
+            self._file.close()
+            raise ValueError(f"Not a replay file: {path}")
+        header = json.loads(self._file.read(HEADER.unpack(magic_and_length)[1]))
+        if header.get('version') != FILE_VERSION:
+            self._file.close()
+            raise ValueError(f"Unsupported replay file version: {header.get('version')}")
+        self._blocks_offset = self._file.tell()
+        self.keyframe_interval: int = header['keyframe_interval']
+
+        self._index, end_tick = self._read_index()
+        self._index_ticks = [tick for tick, _ in self._index]
+        self.info = Recording(header['game_id'], header['seed'], header['usernames'], end_tick=end_tick)
+
+    def _read_index(self) -> Tuple[List[Tuple[int, int]], int]:
+        self._file.seek(0, 2)
+        size = self._file.tell()
+        if size >= self._blocks_offset + TRAILER.size:
+            self._file.seek(size - TRAILER.size)
+            footer_offset, magic = TRAILER.unpack(self._file.read(TRAILER.size))
+            footer = _read_frame(self._file, footer_offset) if magic == TRAILER_MAGIC else None
+            if footer is not None:
+                data = json.loads(zlib.decompress(footer))
+                return [tuple(entry) for entry in data['index']], data['end_tick']
+
+        # No footer, index the intact blocks in order
+        self.logger.warning("Replay file was not closed, scanning blocks: %s", self.path)
+        index, end_tick, offset = [], 0, self._blocks_offset
+        while True:
+            payload = _read_frame(self._file, offset)
+            if payload is None:
+                break
+            try:
+                block = json.loads(zlib.decompress(payload))
+            except (zlib.error, ValueError):
+                break
+            index.append((block['tick'], offset))
+            end_tick = max([block['tick']] + [event[0] for event in block['events']])
+            offset += FRAME.size + len(payload)
+        return index, end_tick
+
+    def __enter__(self) -> 'ReplayReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._file.close()
+
+    @property
+    def keyframe_ticks(self) -> List[int]:
+        return list(self._index_ticks)
+
+    def read_block(self, i: int) -> Dict[str, Any]:
+        """Decompress block i, holding the keyframe at its start tick and its events"""
+        payload = _read_frame(self._file, self._index[i][1])
+        if payload is None:
+            raise ValueError(f"Replay block {i} is corrupt: {self.path}")
+        return json.loads(zlib.decompress(payload))
+
+    def events(self, from_tick: int = 0) -> Iterator[Tuple[int, int, str]]:
+        """Stream the input events from from_tick onwards, one block in memory at a time"""
+        for i in range(max(0, bisect_right(self._index_ticks, from_tick) - 1), len(self._index)):
+            for tick, player, action in self.read_block(i)['events']:
+                if tick >= from_tick:
+                    yield tick, player, action
+
+    def verify(self, game: Game) -> Optional[int]:
+        """
+        verify plays the whole file from its first keyframe, checking the grid hashes
+        recorded in each later keyframe
+
+        Args:
+            game (Game): A game of the recorded type, its state is replaced
+
+        Returns:
+            tick (Optional[int]): The first keyframe tick where playback diverged, None if none did
+        """
+        self.seek(game, 0)
+        events = self.events(game.tick + 1)
+        pending = next(events, None)
+        for i in range(1, len(self._index)):
+            keyframe = self.read_block(i)['keyframe']
+            # Keyframes are written by a tick listener, before the inputs of their tick, so
+            # only the inputs of earlier ticks are applied before comparing
+            while pending is not None and pending[0] < keyframe['tick']:
+                while game.tick < pending[0]:
+                    game.step()
+                game.dispatch_action(pending[1], pending[2])
+                pending = next(events, None)
+            while game.tick < keyframe['tick']:
+                game.step()
+            recorded = [grid.get('hash') for grid in keyframe['grids']]
+            if None not in recorded and recorded != [grid.board_hash for grid in game.snapshot().grids]:
+                self.logger.warning("Replay diverged by tick %s: %s", keyframe['tick'], self.path)
+                return keyframe['tick']
+        return None
+
+    def seek(self, game: Game, tick: int) -> int:
+        """
+        seek
+
+        Args:
+            game (Game): A game of the recorded type, its state is replaced
+            tick (int): The tick to go to, inputs dispatched at that tick are applied
+
+        Returns:
+            ticks (int): The number of ticks that had to be simulated from the keyframe
+        """
+        tick = max(0, min(tick, self.info.end_tick))
+        block = self.read_block(max(0, bisect_right(self._index_ticks, tick) - 1))
+        game.restore(decode_snapshot(game, block['keyframe']))
+        start_tick = game.tick
+        self._simulate(game, block['events'], tick)
+        return game.tick - start_tick
+
+    def advance(self, game: Game, tick: Optional[int] = None) -> int:
+        """
+        advance
+
+        Args:
+            game (Game): A game positioned by seek or a previous advance
+            tick (Optional[int]): The tick to run to, the end of the recording if None
+
+        Returns:
+            ticks (int): The number of ticks simulated
+        """
+        target = self.info.end_tick if tick is None else min(tick, self.info.end_tick)
+        start_tick = game.tick
+        # Inputs at the current tick were applied by the seek or advance that got here
+        self._simulate(game, self.events(start_tick + 1), target)
+        return game.tick - start_tick
+
+    def _simulate(self, game: Game, events, target: int) -> None:
+        for event_tick, player, action in events:
+            if event_tick > target:
+                break
+            while game.tick < event_tick:
+                game.step()
+            game.dispatch_action(player, action)
+        while game.tick < target:
+            game.step()
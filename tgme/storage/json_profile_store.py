@@ -0,0 +1,193 @@
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+from tgme.interfaces import IProfileStore
+from tgme.player_profile import PlayerProfile
+from tgme.game_stats import GameStats
+from tgme.utils.logger import TMGELogger
+
+
+def stats_to_dict(stats: Dict) -> Dict[str, Dict]:
+    """Convert a profile's stats to plain dicts, accepting GameStats values"""
+    return {
+        game_id: value.to_dict() if isinstance(value, GameStats) else value
+        for game_id, value in stats.items()
+    }
+
+
+def _iter_json_array(f, chunk_size: int) -> Iterator:
+    """Decode the elements of a top-level JSON array one at a time, reading f in chunks"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+
+    def next_token() -> str:
+        # Skip whitespace, refilling the buffer as needed; '' means end of file
+        nonlocal buffer, pos, eof
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                return buffer[pos:pos + 1]
+            chunk = f.read(chunk_size)
+            buffer, pos, eof = chunk, 0, not chunk
+
+    if next_token() != '[':
+        raise json.JSONDecodeError("Expected a JSON array", buffer, pos)
+    pos += 1
+    if next_token() == ']':
+        return
+
+    while True:
+        next_token()
+        try:
+            element, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The element continues past the buffer, read more and retry
+            chunk = f.read(chunk_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        yield element
+        pos = end
+
+        token = next_token()
+        if token == ']':
+            return
+        if token != ',':
+            raise json.JSONDecodeError("Expected ',' or ']'", buffer, pos)
+        pos += 1
+
+
+def iter_profiles_json(profiles_file: str, chunk_size: int = 64 * 1024) -> Iterator[PlayerProfile]:
+    """Stream PlayerProfile objects out of a profiles.json file without reading it all at once"""
+    with open(profiles_file, 'r') as f:
+        for profile_data in _iter_json_array(f, chunk_size):
+            if isinstance(profile_data, dict) and 'username' in profile_data:
+                profile = PlayerProfile(profile_data['username'])
+                profile.stats = profile_data.get('stats', {})
+                profile.journal_seq = profile_data.get('journal_seq', 0)
+                yield profile
+
+
+class JsonProfileStore(IProfileStore):
+    '''
+    Stores every profile in a single JSON file.
+
+    Each save rewrites the whole file (backup, temp file, replace), and the
+    file is streamed into memory on first use, so this store is only suited
+    to small profile counts. See SQLiteProfileStore.
+    '''
+    def __init__(self, profiles_file: str) -> None:
+        """
+        __init__
+
+        Args:
+            profiles_file (str): Path of the profiles JSON file
+
+        Returns:
+            None
+        """
+        self.logger = TMGELogger().get_logger('storage')
+        self.profiles_file = profiles_file
+        self._profiles: Optional[Dict[str, PlayerProfile]] = None
+
+    def _loaded(self) -> Dict[str, PlayerProfile]:
+        if self._profiles is None:
+            self._profiles = {profile.username: profile for profile in self._read()}
+        return self._profiles
+
+    def _read(self) -> List[PlayerProfile]:
+        self.logger.debug("Loading player profiles")
+        if not os.path.exists(self.profiles_file):
+            self.logger.info("Profiles file not found, creating new one")
+            # Create empty profiles file if it doesn't exist
+            try:
+                with open(self.profiles_file, 'w') as f:
+                    json.dump([], f)
+            except Exception as e:
+                print(f"Error creating profiles file: {e}")
+            return []
+
+        try:
+            return list(iter_profiles_json(self.profiles_file))
+        except json.JSONDecodeError:
+            print("Error: profiles.json is corrupted. Creating new file.")
+            with open(self.profiles_file, 'w') as f:
+                json.dump([], f)
+            return []
+        except Exception as e:
+            print(f"Error loading profiles: {e}")
+            return []
+
+    def load_profiles(self) -> List[PlayerProfile]:
+        """Load player profiles from file"""
+        return list(self._loaded().values())
+
+    def load_profile(self, username: str) -> Optional[PlayerProfile]:
+        return self._loaded().get(username)
+
+    def has_profile(self, username: str) -> bool:
+        return username in self._loaded()
+
+    def save_profile(self, profile: PlayerProfile) -> None:
+        """Save a single profile, which for this store rewrites the whole file"""
+        self._loaded()[profile.username] = profile
+        self._write(list(self._profiles.values()))
+
+    def save_profiles(self, profiles: List[PlayerProfile]) -> None:
+        """Save player profiles to file"""
+        loaded = self._loaded()
+        for profile in profiles:
+            if hasattr(profile, 'username'):  # Validate profile object
+                loaded[profile.username] = profile
+        self._write(list(self._profiles.values()))
+
+    def delete_profile(self, username: str) -> None:
+        """Remove a profile, which for this store rewrites the whole file"""
+        if self._loaded().pop(username, None) is not None:
+            self._write(list(self._profiles.values()))
+
+    def _write(self, profiles: List[PlayerProfile]) -> None:
+        self.logger.debug("Saving player profiles")
+        backup_file = f"{self.profiles_file}.bak"
+        try:
+            # Create backup of existing file
+            if os.path.exists(self.profiles_file):
+                try:
+                    os.replace(self.profiles_file, backup_file)
+                except Exception as e:
+                    print(f"Error creating backup: {e}")
+
+            profiles_data = [
+                {
+                    'username': profile.username,
+                    'stats': stats_to_dict(getattr(profile, 'stats', {})),
+                    'journal_seq': profile.journal_seq
+                }
+                for profile in profiles
+            ]
+
+            # Write to temporary file first
+            temp_file = f"{self.profiles_file}.tmp"
+            with open(temp_file, 'w') as f:
+                json.dump(profiles_data, f, indent=2)
+                # Make sure the data is on disk before it replaces the original
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Replace original file with temporary file
+            os.replace(temp_file, self.profiles_file)
+
+        except Exception as e:
+            self.logger.error("Failed to save profiles: %s", e)
+            print(f"Error saving profiles: {e}")
+            # Try to restore from backup
+            if os.path.exists(backup_file):
+                try:
+                    os.replace(backup_file, self.profiles_file)
+                    print("Restored profiles from backup.")
+                except Exception as restore_error:
+                    print(f"Error restoring backup: {restore_error}")
+            # The persistence worker retries, and compaction keeps the journal until a write succeeds
+            raise
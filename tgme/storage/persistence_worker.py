@@ -0,0 +1,148 @@
+import copy
+import threading
+from typing import Dict, Optional, Set
+from tgme.interfaces import IProfileStore
+from tgme.player_profile import PlayerProfile
+from tgme.utils.logger import TMGELogger
+
+class ProfilePersistenceWorker:
+    '''
+    Writes changed profiles to a profile store from a background thread.
+
+    Callers only record which profiles are dirty, which copies the profile
+    and returns immediately. The worker waits `interval` seconds after the
+    first change so a burst of changes is written as a single batch, and
+    drains everything that is still pending when it is closed.
+    '''
+    def __init__(self, store: IProfileStore, interval: float = 1.0) -> None:
+        """
+        __init__
+
+        Args:
+            store (IProfileStore): The store to write profiles to
+            interval (float): Seconds to coalesce changes before writing them
+
+        Returns:
+            None
+        """
+        self.logger = TMGELogger().get_logger('storage')
+        self.store = store
+        self.interval = interval
+
+        self._dirty: Dict[str, PlayerProfile] = {}
+        self._deleted: Set[str] = set()
+        self._condition = threading.Condition()
+        self._queued = 0    # Generation of the latest change
+        self._written = 0   # Generation of the latest change that reached the store
+        self._closed = False
+        self._flush_requested = False
+        self._gave_up = False
+
+        self._thread = threading.Thread(target=self._run, name="ProfilePersistence", daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self, profile: PlayerProfile) -> None:
+        """
+        mark_dirty
+
+        Args:
+            profile (PlayerProfile): A new or changed profile to write in the next batch
+
+        Returns:
+            None
+        """
+        # Copy so the UI thread can keep changing the profile while it is written
+        snapshot = PlayerProfile(profile.username)
+        snapshot.stats = copy.deepcopy(profile.stats)
+        snapshot.journal_seq = profile.journal_seq
+        with self._condition:
+            # A pending delete of the same username stays queued and runs first,
+            # so a re-created profile does not inherit the old one's stats
+            self._dirty[profile.username] = snapshot
+            self._queued += 1
+            self._condition.notify_all()
+
+    def mark_deleted(self, username: str) -> None:
+        """
+        mark_deleted
+
+        Args:
+            username (str): The username of a profile to delete in the next batch
+
+        Returns:
+            None
+        """
+        with self._condition:
+            self._dirty.pop(username, None)
+            self._deleted.add(username)
+            self._queued += 1
+            self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        flush blocks until every change made before the call has been written
+
+        Args:
+            timeout (Optional[float]): Seconds to wait at most, None to wait indefinitely
+
+        Returns:
+            result (bool): True if everything was written, False on timeout
+        """
+        with self._condition:
+            target = self._queued
+            self._flush_requested = True
+            self._condition.notify_all()
+            written = self._condition.wait_for(lambda: self._written >= target, timeout)
+            return written and not self._gave_up
+
+    def close(self) -> None:
+        """Write everything still pending and stop the worker thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or self._queued > self._written)
+                if self._closed and self._queued == self._written:
+                    return
+                # Let a burst of changes pile up so it is written once
+                self._condition.wait_for(lambda: self._closed or self._flush_requested, self.interval)
+                dirty, deleted, generation = self._dirty, self._deleted, self._queued
+                self._dirty, self._deleted = {}, set()
+                self._flush_requested = False
+
+            failed = not self._write(dirty, deleted)
+
+            with self._condition:
+                if failed:
+                    # Put the batch back unless newer changes superseded it
+                    for username, profile in dirty.items():
+                        if username not in self._deleted:
+                            self._dirty.setdefault(username, profile)
+                    self._deleted.update(deleted)
+                    if self._closed:
+                        # Give up rather than spin on a store that keeps failing
+                        self._gave_up = True
+                        self._written = self._queued
+                        self._condition.notify_all()
+                        return
+                    self._condition.wait_for(lambda: self._closed, self.interval)
+                else:
+                    self._written = generation
+                    self._condition.notify_all()
+
+    def _write(self, dirty: Dict[str, PlayerProfile], deleted: Set[str]) -> bool:
+        try:
+            for username in deleted:
+                self.store.delete_profile(username)
+            if dirty:
+                self.store.save_profiles(list(dirty.values()))
+        except Exception as e:
+            self.logger.error("Failed to write profiles: %s", e)
+            return False
+
+        self.logger.debug("Wrote %s profiles, deleted %s", len(dirty), len(deleted))
+        return True
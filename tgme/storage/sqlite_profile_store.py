@@ -0,0 +1,244 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+from tgme.interfaces import IProfileStore
+from tgme.player_profile import PlayerProfile
+from tgme.storage.json_profile_store import iter_profiles_json, stats_to_dict
+from tgme.utils.logger import TMGELogger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    username TEXT PRIMARY KEY,
+    journal_seq INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS profile_stats (
+    username TEXT NOT NULL REFERENCES profiles(username) ON DELETE CASCADE,
+    game_id TEXT NOT NULL,
+    stat TEXT NOT NULL,
+    value,
+    PRIMARY KEY (username, game_id, stat)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS profile_stats_by_value ON profile_stats (game_id, stat, value);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+"""
+
+UPSERT_PROFILE = (
+    "INSERT INTO profiles (username, journal_seq) VALUES (?, ?) "
+    "ON CONFLICT(username) DO UPDATE SET journal_seq = excluded.journal_seq"
+)
+UPSERT_STAT = (
+    "INSERT INTO profile_stats (username, game_id, stat, value) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(username, game_id, stat) DO UPDATE SET value = excluded.value"
+)
+
+# Stat name used when a game's stats are a single value rather than a dict
+SCALAR_STAT = ''
+
+# Profiles written per statement while migrating from JSON
+MIGRATION_BATCH = 1000
+
+# Meta key recording that the legacy profiles.json has been imported
+JSON_MIGRATED_KEY = 'migrated_from_json'
+
+
+def _apply_stat(profile: PlayerProfile, game_id: str, stat: str, value) -> None:
+    if stat == SCALAR_STAT:
+        profile.stats[game_id] = value
+    else:
+        profile.stats.setdefault(game_id, {})[stat] = value
+
+
+def _stat_rows(game_stats) -> list:
+    if isinstance(game_stats, dict):
+        return list(game_stats.items())
+    return [(SCALAR_STAT, game_stats)]
+
+
+class SQLiteProfileStore(IProfileStore):
+    '''
+    Stores profiles in an SQLite database.
+
+    Profiles are keyed by username and each save is a row-level upsert, so
+    adding or updating one profile costs the same regardless of how many
+    profiles exist. Per-game stats live in their own table with one row per
+    (username, game, stat).
+
+    Writes may come from a ProfilePersistenceWorker thread, and each commit
+    waits for the disk, so reads go through a second connection with its
+    own lock. With the database in WAL mode the reader sees the last
+    committed state and never waits for a write, so lookups from the UI
+    thread stay fast while the worker saves.
+    '''
+    def __init__(self, db_file: str, legacy_json_file: Optional[str] = None) -> None:
+        """
+        __init__
+
+        Args:
+            db_file (str): Path of the SQLite database
+            legacy_json_file (Optional[str]): A profiles.json to import the first time the database is opened
+
+        Returns:
+            None
+        """
+        self.logger = TMGELogger().get_logger('storage')
+        self.db_file = db_file
+        # Serialises writes, held across commits
+        self._lock = threading.RLock()
+        # Serialises reads, never held across a commit
+        self._read_lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Writes happen off the UI thread, so every commit can afford to be durable
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self._reader = sqlite3.connect(db_file, check_same_thread=False)
+
+        if legacy_json_file:
+            self.migrate_from_json(legacy_json_file)
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._read_lock:
+            row = self._reader.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    def migrate_from_json(self, profiles_file: str) -> int:
+        """
+        migrate_from_json imports a legacy profiles.json once
+
+        Args:
+            profiles_file (str): Path of the legacy profiles JSON file
+
+        Returns:
+            count (int): The number of profiles imported, 0 if already migrated or nothing to import
+        """
+        if self.get_meta(JSON_MIGRATED_KEY) or not os.path.exists(profiles_file):
+            return 0
+
+        count = 0
+        try:
+            # Stream the file in batches, all inside one transaction
+            with self._lock, self.conn:
+                batch = []
+                for profile in iter_profiles_json(profiles_file):
+                    batch.append(profile)
+                    if len(batch) == MIGRATION_BATCH:
+                        self._write(batch)
+                        count += len(batch)
+                        batch = []
+                self._write(batch)
+                count += len(batch)
+                self._set_meta(JSON_MIGRATED_KEY, profiles_file)
+        except (OSError, json.JSONDecodeError) as e:
+            self.logger.error("Failed to read %s for migration: %s", profiles_file, e)
+            return 0
+
+        self.logger.info("Migrated %s profiles from %s", count, profiles_file)
+        return count
+
+    def load_profiles(self) -> List[PlayerProfile]:
+        """Load every profile with its stats"""
+        self.logger.debug("Loading player profiles")
+        with self._read_lock:
+            # One read transaction, so both queries see the same commit
+            self._reader.execute("BEGIN")
+            try:
+                profiles = {}
+                for username, journal_seq in self._reader.execute("SELECT username, journal_seq FROM profiles"):
+                    profiles[username] = PlayerProfile(username)
+                    profiles[username].journal_seq = journal_seq
+                stat_rows = self._reader.execute("SELECT username, game_id, stat, value FROM profile_stats").fetchall()
+            finally:
+                self._reader.execute("COMMIT")
+        for username, game_id, stat, value in stat_rows:
+            _apply_stat(profiles[username], game_id, stat, value)
+        return list(profiles.values())
+
+    def load_profile(self, username: str) -> Optional[PlayerProfile]:
+        """Load one profile and its stats through the primary keys"""
+        with self._read_lock:
+            row = self._reader.execute("SELECT journal_seq FROM profiles WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                return None
+            stat_rows = self._reader.execute(
+                "SELECT game_id, stat, value FROM profile_stats WHERE username = ?", (username,)
+            ).fetchall()
+
+        profile = PlayerProfile(username)
+        profile.journal_seq = row[0]
+        for game_id, stat, value in stat_rows:
+            _apply_stat(profile, game_id, stat, value)
+        return profile
+
+    def has_profile(self, username: str) -> bool:
+        with self._read_lock:
+            return self._reader.execute("SELECT 1 FROM profiles WHERE username = ?", (username,)).fetchone() is not None
+
+    def search_usernames(self, prefix: str, limit: int = 10) -> List[str]:
+        """Range scan of the username primary key"""
+        if not prefix:
+            query, params = "SELECT username FROM profiles ORDER BY username LIMIT ?", (limit,)
+        else:
+            # Every string starting with prefix sorts before prefix with its last character bumped
+            upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            query = "SELECT username FROM profiles WHERE username >= ? AND username < ? ORDER BY username LIMIT ?"
+            params = (prefix, upper, limit)
+        with self._read_lock:
+            return [username for (username,) in self._reader.execute(query, params)]
+
+    def max_journal_seq(self) -> int:
+        with self._read_lock:
+            return self._reader.execute("SELECT MAX(journal_seq) FROM profiles").fetchone()[0] or 0
+
+    def save_profile(self, profile: PlayerProfile) -> None:
+        """Upsert a single profile and its stats"""
+        with self._lock, self.conn:
+            self._write([profile])
+
+    def save_profiles(self, profiles: List[PlayerProfile]) -> None:
+        """Upsert a batch of profiles in one transaction"""
+        self.logger.debug("Saving player profiles")
+        with self._lock, self.conn:
+            self._write(profiles)
+
+    def load_leaderboard(self, game_id: str, stat: str) -> List[Tuple[str, int]]:
+        """Read one stat of one game for every profile through the stats index"""
+        with self._read_lock:
+            return self._reader.execute(
+                "SELECT username, value FROM profile_stats WHERE game_id = ? AND stat = ? ORDER BY value DESC",
+                (game_id, stat)
+            ).fetchall()
+
+    def delete_profile(self, username: str) -> None:
+        """Delete a profile, its stats are removed by the cascade"""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM profiles WHERE username = ?", (username,))
+
+    def _write(self, profiles: List[PlayerProfile]) -> None:
+        self.conn.executemany(UPSERT_PROFILE, [(profile.username, profile.journal_seq) for profile in profiles])
+        self.conn.executemany(UPSERT_STAT, [
+            (profile.username, game_id, stat, value)
+            for profile in profiles
+            for game_id, game_stats in stats_to_dict(profile.stats).items()
+            for stat, value in _stat_rows(game_stats)
+        ])
+
+    def close(self) -> None:
+        with self._read_lock:
+            self._reader.close()
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,225 @@
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Set
+from tgme.utils.logger import TMGELogger
+
+# File header: magic, sequence number of the first record in the segment
+HEADER = struct.Struct('<4sQ')
+MAGIC = b'TSJ1'
+# Record frame: payload length, crc32 of the payload
+FRAME = struct.Struct('<HI')
+# Fixed part of the payload: seq, score, duration, won, username length, game id length
+FIELDS = struct.Struct('<QqdBHH')
+
+
+@dataclass
+class GameResult:
+    seq: int
+    username: str
+    game_id: str
+    score: int
+    won: bool
+    duration: float
+
+
+def encode_result(result: GameResult) -> bytes:
+    """Pack a result into a framed journal record"""
+    username = result.username.encode('utf-8')
+    game_id = result.game_id.encode('utf-8')
+    payload = FIELDS.pack(
+        result.seq, result.score, result.duration, result.won, len(username), len(game_id)
+    ) + username + game_id
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_results(data: bytes, offset: int = HEADER.size) -> Iterator[tuple]:
+    """
+    decode_results
+
+    Args:
+        data (bytes): The contents of a journal segment
+        offset (int): Where the first record starts
+
+    Returns:
+        records (Iterator[tuple]): (GameResult, end offset) for every intact record, stopping at
+            the first torn or corrupt one
+    """
+    while offset + FRAME.size <= len(data):
+        length, crc = FRAME.unpack_from(data, offset)
+        start, end = offset + FRAME.size, offset + FRAME.size + length
+        payload = data[start:end]
+        if end > len(data) or length < FIELDS.size or zlib.crc32(payload) != crc:
+            return
+        seq, score, duration, won, username_len, game_id_len = FIELDS.unpack_from(payload)
+        names = payload[FIELDS.size:]
+        yield GameResult(
+            seq,
+            names[:username_len].decode('utf-8'),
+            names[username_len:username_len + game_id_len].decode('utf-8'),
+            score,
+            bool(won),
+            duration
+        ), end
+        offset = end
+
+
+class StatsJournal:
+    '''
+    Append-only journal of finished game results.
+
+    Every result is one framed binary record appended to the current segment
+    with a single write. Compaction rotates the current segment aside; once
+    the affected profiles have been written to the profile store (each
+    profile remembers the last sequence number it includes) the rotated
+    segment is deleted. On startup both segments are replayed, skipping
+    records a profile already includes.
+    '''
+    def __init__(self, journal_file: str, compact_threshold: int = 256 * 1024, sync: bool = False) -> None:
+        """
+        __init__
+
+        Args:
+            journal_file (str): Path of the current journal segment
+            compact_threshold (int): Segment size in bytes above which compaction is due
+            sync (bool): Whether to fsync after every record
+
+        Returns:
+            None
+        """
+        self.logger = TMGELogger().get_logger('storage')
+        self.journal_file = journal_file
+        self.rotated_file = f"{journal_file}.compacting"
+        self.compact_threshold = compact_threshold
+        self.sync = sync
+
+        self.last_seq = 0
+        self.pending_usernames: Set[str] = set()   # Users with records in the current segment
+        self._file = None
+        self._size = 0
+
+    def replay(self, min_seq: int = 0) -> List[GameResult]:
+        """
+        replay reads both segments and opens the current one for appending
+
+        Args:
+            min_seq (int): The highest sequence number the profile store already includes. New
+                records are numbered above it even if both segments are missing or corrupt,
+                otherwise replaying them would skip them as already applied
+
+        Returns:
+            results (List[GameResult]): Every intact record, oldest first
+        """
+        self.last_seq = max(self.last_seq, min_seq)
+        results = []
+        if os.path.exists(self.rotated_file):
+            results.extend(self._read_segment(self.rotated_file, repair=False))
+        current = self._read_segment(self.journal_file, repair=True)
+        self.pending_usernames = {result.username for result in current}
+        results.extend(current)
+        if results:
+            self.last_seq = max(self.last_seq, results[-1].seq)
+        self._open()
+        return results
+
+    def _read_segment(self, path: str, repair: bool) -> List[GameResult]:
+        if not os.path.exists(path):
+            return []
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER.size or HEADER.unpack_from(data)[0] != MAGIC:
+            self.logger.error("Ignoring stats journal with a bad header: %s", path)
+            if repair:
+                os.replace(path, f"{path}.corrupt")
+            return []
+
+        self.last_seq = max(self.last_seq, HEADER.unpack_from(data)[1] - 1)
+        results, good_end = [], HEADER.size
+        for result, end in decode_results(data):
+            results.append(result)
+            good_end = end
+
+        if good_end < len(data):
+            self.logger.warning("Discarding %s bytes of torn records in %s", len(data) - good_end, path)
+            if repair:
+                with open(path, 'r+b') as f:
+                    f.truncate(good_end)
+        return results
+
+    def _open(self) -> None:
+        new_file = not os.path.exists(self.journal_file)
+        self._file = open(self.journal_file, 'ab', buffering=0)
+        if new_file:
+            self._file.write(HEADER.pack(MAGIC, self.last_seq + 1))
+        self._size = self._file.tell()
+
+    def append(self, username: str, game_id: str, score: int, won: bool, duration: float) -> int:
+        """
+        append
+
+        Args:
+            username (str): The player the result belongs to
+            game_id (str): The identifier of the game
+            score (int): The final score
+            won (bool): Whether the player won
+            duration (float): Length of the game in seconds
+
+        Returns:
+            seq (int): The sequence number of the new record
+        """
+        if self._file is None:
+            self._open()
+
+        self.last_seq += 1
+        record = encode_result(GameResult(self.last_seq, username, game_id, score, won, duration))
+        self._file.write(record)
+        if self.sync:
+            os.fsync(self._file.fileno())
+        self._size += len(record)
+        self.pending_usernames.add(username)
+        return self.last_seq
+
+    def needs_compaction(self) -> bool:
+        return self._size > self.compact_threshold and not self.is_compacting()
+
+    def is_compacting(self) -> bool:
+        return os.path.exists(self.rotated_file)
+
+    def begin_compaction(self) -> Optional[Set[str]]:
+        """
+        begin_compaction moves the current segment aside and starts a new one
+
+        Args:
+            None
+
+        Returns:
+            usernames (Optional[Set[str]]): Users whose profiles must be written before
+                end_compaction, or None if a compaction is already in progress
+        """
+        if self.is_compacting():
+            return None
+        if not os.path.exists(self.journal_file):
+            return set()
+
+        if self._file is not None:
+            self._file.close()
+        os.replace(self.journal_file, self.rotated_file)
+        self._open()
+
+        usernames, self.pending_usernames = self.pending_usernames, set()
+        return usernames
+
+    def end_compaction(self) -> None:
+        """Delete the rotated segment once every profile it touches is in the store"""
+        try:
+            os.remove(self.rotated_file)
+        except FileNotFoundError:
+            pass
+        self.logger.debug("Stats journal compacted")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
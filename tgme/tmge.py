@@ -1,18 +1,30 @@
-import json
 import os
-from typing import List
-from tgme.interfaces import IGameManager
+import threading
+import time
+from typing import List, Optional, Set, Tuple
+from tgme.interfaces import IGameManager, IProfileStore
 from tgme.player_profile import PlayerProfile
+from tgme.profile_index import ProfileIndex
+from tgme.leaderboard import Leaderboards
 from tgme.game import Game
+from tgme.plugins import GamePlugin
+from tgme.replay_file import ReplayWriter
+from tgme.storage.persistence_worker import ProfilePersistenceWorker
+from tgme.storage.sqlite_profile_store import SQLiteProfileStore
+from tgme.storage.stats_journal import StatsJournal
 from tgme.utils.logger import TMGELogger
 
 class TMGE(IGameManager):
-    def __init__(self) -> None:
+    def __init__(self, profile_store: Optional[IProfileStore] = None,
+                 stats_journal: Optional[StatsJournal] = None) -> None:
         """
         __init__
 
         Args:
-            None
+            profile_store (Optional[IProfileStore]): Where profiles are persisted, defaults to
+                data/profiles.db (importing data/profiles.json on first run)
+            stats_journal (Optional[StatsJournal]): Where game results are journaled, defaults to
+                data/stats.journal
 
         Returns:
             None
@@ -20,100 +32,260 @@ class TMGE(IGameManager):
         self.logger = TMGELogger()
         self.logger.info("Initializing TMGE")
         
-        self.games: List[Game] = []
-        self.player_profiles: List[PlayerProfile] = []
+        # Descriptors only, a game is built when it is launched
+        self.games: List[GamePlugin] = []
+        # Profiles loaded so far, the rest stay in the store until they are needed
+        self.profile_index = ProfileIndex()
+        # Profiles removed this session whose deletion may not have reached the store yet
+        self._deleted_usernames: Set[str] = set()
+        self.leaderboards = Leaderboards(self._load_leaderboard)
+        # Profiles whose in-memory stats may be newer than the store
+        self._stats_changed: Set[str] = set()
         
         # Create data directory if it doesn't exist
         data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
         os.makedirs(data_dir, exist_ok=True)
         
         self.profiles_file = os.path.join(data_dir, "profiles.json")
-        self.load_profiles()
+        if profile_store is None:
+            profile_store = SQLiteProfileStore(
+                os.path.join(data_dir, "profiles.db"),
+                legacy_json_file=self.profiles_file
+            )
+        self.profile_store: IProfileStore = profile_store
+
+        # Profile writes happen on a background thread so the UI never waits on disk
+        self.persistence = ProfilePersistenceWorker(self.profile_store)
+
+        if stats_journal is None:
+            stats_journal = StatsJournal(os.path.join(data_dir, "stats.journal"))
+        self.stats_journal = stats_journal
+        self.replay_stats_journal()
+
+        # Every session is recorded as inputs plus keyframes so it can be replayed with tgme.replay
+        self.recordings_dir = os.path.join(data_dir, "recordings")
 
     def load_profiles(self) -> None:
-        """Load player profiles from file"""
-        self.logger.debug("Loading player profiles")
-        if not os.path.exists(self.profiles_file):
-            self.logger.info("Profiles file not found, creating new one")
-            # Create empty profiles file if it doesn't exist
-            try:
-                with open(self.profiles_file, 'w') as f:
-                    json.dump([], f)
-            except Exception as e:
-                print(f"Error creating profiles file: {e}")
+        """Load every player profile that is not loaded yet from the profile store"""
+        try:
+            for profile in self.profile_store.load_profiles():
+                if profile.username not in self._deleted_usernames:
+                    self.profile_index.add(profile)
+        except Exception as e:
+            self.logger.error("Failed to load profiles: %s", e)
+            print(f"Error loading profiles: {e}")
+
+    def _load_profile(self, username: str) -> Optional[PlayerProfile]:
+        """Return a profile from the index, loading it from the store on first use"""
+        profile = self.profile_index.get(username)
+        if profile is not None or username in self._deleted_usernames:
+            return profile
+
+        try:
+            profile = self.profile_store.load_profile(username)
+        except Exception as e:
+            self.logger.error("Failed to load profile %s: %s", username, e)
+            print(f"Error loading profile: {e}")
+            return None
+
+        if profile is not None:
+            self.profile_index.add(profile)
+        return profile
+
+    def replay_stats_journal(self) -> None:
+        """Apply journaled game results that the stored profiles do not include yet"""
+        try:
+            results = self.stats_journal.replay(self.profile_store.max_journal_seq())
+        except Exception as e:
+            self.logger.error("Failed to replay stats journal: %s", e)
+            print(f"Error replaying stats journal: {e}")
             return
 
+        # Only the profiles named in the journal are loaded, and compaction keeps it short
+        replayed = 0
+        for result in results:
+            profile = self._load_profile(result.username)
+            if profile is None or result.seq <= profile.journal_seq:
+                continue
+            profile.record_result(result.game_id, result.score, result.won, result.duration)
+            profile.journal_seq = result.seq
+            self._stats_changed.add(profile.username)
+            replayed += 1
+        self.logger.debug("Replayed %s of %s journaled game results", replayed, len(results))
+
+        # Finish a compaction that was interrupted by the last shutdown
+        if self.stats_journal.is_compacting():
+            self._finish_compaction({result.username for result in results})
+
+    def record_game_result(self, profile: PlayerProfile, game_id: str, score: int,
+                           won: bool, duration: float) -> None:
+        """
+        record_game_result
+
+        Args:
+            profile (PlayerProfile): The profile the result belongs to
+            game_id (str): The identifier of the game
+            score (int): The final score
+            won (bool): Whether the player won
+            duration (float): Length of the game in seconds
+
+        Returns:
+            None
+        """
         try:
-            with open(self.profiles_file, 'r') as f:
-                profiles_data = json.load(f)
-                for profile_data in profiles_data:
-                    if isinstance(profile_data, dict) and 'username' in profile_data:
-                        profile = PlayerProfile(profile_data['username'])
-                        profile.stats = profile_data.get('stats', {})
-                        self.player_profiles.append(profile)
-        except json.JSONDecodeError:
-            print("Error: profiles.json is corrupted. Creating new file.")
-            with open(self.profiles_file, 'w') as f:
-                json.dump([], f)
+            seq = self.stats_journal.append(profile.username, game_id, score, won, duration)
         except Exception as e:
-            print(f"Error loading profiles: {e}")
+            self.logger.error("Failed to journal result for %s: %s", profile.username, e)
+            print(f"Error saving game result: {e}")
+            seq = None
 
-    def save_profiles(self) -> None:
-        """Save player profiles to file"""
-        self.logger.debug("Saving player profiles")
+        profile.record_result(game_id, score, won, duration)
+        self._stats_changed.add(profile.username)
+        self.leaderboards.update(profile.username, game_id, profile.stats[game_id])
+        if seq is None:
+            # Fall back to writing the whole profile so the game still counts
+            self.persistence.mark_dirty(profile)
+        else:
+            profile.journal_seq = seq
+
+        if self.stats_journal.needs_compaction():
+            self.compact_stats_journal()
+
+    def record_game_results(self, game: Game) -> None:
+        """Record the final result of every registered player in a finished game"""
+        duration = game.get_duration()
+        for player, score, won in game.get_results():
+            if self._load_profile(player.profile.username) is player.profile:
+                self.record_game_result(player.profile, game.game_id, score, won, duration)
+
+    def record_session(self, game: Game) -> Optional[ReplayWriter]:
+        """
+        record_session
+
+        Args:
+            game (Game): A game that has just been initialised with game.init()
+
+        Returns:
+            writer (Optional[ReplayWriter]): Streams the session to data/recordings/, pass it to
+                save_recording when the session ends, None if the file could not be created
+        """
+        name = game.game_id.replace(' ', '_')
+        path = os.path.join(self.recordings_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{game.seed}.replay")
         try:
-            # Create backup of existing file
-            if os.path.exists(self.profiles_file):
-                backup_file = f"{self.profiles_file}.bak"
-                try:
-                    os.replace(self.profiles_file, backup_file)
-                except Exception as e:
-                    print(f"Error creating backup: {e}")
-
-            profiles_data = []
-            for profile in self.player_profiles:
-                if hasattr(profile, 'username'):  # Validate profile object
-                    profile_data = {
-                        'username': profile.username,
-                        'stats': getattr(profile, 'stats', {})
-                    }
-                    profiles_data.append(profile_data)
-
-            # Write to temporary file first
-            temp_file = f"{self.profiles_file}.tmp"
-            with open(temp_file, 'w') as f:
-                json.dump(profiles_data, f, indent=2)
-
-            # Replace original file with temporary file
-            os.replace(temp_file, self.profiles_file)
-            self.logger.info("Profiles saved successfully")
+            os.makedirs(self.recordings_dir, exist_ok=True)
+            return ReplayWriter(path, game)
+        except Exception as e:
+            self.logger.error("Failed to start recording: %s", e)
+            print(f"Error starting recording: {e}")
+            return None
 
+    def save_recording(self, writer: Optional[ReplayWriter]) -> Optional[str]:
+        """
+        save_recording
+
+        Args:
+            writer (Optional[ReplayWriter]): The writer returned by record_session
+
+        Returns:
+            path (Optional[str]): Where the recording was written, or None if it could not be
+        """
+        if writer is None:
+            return None
+        try:
+            end_tick = writer.close()
         except Exception as e:
-            self.logger.error(f"Failed to save profiles: {e}")
-            print(f"Error saving profiles: {e}")
-            # Try to restore from backup
-            if os.path.exists(backup_file):
-                try:
-                    os.replace(backup_file, self.profiles_file)
-                    print("Restored profiles from backup.")
-                except Exception as restore_error:
-                    print(f"Error restoring backup: {restore_error}")
-
-    def register_game(self, game: Game) -> None:
+            self.logger.error("Failed to save recording: %s", e)
+            print(f"Error saving recording: {e}")
+            return None
+
+        self.logger.info("Saved %s ticks of %s to %s", end_tick, writer.game.game_id, writer.path)
+        return writer.path
+
+    def _load_leaderboard(self, game_id: str, metric: str) -> List[Tuple[str, int]]:
+        """Stored leaderboard entries, overlaid with stats that have not reached the store yet"""
+        entries = dict(self.profile_store.load_leaderboard(game_id, metric))
+        for username in self._stats_changed:
+            profile = self.profile_index.get(username)
+            game_stats = profile.stats.get(game_id) if profile else None
+            if isinstance(game_stats, dict) and metric in game_stats:
+                entries[username] = game_stats[metric]
+        # Deletions may not have reached the store yet either
+        return [(username, value) for username, value in entries.items() if username not in self._deleted_usernames]
+
+    def get_leaderboard(self, game_id: str, metric: str = 'high_score', limit: int = 100) -> List[Tuple[str, int]]:
+        """
+        get_leaderboard
+
+        Args:
+            game_id (str): The identifier of the game
+            metric (str): The stat to rank by, high_score or wins
+            limit (int): The number of entries to return
+
+        Returns:
+            entries (List[Tuple[str, int]]): (username, value) pairs, best first
+        """
+        return self.leaderboards.get(game_id, metric).top(limit)
+
+    def get_rank(self, game_id: str, username: str, metric: str = 'high_score') -> Optional[int]:
+        """
+        get_rank
+
+        Args:
+            game_id (str): The identifier of the game
+            username (str): The player to look up
+            metric (str): The stat to rank by, high_score or wins
+
+        Returns:
+            rank (Optional[int]): 1-based rank, or None if the player has not played the game
+        """
+        return self.leaderboards.get(game_id, metric).rank(username)
+
+    def compact_stats_journal(self) -> None:
+        """Fold the journal into the profile store in the background"""
+        usernames = self.stats_journal.begin_compaction()
+        if usernames is not None:
+            self._finish_compaction(usernames)
+
+    def _finish_compaction(self, usernames: set) -> None:
+        for username in usernames:
+            profile = self.profile_index.get(username)
+            if profile is not None:
+                self.persistence.mark_dirty(profile)
+
+        def wait_for_profiles() -> None:
+            # The rotated segment is only dropped once its profiles are in the store
+            if self.persistence.flush():
+                self.stats_journal.end_compaction()
+
+        threading.Thread(target=wait_for_profiles, name="StatsCompaction", daemon=True).start()
+
+    def save_profiles(self) -> None:
+        """Queue every loaded player profile to be written in the next background batch"""
+        for profile in self.profile_index:
+            self.persistence.mark_dirty(profile)
+
+    def save_profile(self, profile: PlayerProfile) -> None:
+        """Queue a changed player profile to be written in the next background batch"""
+        self.persistence.mark_dirty(profile)
+
+    def register_game(self, game: GamePlugin) -> None:
         """
         register_game
 
         Args:
-            game (Game): An instance of a concrete game to register with TMGE
+            game (GamePlugin): The descriptor of a concrete game to register with TMGE, see
+                tgme.plugins.available_plugins
 
         Returns:
             None
         """
-        self.logger.info(f"Registering game: {game.game_id}")
+        if any(registered.game_id == game.game_id for registered in self.games):
+            raise ValueError(f"Game already registered: {game.game_id}")
+        self.logger.info("Registering game: %s", game.game_id)
         self.games.append(game)
 
     @property
-    def get_available_games(self) -> List[Game]:
+    def get_available_games(self) -> List[GamePlugin]:
         """
         get_available_games
 
@@ -121,7 +293,7 @@ class TMGE(IGameManager):
             None
 
         Returns:
-            games (List[Game]): The list of all registered games
+            games (List[GamePlugin]): The descriptors of all registered games
         """
         return self.games
 
@@ -134,9 +306,48 @@ class TMGE(IGameManager):
             None
 
         Returns:
-            profiles (List[PlayerProfile]): The list of all registered player profiles
+            profiles (List[PlayerProfile]): The list of all registered player profiles, which
+                loads every profile that is not loaded yet
+        """
+        self.load_profiles()
+        return list(self.profile_index)
+
+    def get_profile(self, username: str) -> Optional[PlayerProfile]:
+        """
+        get_profile
+
+        Args:
+            username (str): The username to look up
+
+        Returns:
+            profile (Optional[PlayerProfile]): The matching profile, or None if there is none
+        """
+        return self._load_profile(username)
+
+    def has_profile(self, username: str) -> bool:
+        """Check if a profile with this username exists"""
+        if username in self.profile_index:
+            return True
+        if username in self._deleted_usernames:
+            return False
+        return self.profile_store.has_profile(username)
+
+    def suggest_usernames(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        suggest_usernames
+
+        Args:
+            prefix (str): The start of a username, as typed so far
+            limit (int): The maximum number of suggestions
+
+        Returns:
+            usernames (List[str]): Existing usernames starting with prefix, in sorted order
         """
-        return self.player_profiles
+        # Loaded profiles may not have reached the store yet, so merge both
+        stored = self.profile_store.search_usernames(prefix, limit + len(self._deleted_usernames))
+        usernames = set(self.profile_index.search_prefix(prefix, limit))
+        usernames.update(username for username in stored if username not in self._deleted_usernames)
+        return sorted(usernames)[:limit]
 
     def add_player_profile(self, profile: PlayerProfile) -> None:
         """
@@ -148,9 +359,33 @@ class TMGE(IGameManager):
         Returns:
             None
         """
-        self.logger.info(f"Adding new player profile: {profile.username}")
-        self.player_profiles.append(profile)
-        self.save_profiles()
+        if self.has_profile(profile.username):
+            raise ValueError(f"Username already exists: {profile.username}")
+
+        self.profile_index.add(profile)
+        self._deleted_usernames.discard(profile.username)
+
+        self.logger.info("Adding new player profile: %s", profile.username)
+        self.persistence.mark_dirty(profile)
+
+    def remove_player_profile(self, username: str) -> None:
+        """
+        remove_player_profile
+
+        Args:
+            username (str): The username of the profile to remove from TMGE
+
+        Returns:
+            None
+        """
+        if not self.has_profile(username):
+            return
+
+        self.profile_index.remove(username)
+        self._deleted_usernames.add(username)
+        self.logger.info("Removing player profile: %s", username)
+        self.leaderboards.remove(username)
+        self.persistence.mark_deleted(username)
 
     def start(self) -> None:
         """
@@ -175,4 +410,9 @@ class TMGE(IGameManager):
             None
         """
         self.save_profiles()
+        # Blocks until every pending write has reached the store
+        self.persistence.close()
+        self.stats_journal.close()
+        self.profile_store.close()
+        self.logger.info("Profiles saved successfully")
         print("TMGE quit.")
\ No newline at end of file
@@ -0,0 +1,330 @@
+"""
+Binary event trace: the last engine events of this process, kept in memory.
+
+Games record piece spawns and locks, line clears, cascade steps, attacks
+and the start and end of every tick into a fixed-size ring of packed
+records, overwriting the oldest, so tracing costs one struct.pack_into per
+event and never touches the disk. The ring is written to a file on demand
+(EventTrace().dump(), or SIGUSR2 once install_dump_hooks has run) and when
+the process dies of an uncaught exception. Convert a dump to Chrome
+trace-event JSON to see the ticks on a timeline in chrome://tracing or
+https://ui.perfetto.dev:
+
+    python -m tgme.trace logs/trace-1234-20260101-120000.bin -o trace.json
+"""
+import argparse
+import json
+import os
+import signal
+import struct
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from tgme.utils.logger import TMGELogger
+
+# Record: perf_counter_ns, event, game slot, player (-1 for the whole game), game tick, value
+RECORD = struct.Struct('<qBHbIi')
+# Bound once, recording runs on every tick
+_pack_record = RECORD.pack_into
+_RECORD_SIZE = RECORD.size
+_clock = time.perf_counter_ns
+# File header: magic, length of the JSON header that follows, then the records, oldest first
+HEADER = struct.Struct('<4sI')
+MAGIC = b'TTR1'
+FILE_VERSION = 1
+
+# Ring size in records as TMGE_TRACE_EVENTS, 0 turns tracing off
+CAPACITY_ENV = 'TMGE_TRACE_EVENTS'
+DEFAULT_CAPACITY = 65536
+
+# Events
+TICK_START = 1          # value: 1 if the tick is simulated again after a rollback
+TICK_END = 2
+PIECE_SPAWN = 3
+PIECE_LOCK = 4
+LINE_CLEAR = 5          # value: lines cleared
+CASCADE_STEP = 6        # value: gems cleared in the step
+ATTACK_SENT = 7         # value: garbage rows sent to the opponent
+ATTACK_RECEIVED = 8     # value: garbage rows pushed onto the board
+
+EVENT_NAMES = {
+    TICK_START: 'tick',
+    TICK_END: 'tick',
+    PIECE_SPAWN: 'piece spawn',
+    PIECE_LOCK: 'piece lock',
+    LINE_CLEAR: 'line clear',
+    CASCADE_STEP: 'cascade step',
+    ATTACK_SENT: 'attack sent',
+    ATTACK_RECEIVED: 'attack received',
+}
+# What an event's value means, events not listed have no value
+VALUE_NAMES = {LINE_CLEAR: 'lines', CASCADE_STEP: 'gems', ATTACK_SENT: 'rows', ATTACK_RECEIVED: 'rows'}
+
+
+class EventTrace:
+    '''
+    The process's event ring, a singleton.
+
+    Records are packed into one preallocated bytearray and the write
+    position wraps around it, so the ring always holds the newest
+    capacity events and recording never allocates. Each game takes a slot
+    number when it is built so events of games running side by side, e.g.
+    on a match server, can be told apart. Recording takes no lock: events
+    recorded at the same moment by two threads can overwrite one another,
+    which a diagnostic trace can afford.
+    '''
+    _instance = None
+    _initialized = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if EventTrace._initialized:
+            return
+
+        EventTrace._initialized = True
+        self.logger = TMGELogger().get_logger('trace')
+        try:
+            capacity = int(os.environ.get(CAPACITY_ENV, DEFAULT_CAPACITY))
+        except ValueError:
+            self.logger.warning("Ignoring invalid %s, using %s", CAPACITY_ENV, DEFAULT_CAPACITY)
+            capacity = DEFAULT_CAPACITY
+        self.resize(capacity)
+        self._games: Dict[int, str] = {}
+        self._next_slot = 0
+        self._hooks_installed = False
+
+    def resize(self, capacity: int) -> None:
+        """
+        resize empties the ring and gives it room for capacity records
+
+        Args:
+            capacity (int): Records to keep, 0 turns tracing off
+
+        Returns:
+            None
+        """
+        if capacity < 0:
+            raise ValueError("Trace capacity cannot be negative")
+        self.capacity = capacity
+        self._buffer = bytearray(capacity * RECORD.size)
+        self._next = 0
+
+    @property
+    def recorded(self) -> int:
+        """Events recorded since the ring was last emptied, including overwritten ones"""
+        return self._next
+
+    def register_game(self, game_id: str) -> int:
+        """
+        register_game
+
+        Args:
+            game_id (str): The game's identifier, shown in the converted trace
+
+        Returns:
+            slot (int): The number to record the game's events with
+        """
+        slot = self._next_slot
+        self._next_slot = (slot + 1) % 0x10000
+        self._games[slot] = game_id
+        return slot
+
+    def record(self, event: int, slot: int, player: int, tick: int, value: int = 0) -> None:
+        """
+        record
+
+        Args:
+            event (int): One of the event constants, e.g. LINE_CLEAR
+            slot (int): The game's slot from register_game
+            player (int): Index of the player the event belongs to, -1 for the whole game
+            tick (int): The game's tick
+            value (int): The event's value, see VALUE_NAMES
+
+        Returns:
+            None
+        """
+        capacity = self.capacity
+        if capacity:
+            index = self._next
+            self._next = index + 1
+            _pack_record(self._buffer, index % capacity * _RECORD_SIZE, _clock(), event, slot, player, tick, value)
+
+    def records(self) -> bytes:
+        """The records in the ring, oldest first, packed as RECORD"""
+        recorded, buffer = self._next, bytes(self._buffer)
+        if recorded <= self.capacity:
+            return buffer[:recorded * RECORD.size]
+        split = (recorded % self.capacity) * RECORD.size
+        return buffer[split:] + buffer[:split]
+
+    def dump(self, path: Optional[str] = None) -> str:
+        """
+        dump
+
+        Args:
+            path (Optional[str]): File to write, None for logs/trace-<pid>-<time>.bin
+
+        Returns:
+            path (str): The file written
+        """
+        if path is None:
+            name = f"trace-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.bin"
+            path = os.path.join(TMGELogger().logs_dir, name)
+        records = self.records()
+        header = json.dumps({
+            'version': FILE_VERSION,
+            'pid': os.getpid(),
+            'capacity': self.capacity,
+            'recorded': self._next,
+            'games': {str(slot): game_id for slot, game_id in self._games.items()},
+        }).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, len(header)))
+            f.write(header)
+            f.write(records)
+        self.logger.info("Wrote %s trace events to %s", len(records) // RECORD.size, path)
+        return path
+
+    def install_dump_hooks(self) -> None:
+        """Dump the trace on an uncaught exception, in a thread or a Tk callback, and on SIGUSR2"""
+        if self._hooks_installed:
+            return
+        self._hooks_installed = True
+        previous_hook = sys.excepthook
+        previous_thread_hook = threading.excepthook
+
+        def excepthook(*args: Any) -> None:
+            self._dump_quietly()
+            previous_hook(*args)
+
+        def thread_excepthook(args: Any) -> None:
+            self._dump_quietly()
+            previous_thread_hook(args)
+
+        sys.excepthook = excepthook
+        threading.excepthook = thread_excepthook
+        # Tk hands exceptions raised in its callbacks to report_callback_exception instead
+        # of sys.excepthook. tkinter is only patched if the process already uses it, so
+        # headless processes such as the match server never load it
+        tkinter = sys.modules.get('tkinter')
+        if tkinter is not None:
+            previous_report = tkinter.Tk.report_callback_exception
+
+            def report_callback_exception(window: Any, *args: Any) -> None:
+                self._dump_quietly()
+                previous_report(window, *args)
+
+            tkinter.Tk.report_callback_exception = report_callback_exception
+        # Signal handlers can only be set from the main thread, and not at all on Windows
+        if hasattr(signal, 'SIGUSR2') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR2, lambda signum, frame: self._dump_quietly())
+
+    def _dump_quietly(self) -> None:
+        # Runs while something else is already failing, so a failed dump must not hide that
+        try:
+            self.dump()
+        except Exception as e:
+            self.logger.error("Could not write the event trace: %s", e)
+
+
+def read_trace(path: str) -> Tuple[Dict[str, Any], Iterator[Tuple[int, int, int, int, int, int]]]:
+    """
+    read_trace
+
+    Args:
+        path (str): A file written by EventTrace.dump
+
+    Returns:
+        header (Dict[str, Any]): The dump's JSON header
+        records (Iterator[Tuple[int, int, int, int, int, int]]): (perf_counter_ns, event, slot,
+            player, tick, value) for every record, oldest first
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"Not an event trace: {path}")
+    magic, header_length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"Not an event trace: {path}")
+    start = HEADER.size + header_length
+    header = json.loads(data[HEADER.size:start].decode('utf-8'))
+    if header['version'] > FILE_VERSION:
+        raise ValueError(f"Unsupported event trace version: {header['version']}")
+    usable = start + (len(data) - start) // RECORD.size * RECORD.size
+    return header, RECORD.iter_unpack(data[start:usable])
+
+
+def to_chrome_trace(path: str) -> Dict[str, Any]:
+    """
+    to_chrome_trace
+
+    Args:
+        path (str): A file written by EventTrace.dump
+
+    Returns:
+        trace (Dict[str, Any]): Chrome trace-event JSON, one process per game with its ticks
+            on one thread and each player's events on their own
+    """
+    header, records = read_trace(path)
+    games = header['games']
+    events: List[Dict[str, Any]] = []
+    named_games, named_threads, open_ticks = set(), set(), set()
+    origin = None
+    for timestamp, event, slot, player, tick, value in records:
+        if origin is None:
+            origin = timestamp
+        tid = player + 1
+        if slot not in named_games:
+            named_games.add(slot)
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': slot,
+                           'args': {'name': f"{games.get(str(slot), 'Game')} #{slot}"}})
+        if (slot, tid) not in named_threads:
+            named_threads.add((slot, tid))
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': slot, 'tid': tid,
+                           'args': {'name': f"Player {player + 1}" if player >= 0 else 'Ticks'}})
+        entry = {'name': EVENT_NAMES.get(event, f"event {event}"), 'pid': slot, 'tid': tid,
+                 'ts': (timestamp - origin) / 1000, 'args': {'tick': tick}}
+        if event == TICK_START:
+            entry['ph'] = 'B'
+            entry['args']['resimulated'] = bool(value)
+            open_ticks.add(slot)
+        elif event == TICK_END:
+            # The ring may have overwritten the start of the oldest tick
+            if slot not in open_ticks:
+                continue
+            entry['ph'] = 'E'
+            open_ticks.discard(slot)
+        else:
+            entry['ph'] = 'i'
+            entry['s'] = 't'
+            if event in VALUE_NAMES:
+                entry['args'][VALUE_NAMES[event]] = value
+        events.append(entry)
+    return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'pid': header['pid']}}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Convert an event trace dump to Chrome trace-event JSON")
+    parser.add_argument('trace', help="File written by EventTrace.dump")
+    parser.add_argument('-o', '--output', help="JSON file to write, defaults to the dump's name with .json")
+    args = parser.parse_args(argv)
+    output = args.output or os.path.splitext(args.trace)[0] + '.json'
+    trace = to_chrome_trace(args.trace)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(trace, f)
+    counts: Dict[str, int] = {}
+    for entry in trace['traceEvents']:
+        if entry['ph'] in ('B', 'i'):
+            counts[entry['name']] = counts.get(entry['name'], 0) + 1
+    print(f"Wrote {len(trace['traceEvents'])} trace events to {output}")
+    for name, count in sorted(counts.items()):
+        print(f"  {name}: {count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import os
+import random
+from typing import Optional, Tuple
+
+MASK_64 = (1 << 64) - 1
+
+
+class GameRandom(random.Random):
+    '''
+    Random number generator with a single 64-bit word of state (SplitMix64).
+
+    It offers the full random.Random API (choice, randint, shuffle, ...) but
+    getstate() is one integer instead of the Mersenne Twister's 625, which
+    keeps game snapshots and replay keyframes small.
+    '''
+    def __init__(self, seed: Optional[int] = None) -> None:
+        self._state = 0
+        super().__init__(seed)
+
+    def seed(self, a: Optional[int] = None, version: int = 2) -> None:
+        if a is None:
+            a = int.from_bytes(os.urandom(8), 'little')
+        elif not isinstance(a, int):
+            raise TypeError("GameRandom can only be seeded with an int")
+        self._state = a & MASK_64
+        self.gauss_next = None
+
+    def _next(self) -> int:
+        self._state = (self._state + 0x9E3779B97F4A7C15) & MASK_64
+        z = self._state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK_64
+        return z ^ (z >> 31)
+
+    def random(self) -> float:
+        return (self._next() >> 11) * (1.0 / (1 << 53))
+
+    def getrandbits(self, k: int) -> int:
+        if k < 0:
+            raise ValueError("Number of bits must be non-negative")
+        bits, filled = 0, 0
+        while filled < k:
+            bits |= self._next() << filled
+            filled += 64
+        return bits & ((1 << k) - 1)
+
+    def getstate(self) -> Tuple[int, Optional[float]]:
+        return self._state, self.gauss_next
+
+    def setstate(self, state: Tuple[int, Optional[float]]) -> None:
+        self._state, self.gauss_next = state
@@ -1,11 +1,90 @@
+import atexit
+import gzip
 import logging
 import os
-from datetime import datetime
+import queue
+import shutil
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Union
+
+# Levels as "LEVEL,subsystem=LEVEL,...", e.g. "INFO,game=DEBUG,net=WARNING"
+LEVELS_ENV = 'TMGE_LOG_LEVELS'
+
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    '''
+    Rotates the log file once it passes max_bytes or max_age seconds have
+    gone by since the last rotation, gzipping the rotated files and keeping
+    backup_count of them.
+    '''
+    def __init__(self, filename: str, max_bytes: int, max_age: float, backup_count: int) -> None:
+        """
+        __init__
+
+        Args:
+            filename (str): Path of the current log file
+            max_bytes (int): Size at which the file is rotated
+            max_age (float): Seconds after which the file is rotated
+            backup_count (int): Compressed old files to keep
+
+        Returns:
+            None
+        """
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.max_age = max_age
+        self.namer = lambda name: name + '.gz'
+        self.rotator = self._compress
+        # The newest backup was written at the last rotation
+        newest = self.rotation_filename(f"{self.baseFilename}.1")
+        last_rollover = os.path.getmtime(newest) if os.path.exists(newest) else time.time()
+        self.rollover_at = last_rollover + max_age
+
+    @staticmethod
+    def _compress(source: str, dest: str) -> None:
+        with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if record.created >= self.rollover_at and os.path.exists(self.baseFilename):
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.max_age
+
+
+class DeferredQueueHandler(QueueHandler):
+    '''
+    Queues records as they are, so the message is only formatted on the
+    listener's thread. Arguments are formatted later, so pass values that
+    are not changed afterwards.
+    '''
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
 
 class TMGELogger:
+    '''
+    The engine's logger, a singleton.
+
+    Records go through a queue to a listener thread, which formats them and
+    writes them to logs/tmge.log and the console, so logging never waits
+    on the disk. Subsystems log through get_logger, e.g. 'game' or 'net',
+    with their own levels, set by set_level or the TMGE_LOG_LEVELS
+    environment variable. Messages take %-style arguments so a record
+    below its logger's level is dropped before anything is formatted.
+    '''
     _instance = None
     _initialized = False
 
+    # Rotate logs/tmge.log past 5 MB or after a day, keeping 5 compressed old files
+    MAX_BYTES = 5 * 1024 * 1024
+    MAX_AGE = 24 * 60 * 60
+    BACKUP_COUNT = 5
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
@@ -14,7 +93,7 @@ class TMGELogger:
     def __init__(self):
         if TMGELogger._initialized:
             return
-            
+
         TMGELogger._initialized = True
         self.setup_logger()
 
@@ -22,16 +101,17 @@ class TMGELogger:
         # Create logs directory if it doesn't exist
         logs_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "logs")
         os.makedirs(logs_dir, exist_ok=True)
+        self.logs_dir = logs_dir
 
         # Create logger
         self.logger = logging.getLogger('TMGE')
-        self.logger.setLevel(logging.DEBUG)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
 
-        # Create handlers
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        # File handler for all logs
-        fh = logging.FileHandler(os.path.join(logs_dir, f'tmge_{timestamp}.log'))
+        # File handler for all logs that pass the loggers' levels
+        fh = CompressingRotatingFileHandler(
+            os.path.join(logs_dir, 'tmge.log'), self.MAX_BYTES, self.MAX_AGE, self.BACKUP_COUNT
+        )
         fh.setLevel(logging.DEBUG)
 
         # Console handler for important logs
@@ -41,25 +121,102 @@ class TMGELogger:
         # Create formatters and add it to handlers
         file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         console_formatter = logging.Formatter('%(levelname)s - %(message)s')
-        
+
         fh.setFormatter(file_formatter)
         ch.setFormatter(console_formatter)
 
-        # Add handlers to the logger
-        self.logger.addHandler(fh)
-        self.logger.addHandler(ch)
+        # The logger only queues records, the listener's thread writes them
+        self._handlers = (fh, ch)
+        self._queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+        self.logger.addHandler(self._queue_handler)
+        self._start_listener()
+        atexit.register(self.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(
+                before=self._hold_handlers, after_in_parent=self._release_handlers, after_in_child=self._write_directly
+            )
+
+        self._configure_levels(os.environ.get(LEVELS_ENV, ''))
+
+    def _start_listener(self) -> None:
+        self._queue_handler.queue = queue.SimpleQueue()
+        self._listener = QueueListener(self._queue_handler.queue, *self._handlers, respect_handler_level=True)
+        self._listener.start()
+        self._listening = True
+
+    def _hold_handlers(self) -> None:
+        # Forking while the listener is half way through a write would copy its
+        # stream's lock held into the child, so wait for the write to finish
+        for handler in self._handlers:
+            handler.acquire()
+
+    def _release_handlers(self) -> None:
+        for handler in reversed(self._handlers):
+            handler.release()
+
+    def _write_directly(self) -> None:
+        """
+        The listener's thread does not survive a fork, and worker processes exit without
+        running atexit, so a forked child writes its records itself. logging has already
+        given the child's handlers new locks.
+        """
+        self._listening = False
+        self.logger.removeHandler(self._queue_handler)
+        for handler in self._handlers:
+            self.logger.addHandler(handler)
+
+    def _configure_levels(self, spec: str) -> None:
+        for entry in filter(None, (part.strip() for part in spec.split(','))):
+            subsystem, _, level = entry.rpartition('=')
+            try:
+                self.set_level(level.strip().upper(), subsystem.strip() or None)
+            except ValueError:
+                self.logger.warning("Ignoring invalid %s entry: %s", LEVELS_ENV, entry)
+
+    def get_logger(self, subsystem: str) -> logging.Logger:
+        """
+        get_logger
+
+        Args:
+            subsystem (str): e.g. 'game' or 'net'
+
+        Returns:
+            logger (logging.Logger): The subsystem's logger, TMGE.<subsystem>, which uses the
+                TMGE level unless it has its own
+        """
+        return self.logger.getChild(subsystem)
+
+    def set_level(self, level: Union[int, str], subsystem: str = None) -> None:
+        """
+        set_level
+
+        Args:
+            level (Union[int, str]): A logging level, e.g. logging.DEBUG or 'WARNING'
+            subsystem (str): The subsystem to set it for, None for the whole engine
+
+        Returns:
+            None
+        """
+        logger = self.logger if subsystem is None else self.get_logger(subsystem)
+        logger.setLevel(level)
+
+    def stop(self) -> None:
+        """Write every queued record and stop the listener, called at exit"""
+        if self._listening:
+            self._listening = False
+            self._listener.stop()
 
-    def debug(self, message: str):
-        self.logger.debug(message)
+    def debug(self, message: str, *args):
+        self.logger.debug(message, *args)
 
-    def info(self, message: str):
-        self.logger.info(message)
+    def info(self, message: str, *args):
+        self.logger.info(message, *args)
 
-    def warning(self, message: str):
-        self.logger.warning(message)
+    def warning(self, message: str, *args):
+        self.logger.warning(message, *args)
 
-    def error(self, message: str):
-        self.logger.error(message)
+    def error(self, message: str, *args):
+        self.logger.error(message, *args)
 
-    def critical(self, message: str):
-        self.logger.critical(message)
+    def critical(self, message: str, *args):
+        self.logger.critical(message, *args)
@@ -0,0 +1,120 @@
+import tkinter as tk
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+from tgme.audio import AudioService
+from tgme.player import Player
+from tgme.player_profile import PlayerProfile
+from tgme.plugins import GamePlugin
+from tgme.views.game_ui import GameUI
+
+
+class GamePool:
+    '''
+    Hidden game windows, built ahead of time, per game and player count.
+
+    Building a game, its matching strategy, a Toplevel and its canvas is
+    slow enough to notice when Play Now is clicked. The pool builds them in
+    idle time instead, one per idle callback so the home window stays
+    responsive. Launching takes a window, resets its game and shows it, and
+    closing the window hides it and returns it to the pool.
+    '''
+    def __init__(self, root: tk.Misc, controls: Dict[str, List[Dict[str, str]]], size: int = 1) -> None:
+        """
+        __init__
+
+        Args:
+            root (tk.Misc): The window game windows belong to
+            controls (Dict[str, List[Dict[str, str]]]): Key bindings per game id, per player
+            size (int): Idle windows kept per game and player count
+
+        Returns:
+            None
+        """
+        if size < 0:
+            raise ValueError("Pool size cannot be negative")
+        self.root = root
+        self.controls = controls
+        self.size = size
+        self._idle: Dict[Tuple[str, int], Deque[GameUI]] = defaultdict(deque)
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+
+    def _build(self, descriptor: GamePlugin, players: List[Player], seed: Optional[int] = None) -> GameUI:
+        game = descriptor.create_game(players, self.controls[descriptor.game_id], seed)
+        if game.music_path and game.music_path.strip():
+            # Decoded in the background, so starting the game does not wait for it
+            AudioService().preload(game.music_path)
+        window = tk.Toplevel(self.root)
+        window.withdraw()
+        game_ui = GameUI(window, game)
+        game_ui.on_release = self.release
+        return game_ui
+
+    def warm(self, descriptors: List[GamePlugin], player_count: int = 2) -> None:
+        """
+        warm fills the pool in idle time, returning at once
+
+        Args:
+            descriptors (List[GamePlugin]): The games to build windows for
+            player_count (int): Players per game
+
+        Returns:
+            None
+        """
+        pending = deque(descriptor for descriptor in descriptors for _ in range(self.size))
+
+        def build_next() -> None:
+            if self._closed or not pending:
+                return
+            descriptor = pending.popleft()
+            idle = self._idle[(descriptor.game_id, player_count)]
+            if len(idle) < self.size:
+                # Placeholder players, acquire swaps in the real ones
+                players = [Player(PlayerProfile(f"Player{index + 1}")) for index in range(player_count)]
+                idle.append(self._build(descriptor, players))
+            self.root.after_idle(build_next)
+
+        self.root.after_idle(build_next)
+
+    def acquire(self, descriptor: GamePlugin, players: List[Player], seed: Optional[int] = None) -> GameUI:
+        """
+        acquire
+
+        Args:
+            descriptor (GamePlugin): The game to play
+            players (List[Player]): Its players
+            seed (Optional[int]): Seed for the game, random if None
+
+        Returns:
+            game_ui (GameUI): A hidden window with a reset game, set its callbacks, call
+                game_ui.game.init() and then game_ui.start()
+        """
+        idle = self._idle.get((descriptor.game_id, len(players)))
+        if idle:
+            game_ui = idle.popleft()
+            game_ui.game.reset(players, seed)
+            self.hits += 1
+        else:
+            game_ui = self._build(descriptor, players, seed)
+            self.misses += 1
+        game_ui.root.title(f"Playing {descriptor.game_id}")
+        return game_ui
+
+    def release(self, game_ui: GameUI) -> None:
+        """Take back a closed game window, destroying it if the pool is full"""
+        game_ui.on_game_over = None
+        game_ui.on_exit = None
+        idle = self._idle[(game_ui.game.game_id, len(game_ui.game.players))]
+        if self._closed or len(idle) >= self.size:
+            game_ui.root.destroy()
+        else:
+            idle.append(game_ui)
+
+    def close(self) -> None:
+        """Destroy every idle window"""
+        self._closed = True
+        for idle in self._idle.values():
+            for game_ui in idle:
+                game_ui.root.destroy()
+            idle.clear()
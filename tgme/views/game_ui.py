@@ -1,19 +1,30 @@
+import time
 import tkinter as tk
 from tkinter import ttk
-from typing import Optional, List, Tuple, Any
+from typing import Optional, List, Tuple, Any, Callable
+from tgme.audio import AudioService
 from tgme.game import Game
 from tgme.grid import Grid
 from tgme.tile import Tile
-import pygame
 
 class GameUI:
     '''
     This class is responsible for drawing the game UI.
     '''
-    def __init__(self, root: tk.Tk, game: Game) -> None:
+    # Most ticks to run in one frame when catching up after a stall
+    MAX_CATCH_UP_TICKS = 10
+
+    def __init__(self, root: tk.Tk, game: Game, on_game_over: Optional[Callable[[Game], None]] = None,
+                 on_exit: Optional[Callable[[Game], None]] = None) -> None:
         self.root = root
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)   # For music cleanup
         self.game = game
+        self.on_game_over = on_game_over
+        self.on_exit = on_exit
+        # Set by GamePool, closing the window then hides it and hands it back instead of destroying it
+        self.on_release: Optional[Callable[['GameUI'], None]] = None
+        self._next_tick_at: Optional[float] = None
+        self._after_id: Optional[str] = None
         self.cell_size = 30
         self.padding = 50
         
@@ -87,23 +98,36 @@ class GameUI:
         self.root.bind('<Key>', self.game.handle_key_press)
         self.root.bind('<KeyRelease>', self.game.handle_key_release)
 
+    def start(self) -> None:
+        """Show the window, start the music and run the game, call after game.init()"""
+        self._next_tick_at = None
+        self.root.deiconify()
         # if not blank for music path
         if self.game.music_path and self.game.music_path.strip():
                 self.play_music(self.game.music_path)
+        self.update()
+
+    def stop(self) -> None:
+        """Stop the game loop and the music"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        # Other open game windows keep their music
+        AudioService().stop(self)
 
     def play_music(self, file_path = "music/background_music.mp3"):
-        pygame.mixer.init()
-        pygame.mixer.music.load(file_path)
-        pygame.mixer.music.set_volume(0.5)
-        pygame.mixer.music.play(-1)  # -1 makes it loop indefinitely
+        # Queued to the shared audio service, which loops it until this window stops it
+        AudioService().play(self, file_path, volume=0.5)
 
     def on_close(self) -> None:
-        if pygame.mixer.get_init():  # Check if the mixer is initialized
-            pygame.mixer.music.stop()
-            pygame.mixer.music.unload()  # Unload music to free resources
-            pygame.mixer.quit()  # Quit the mixer
+        if self.on_exit:
+            self.on_exit(self.game)
+        self.stop()
 
-        pygame.quit()  # Quit pygame completely
+        if self.on_release is not None:
+            self.root.withdraw()
+            self.on_release(self)
+            return
         self.root.destroy()
 
     def draw_grid(self) -> None:
@@ -235,6 +259,22 @@ class GameUI:
         return colors.get(tile.tile_type, 'gray')
 
     def update(self) -> None:
-        self.game.update()
+        # Run the game at a fixed tick rate however late this frame is,
+        # so game speed is independent of frame rate
+        now = time.perf_counter()
+        if self._next_tick_at is None:
+            self._next_tick_at = now
+        ticks = 0
+        while self._next_tick_at <= now and ticks < self.MAX_CATCH_UP_TICKS:
+            self.game.step()
+            self._next_tick_at += 1 / self.game.TICKS_PER_SECOND
+            ticks += 1
+        if self._next_tick_at <= now:
+            # Too far behind, drop the backlog rather than fast-forward
+            self._next_tick_at = now
+
+        if self.on_game_over and not self.game.results_recorded and self.game.is_finished():
+            self.game.results_recorded = True
+            self.on_game_over(self.game)
         self.draw_grid()
-        self.root.after(16, self.update)  # ~60 FPS
+        self._after_id = self.root.after(16, self.update)  # ~60 FPS
@@ -1,13 +1,13 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from typing import Dict, Any, Type
-from tgme.matching_strategy_factory import MatchingStrategyFactory
+from typing import Dict, Any, Optional, Type
+from tgme.audio import AudioService
+from tgme.cpu_player import DIFFICULTIES, make_cpu_controller
 from tgme.player_profile import PlayerProfile
 from tgme.player import Player
+from tgme.plugins import GamePlugin
 from tgme.tmge import TMGE
-from tgme.views.game_ui import GameUI
-from games.tetris_game import TetrisGame
-from games.puzzle_fighter_game import PuzzleFighterGame
+from tgme.views.game_pool import GamePool
 from tgme.interfaces import IMatchingStrategy
 
 class HomeWindow:
@@ -25,6 +25,10 @@ class HomeWindow:
         self.setup_styles()
         self.create_widgets()
 
+        # Game windows are built while the player looks at the home window, so Play Now is instant
+        self.pool = GamePool(self.window, controls)
+        self.pool.warm(self.tmge.get_available_games)
+
     def setup_styles(self) -> None:
         """Configure modern ttk styles"""
         self.style.configure('Modern.TFrame', background='#ffffff')
@@ -112,6 +116,28 @@ class HomeWindow:
         )
         play_btn.pack(side=tk.RIGHT)
 
+        # Play against a CPU player at the chosen difficulty
+        difficulty = tk.StringVar(value='normal')
+        cpu_btn = tk.Button(
+            card,
+            text="vs CPU",
+            command=lambda: self.start_game(game, cpu_difficulty=difficulty.get()),
+            bg='#6c757d',
+            fg='white',
+            font=('Helvetica', 12),
+            relief='flat',
+            padx=20,
+            pady=8
+        )
+        cpu_btn.pack(side=tk.RIGHT, padx=(0, 10))
+        ttk.Combobox(
+            card,
+            textvariable=difficulty,
+            values=list(DIFFICULTIES),
+            state='readonly',
+            width=8
+        ).pack(side=tk.RIGHT, padx=(0, 10))
+
         return card
 
     def create_stats_section(self, parent) -> None:
@@ -145,6 +171,42 @@ class HomeWindow:
                     style='Stats.TLabel'
                 ).pack(anchor='w', pady=2)
 
+        self.create_leaderboard_section(stats_frame)
+
+    def create_leaderboard_section(self, parent) -> None:
+        ttk.Label(
+            parent,
+            text="Top Scores",
+            style='Header.TLabel'
+        ).pack(anchor='w', pady=(10, 20))
+
+        for game in self.tmge.get_available_games:
+            leaders = self.tmge.get_leaderboard(game.game_id, limit=5)
+            if not leaders:
+                continue
+
+            ttk.Label(
+                parent,
+                text=game.game_id,
+                font=('Helvetica', 14, 'bold'),
+                background='#f8f9fa'
+            ).pack(anchor='w', pady=(0, 5))
+
+            for position, (username, high_score) in enumerate(leaders, start=1):
+                ttk.Label(
+                    parent,
+                    text=f"{position}. {username}: {high_score}",
+                    style='Stats.TLabel'
+                ).pack(anchor='w', pady=2)
+
+            rank = self.tmge.get_rank(game.game_id, self.profile.username)
+            if rank is not None and rank > len(leaders):
+                ttk.Label(
+                    parent,
+                    text=f"Your rank: #{rank}",
+                    style='Stats.TLabel'
+                ).pack(anchor='w', pady=2)
+
     def create_menu(self) -> None:
         """Create application menu bar"""
         menubar = tk.Menu(self.window)
@@ -164,26 +226,24 @@ class HomeWindow:
         help_menu.add_command(label="Game Controls", command=self.show_controls)
         help_menu.add_command(label="About", command=self.show_about)
 
-    def start_game(self, game_template: Any) -> None:
-        """Start a new instance of the selected game"""
+    def start_game(self, descriptor: GamePlugin, cpu_difficulty: Optional[str] = None) -> None:
+        """Start a new instance of the selected game, against a CPU player if cpu_difficulty is set"""
         # Create a second player for multiplayer games
         player1 = Player(self.profile)
-        player2 = Player(PlayerProfile("Player2"))
-
-        matching_strategy = MatchingStrategyFactory.get_strategy(game_template.game_id)
-
-        # Create new instance of the game
-        game_class = type(game_template)
-        new_game = game_class(game_id=game_template.game_id, players=[player1, player2], controls=self.controls[game_template.game_id], matching_strategy=matching_strategy)
-
-        # Create new game window
-        game_window = tk.Toplevel(self.window)
-        game_window.title(f"Playing {new_game.game_id}")
-        
-        # Initialize game UI
-        game_ui = GameUI(game_window, new_game)
+        if cpu_difficulty:
+            player2 = Player(PlayerProfile("CPU"), make_cpu_controller(descriptor.game_id, cpu_difficulty))
+        else:
+            player2 = Player(PlayerProfile("Player2"))
+
+        # A pre-built window and game from the pool, reset for these players
+        game_ui = self.pool.acquire(descriptor, [player1, player2])
+        new_game = game_ui.game
+        game_ui.on_game_over = self.tmge.record_game_results
+        game_ui.on_exit = lambda game: self.tmge.save_recording(recorder)
         new_game.init()  # Initialize the new game instance
-        game_ui.update()
+        # Record the session so it can be replayed later
+        recorder = self.tmge.record_session(new_game)
+        game_ui.start()
 
     def refresh_stats(self) -> None:
         """Refresh player statistics"""
@@ -227,5 +287,6 @@ multiple games and local multiplayer.
     def quit_application(self) -> None:
         """Handle application exit"""
         if messagebox.askyesno("Exit", "Are you sure you want to quit?"):
+            AudioService().shutdown()
             self.tmge.quit()
             self.window.quit()
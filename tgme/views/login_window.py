@@ -54,6 +54,17 @@ class LoginWindow:
             width=30
         )
         self.username_entry.pack(fill=tk.X, pady=(5, 0))
+        self.username_entry.bind('<KeyRelease>', self.update_suggestions)
+
+        # Type-ahead suggestions for existing usernames
+        self.suggestions = tk.Listbox(
+            username_frame,
+            font=('Helvetica', 11),
+            height=4,
+            relief='flat',
+            activestyle='none'
+        )
+        self.suggestions.bind('<<ListboxSelect>>', self.select_suggestion)
 
         # Buttons container
         buttons_frame = ttk.Frame(main_frame, style='Modern.TFrame')
@@ -85,15 +96,40 @@ class LoginWindow:
         )
         create_btn.pack(fill=tk.X)
 
+    def update_suggestions(self, event: object = None) -> None:
+        """Show existing usernames starting with what has been typed so far"""
+        prefix = self.username_entry.get()
+        matches = self.tmge.suggest_usernames(prefix, limit=4) if prefix else []
+
+        self.suggestions.delete(0, tk.END)
+        if not matches or matches == [prefix]:
+            self.suggestions.pack_forget()
+            return
+
+        for username in matches:
+            self.suggestions.insert(tk.END, username)
+        self.suggestions.configure(height=len(matches))
+        self.suggestions.pack(fill=tk.X)
+
+    def select_suggestion(self, event: object = None) -> None:
+        """Fill the username entry with the clicked suggestion"""
+        selection = self.suggestions.curselection()
+        if not selection:
+            return
+
+        self.username_entry.delete(0, tk.END)
+        self.username_entry.insert(0, self.suggestions.get(selection[0]))
+        self.suggestions.pack_forget()
+        self.username_entry.focus_set()
+
     def login(self) -> None:
         username = self.username_entry.get()
-        profiles = self.tmge.get_player_profiles
-        
-        for profile in profiles:
-            if profile.username == username:
-                self.window.destroy()
-                self.on_login_success(profile)
-                return
+        profile = self.tmge.get_profile(username)
+
+        if profile is not None:
+            self.window.destroy()
+            self.on_login_success(profile)
+            return
 
         messagebox.showerror("Error", "Profile not found!")
 
@@ -147,7 +183,7 @@ class LoginWindow:
             return
 
         # Check if username already exists
-        if any(p.username == new_username for p in self.tmge.get_player_profiles):
+        if self.tmge.has_profile(new_username):
             messagebox.showerror("Error", "Username already exists!")
             return
 
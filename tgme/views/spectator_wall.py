@@ -0,0 +1,250 @@
+import math
+import tkinter as tk
+from typing import Dict, List, Optional, Tuple
+from tgme.game import Game
+
+# (x, y, color) for every visible cell of a falling piece
+PieceCells = Tuple[Tuple[int, int, str], ...]
+
+
+class SpectatorWall:
+    '''
+    This class is responsible for monitoring many live games at once.
+
+    Every board (one per player of every game) is drawn into a single
+    PhotoImage at one pixel per cell and zoomed up to the tile size, so a
+    board costs one canvas item no matter how many cells it has. Boards are
+    only redrawn when their state version changes.
+
+    Two levels of detail are used:
+        - colour: each cell is drawn in its tile colour
+        - occupancy: cells are drawn from the grid occupancy bitmap in a
+          single colour, with row strings cached per bitmask
+    '''
+    # Smallest cell size (in pixels) at which tiles are drawn in colour
+    COLOR_DETAIL_MIN_CELL = 6
+    # Smallest cell size (in pixels) at which the score label is drawn
+    LABEL_MIN_CELL = 8
+
+    def __init__(self, root: tk.Misc, games: List[Game], width: int = 1280, height: int = 720,
+                 refresh_ms: int = 33, drive_games: bool = True) -> None:
+        """
+        __init__
+
+        Args:
+            root (tk.Misc): The window to draw the wall in
+            games (List[Game]): The live games to monitor
+            width (int): Width of the wall in pixels
+            height (int): Height of the wall in pixels
+            refresh_ms (int): Delay between refreshes in milliseconds
+            drive_games (bool): Whether the wall calls step() on each game every refresh
+
+        Returns:
+            None
+        """
+        self.root = root
+        self.games = games
+        self.width = width
+        self.height = height
+        self.refresh_ms = refresh_ms
+        self.drive_games = drive_games
+
+        self.colors = {
+            'background': '#212529',
+            'grid_bg': '#343a40',
+            'occupied': '#adb5bd',
+            'piece': '#ffffff',
+            'text': '#f8f9fa',
+            'game_over': '#dc3545'
+        }
+
+        # One entry per (game index, player index)
+        self.boards: List[Tuple[int, int]] = [
+            (g, p) for g, game in enumerate(games) for p in range(len(game.grids))
+        ]
+        self._versions: Dict[Tuple[int, int], Tuple] = {}
+        self._base_images: Dict[Tuple[int, int], tk.PhotoImage] = {}
+        self._images: Dict[Tuple[int, int], tk.PhotoImage] = {}
+        self._labels: Dict[Tuple[int, int], int] = {}
+        self._row_cache: Dict[Tuple[int, int, int], str] = {}
+
+        self.canvas = tk.Canvas(
+            root,
+            width=width,
+            height=height,
+            bg=self.colors['background'],
+            highlightthickness=0
+        )
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.layout()
+
+    def layout(self) -> None:
+        """Pick a cell size that fits every board on the wall and create one image per board"""
+        self.canvas.delete('all')
+        self._versions.clear()
+        self._base_images.clear()
+        self._images.clear()
+        self._labels.clear()
+
+        if not self.boards:
+            self.cell_size = 0
+            return
+
+        rows, columns = self._board_shape()
+        gap = 4
+        best = 1
+        for cols_on_wall in range(1, len(self.boards) + 1):
+            rows_on_wall = math.ceil(len(self.boards) / cols_on_wall)
+            cell = min(
+                (self.width - gap * cols_on_wall) // (cols_on_wall * columns),
+                (self.height - gap * rows_on_wall) // (rows_on_wall * rows)
+            )
+            if cell > best:
+                best, self.wall_columns = cell, cols_on_wall
+        if best == 1:
+            self.wall_columns = math.ceil(math.sqrt(len(self.boards)))
+        self.cell_size = best
+
+        for i, key in enumerate(self.boards):
+            grid = self._grid(key)
+            base = tk.PhotoImage(master=self.root, width=grid.columns, height=grid.rows)
+            image = tk.PhotoImage(master=self.root, width=grid.columns * best, height=grid.rows * best)
+            x = (i % self.wall_columns) * (columns * best + gap)
+            y = (i // self.wall_columns) * (rows * best + gap)
+            self.canvas.create_image(x, y, image=image, anchor='nw')
+            if best >= self.LABEL_MIN_CELL:
+                self._labels[key] = self.canvas.create_text(
+                    x + 2, y + 2, anchor='nw', fill=self.colors['text'], font=('Helvetica', 8)
+                )
+            self._base_images[key] = base
+            self._images[key] = image
+
+    def _board_shape(self) -> Tuple[int, int]:
+        """Largest board dimensions on the wall, used as the slot size"""
+        rows = max(self._grid(key).rows for key in self.boards)
+        columns = max(self._grid(key).columns for key in self.boards)
+        return rows, columns
+
+    def _grid(self, key: Tuple[int, int]):
+        game_index, player = key
+        return self.games[game_index].grids[player]
+
+    def _piece_cells(self, game: Game, player: int) -> PieceCells:
+        """Visible cells of the falling piece as (x, y, color) tuples"""
+        piece = game.current_pieces[player]
+        if not piece:
+            return ()
+
+        cells = []
+        for position in piece.get_positions:
+            x, y = position[0], position[1]
+            if y < 0:
+                continue
+            # PuzzleFighter pieces carry a tile per gem, Tetris pieces a single colour
+            color = position[2].tile_color if len(position) == 3 else piece.color
+            cells.append((x, y, color))
+        return tuple(cells)
+
+    def _board_version(self, key: Tuple[int, int], piece: PieceCells) -> Tuple:
+        """Cheap key that changes whenever anything drawn for the board changes"""
+        game_index, player = key
+        game = self.games[game_index]
+        return (self._grid(key).version, piece, game.scores[player], game.game_over[player])
+
+    def _row_string(self, locked: int, active: int, columns: int) -> str:
+        """Tk image row for an occupancy row, memoised per bitmask pair"""
+        cache_key = (locked, active, columns)
+        row = self._row_cache.get(cache_key)
+        if row is None:
+            pixels = []
+            for y in range(columns):
+                bit = 1 << y
+                if active & bit:
+                    pixels.append(self.colors['piece'])
+                elif locked & bit:
+                    pixels.append(self.colors['occupied'])
+                else:
+                    pixels.append(self.colors['grid_bg'])
+            row = '{' + ' '.join(pixels) + '}'
+            self._row_cache[cache_key] = row
+        return row
+
+    def _occupancy_data(self, key: Tuple[int, int], piece: PieceCells) -> str:
+        grid = self._grid(key)
+        active = [0] * grid.rows
+        for x, y, _ in piece:
+            if 0 <= y < grid.rows and 0 <= x < grid.columns:
+                active[y] |= 1 << x
+        return ' '.join(
+            self._row_string(locked, active[row], grid.columns)
+            for row, locked in enumerate(grid.occupancy())
+        )
+
+    def _color_data(self, key: Tuple[int, int], piece: PieceCells) -> str:
+        grid = self._grid(key)
+        rows = [
+            [getattr(tile, 'tile_color', tile.tile_type) if tile else self.colors['grid_bg'] for tile in row]
+            for row in grid.tiles
+        ]
+        for x, y, color in piece:
+            if 0 <= y < grid.rows and 0 <= x < grid.columns:
+                rows[y][x] = color
+        return ' '.join('{' + ' '.join(row) + '}' for row in rows)
+
+    def draw_board(self, key: Tuple[int, int], piece: Optional[PieceCells] = None) -> None:
+        """Redraw a single board into its image"""
+        game_index, player = key
+        game = self.games[game_index]
+        if piece is None:
+            piece = self._piece_cells(game, player)
+
+        if self.cell_size >= self.COLOR_DETAIL_MIN_CELL:
+            data = self._color_data(key, piece)
+        else:
+            data = self._occupancy_data(key, piece)
+
+        base = self._base_images[key]
+        base.put(data, to=(0, 0))
+        # Scale the one-pixel-per-cell image into the displayed image in place
+        image = self._images[key]
+        image.tk.call(image, 'copy', base, '-zoom', self.cell_size, self.cell_size)
+
+        label = self._labels.get(key)
+        if label is not None:
+            text = f"{game.game_id} P{player + 1}: {game.scores[player]}"
+            if game.game_over[player]:
+                text += " - GAME OVER"
+            self.canvas.itemconfigure(
+                label,
+                text=text,
+                fill=self.colors['game_over'] if game.game_over[player] else self.colors['text']
+            )
+
+    def refresh(self) -> int:
+        """
+        refresh
+
+        Args:
+            None
+
+        Returns:
+            redrawn (int): The number of boards whose state changed and were redrawn
+        """
+        redrawn = 0
+        for key in self.boards:
+            game_index, player = key
+            piece = self._piece_cells(self.games[game_index], player)
+            version = self._board_version(key, piece)
+            if self._versions.get(key) == version:
+                continue
+            self._versions[key] = version
+            self.draw_board(key, piece)
+            redrawn += 1
+        return redrawn
+
+    def update(self) -> None:
+        if self.drive_games:
+            for game in self.games:
+                game.step()
+        self.refresh()
+        self.root.after(self.refresh_ms, self.update)